@@ -0,0 +1,70 @@
+"""
+Cold start of the package: time to import it in a fresh interpreter, on top of the interpreter's own start
+
+    python benchmarks/bench_import.py [--budget 50]
+
+With `--budget` (milliseconds), exits with 1 if importing `Metadata` takes longer.
+"""
+
+import argparse
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+STATEMENTS = {
+    'interpreter': 'pass',
+    'discord_connections': 'import discord_connections',
+    'Metadata': 'from discord_connections import Metadata',
+    'Client': 'from discord_connections import Client',
+}
+
+
+def measure(stmt: str, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, '-c', stmt], check=True, cwd=ROOT)
+        samples.append(time.perf_counter() - started)
+    return min(samples)
+
+
+def bench_import(repeat: int = 10) -> dict:
+    """
+    Returns milliseconds per statement, without the interpreter start
+    """
+
+    seconds = {name: measure(stmt, repeat) for name, stmt in STATEMENTS.items()}
+    baseline = seconds.pop('interpreter')
+    return {name: {'ms': max(0., s - baseline) * 1e3} for name, s in seconds.items()}
+
+
+def check_isolation() -> list[str]:
+    """
+    Returns heavy dependencies imported along with `Metadata`, there must be none
+    """
+
+    stmt = 'import sys; from discord_connections import Metadata; print(*sys.modules)'
+    modules = subprocess.run([sys.executable, '-c', stmt], check=True, cwd=ROOT, capture_output=True, text=True)
+    return sorted({'httpx', 'pydantic'} & set(modules.stdout.split()))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--budget', type=float, help='allowed milliseconds to import `Metadata`')
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    results = bench_import(args.repeat)
+    for name, result in results.items():
+        print(f'{name:<20} {result["ms"]:8.1f} ms')
+
+    failures = [f'`Metadata` imports {name}' for name in check_isolation()]
+    if args.budget is not None and results['Metadata']['ms'] > args.budget:
+        failures.append(f'importing `Metadata` takes longer than {args.budget} ms')
+
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,62 @@
+"""
+Micro-benchmark of `Metadata` construction and serialization
+
+    python benchmarks/bench_metadata.py
+"""
+
+import json
+import sys
+import timeit
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(1, str(Path(__file__).parent.parent))  # the package itself, when it is not installed
+
+from discord_connections.datatypes import Metadata, MetadataField, MetadataType  # noqa: E402
+from discord_connections.datatypes import metadata  # noqa: E402
+
+
+class BenchMetadata(Metadata):
+    platform_name = 'Benchmark'
+    books_read = MetadataField(MetadataType.INT_GTE, 'books read', 'total books read')
+    hours_spent = MetadataField(MetadataType.INT_GTE, 'hours reading', 'hours spend reading books')
+    is_author = MetadataField(MetadataType.BOOL_EQ, 'author', 'is an author')
+
+
+def bench(name: str, stmt, number: int = 100_000) -> None:
+    seconds = min(timeit.repeat(stmt, number=number, repeat=5))
+    print(f'{name:<16} {seconds / number * 1e6:10.2f} us/op')
+
+
+def bench_memory(name: str, factory, number: int = 10_000) -> None:
+    tracemalloc.start()
+    instances = [factory() for _ in range(number)]  # noqa
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'{name:<16} {size / number:10.0f} B/instance')
+
+
+if __name__ == '__main__':
+    instance = BenchMetadata(books_read=10, hours_spent=20, is_author=True, platform_username='user')
+
+    bench('__init__', lambda: BenchMetadata(books_read=10, hours_spent=20, is_author=True, platform_username='user'))
+    bench('from_trusted', lambda: BenchMetadata.from_trusted((10, 20, True), 'user'))
+    bench('to_dict', instance.to_dict)
+    bench('to_dict+dumps', lambda: json.dumps(instance.to_dict()).encode())
+    bench('to_json', instance.to_json)
+    if metadata.orjson is not None:
+        metadata.orjson, orjson = None, metadata.orjson
+        encoder = metadata._compile_encoder(BenchMetadata)
+        metadata.orjson = orjson
+        bench('to_json stdlib', lambda: encoder(instance.platform_username, instance._values))
+
+    rows = 10_000
+    columns = {'books_read': list(range(rows)), 'hours_spent': list(range(rows)), 'is_author': [True] * rows}
+    bench('rows: instances', lambda: [
+        json.dumps(BenchMetadata(books_read=b, hours_spent=h, is_author=a).to_dict()).encode()
+        for b, h, a in zip(*columns.values())
+    ], number=10)
+    bench('rows: batch', lambda: list(BenchMetadata.batch(columns)), number=10)
+    bench('rows: trusted', lambda: list(BenchMetadata.batch(columns, trusted=True)), number=10)
+
+    bench_memory('memory', lambda: BenchMetadata(books_read=10, hours_spent=20, is_author=True))
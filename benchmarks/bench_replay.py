@@ -0,0 +1,70 @@
+"""
+Throughput of the client replaying recorded traffic (see `discord_connections.recording`)
+
+    python benchmarks/bench_replay.py [--recording traffic.jsonl] [--speed 1 4]
+
+Without `--recording`, a bulk sync against `FakeDiscord` is recorded first.
+"""
+
+import argparse
+import asyncio
+import dataclasses
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(1, str(Path(__file__).parent.parent))  # the package itself, when it is not installed
+
+from bench_metadata import BenchMetadata  # noqa: E402
+from fake_discord import FakeDiscord  # noqa: E402
+
+from discord_connections import Client  # noqa: E402
+from discord_connections.datatypes import DiscordToken  # noqa: E402
+from discord_connections.recording import RecordingTransport, ReplayTransport, replay_traffic  # noqa: E402
+
+
+async def record(path: Path, users: int, latency: float) -> None:
+    transport = RecordingTransport(path, FakeDiscord(latency=latency, jitter=.2, rate_limit=(5, 1.)))
+    items = [
+        (
+            DiscordToken(access_token=f'access-{i}', refresh_token=f'refresh-{i}', expires_in=604800),
+            BenchMetadata(books_read=i, hours_spent=i, is_author=bool(i % 2))
+        )
+        for i in range(users)
+    ]
+
+    async with Client(1, 'http://localhost/callback', 'secret', 'bot', transport=transport) as client:
+        async for _ in client.push_metadata_many(items, concurrency=50):
+            pass
+
+
+async def replay(path: Path, speed: float) -> dict:
+    transport = ReplayTransport(path, speed=speed)
+    async with Client(1, 'http://localhost/callback', 'secret', 'bot', transport=transport) as client:
+        report = await replay_traffic(client, path, speed=speed)
+    return {**dataclasses.asdict(report), 'requests_per_second': report.requests_per_second}
+
+
+def bench_replay(
+        recording: Path = None,
+        speeds: list[float] = (1., 4.),
+        users: int = 1000,
+        latency: float = .02
+) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        if recording is None:
+            recording = Path(directory) / 'traffic.jsonl'
+            asyncio.run(record(recording, users, latency))
+        return {f'speed_{speed:g}': asyncio.run(replay(recording, speed)) for speed in speeds}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--recording', type=Path, help='recorded traffic to replay')
+    parser.add_argument('--speed', type=float, nargs='+', default=[1., 4.])
+    parser.add_argument('--users', type=int, default=1000, help='users of the recorded bulk sync')
+    args = parser.parse_args()
+
+    for name, result in bench_replay(args.recording, args.speed, args.users).items():
+        print(f'{name:<12} {result["requests_per_second"]:10.1f} requests/s  {result["failed"]} failed  '
+              f'max lag {result["max_lag"] * 1e3:.1f} ms')
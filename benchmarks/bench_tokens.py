@@ -0,0 +1,96 @@
+"""
+Bulk loading of tokens from storage
+
+    python benchmarks/bench_tokens.py [--tokens 100000]
+"""
+
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+import timeit
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(1, str(Path(__file__).parent.parent))  # the package itself, when it is not installed
+
+from pydantic import BaseModel  # noqa: E402
+
+from discord_connections.datatypes import DiscordToken  # noqa: E402
+from discord_connections.storage import SQLiteTokenStore  # noqa: E402
+
+
+class PydanticToken(BaseModel):
+    """
+    Token as it used to be, for comparison
+    """
+
+    access_token: str
+    refresh_token: str
+    expires_in: timedelta
+    expires_at: datetime | None = None
+
+
+def _rows(number: int) -> list[tuple]:
+    now = time.time()
+    return [(f'access-{i}', f'refresh-{i}', 604800., now + i) for i in range(number)]
+
+
+def bench_construct(number: int) -> dict:
+    rows = _rows(number)
+
+    def pydantic():
+        return [
+            PydanticToken(access_token=a, refresh_token=r, expires_in=e, expires_at=datetime.fromtimestamp(t))
+            for a, r, e, t in rows
+        ]
+
+    paths = {'pydantic': pydantic, 'from_rows': lambda: DiscordToken.from_rows(rows)}
+    return {
+        name: {'us_per_token': min(timeit.repeat(path, number=1, repeat=3)) / number * 1e6}
+        for name, path in paths.items()
+    }
+
+
+async def bench_store(number: int) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        store = SQLiteTokenStore(str(Path(directory) / 'tokens.sqlite3'))
+        tokens = [(str(i), DiscordToken.from_row(*row)) for i, row in enumerate(_rows(number))]
+
+        started = time.perf_counter()
+        await store.set_many(tokens)
+        saved = time.perf_counter() - started
+
+        started = time.perf_counter()
+        loaded = 0
+        async for page in store.iter_expiring(timedelta(days=3650), page_size=10_000):
+            loaded += len(page)
+        iterated = time.perf_counter() - started
+
+        started = time.perf_counter()
+        await store.get_many(str(i) for i in range(number))
+        fetched = time.perf_counter() - started
+
+        store.close()
+
+    return {
+        'set_many': {'tokens_per_second': number / saved},
+        'iter_expiring': {'tokens_per_second': loaded / iterated},
+        'get_many': {'tokens_per_second': number / fetched},
+    }
+
+
+def bench_tokens(number: int = 100_000) -> dict:
+    return {'construct': bench_construct(number), 'sqlite': asyncio.run(bench_store(number))}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tokens', type=int, default=100_000)
+    args = parser.parse_args()
+
+    for group, results in bench_tokens(args.tokens).items():
+        for name, result in results.items():
+            (unit, value), = result.items()
+            print(f'{group + " " + name:<24} {value:12.2f} {unit}')
@@ -0,0 +1,154 @@
+"""
+In-process stand-in for the Discord endpoints used by the client, plugged in as an httpx transport:
+
+    client = Client(..., transport=FakeDiscord(latency=.05, rate_limit=(5, 1.)))
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import re
+import time
+from urllib.parse import parse_qs
+
+import httpx
+
+
+_ROUTES = [
+    ('POST', re.compile(r'/api/v10/oauth2/token'), 'token'),
+    ('GET', re.compile(r'/api/v10/oauth2/@me'), 'me'),
+    ('GET', re.compile(r'/api/v10/users/@me/applications/\d+/role-connection'), 'get_role_connection'),
+    ('PUT', re.compile(r'/api/v10/users/@me/applications/\d+/role-connection'), 'put_role_connection'),
+    ('GET', re.compile(r'/api/v10/applications/\d+/role-connections/metadata'), 'get_schema'),
+    ('PUT', re.compile(r'/api/v10/applications/\d+/role-connections/metadata'), 'put_schema'),
+]
+
+
+class FakeDiscord(httpx.AsyncBaseTransport):
+    """
+    `latency` (seconds, +-`jitter` share of it) is added to every response, `rate_limit=(limit, window)` enables
+    per-route-and-token buckets with Discord rate limit headers and 429s, `error_rate` is the share of requests
+    answered with 500. `requests` counts requests by handler name.
+    """
+
+    def __init__(
+            self,
+            *,
+            latency: float = 0.,
+            jitter: float = 0.,
+            rate_limit: tuple[int, float] | None = None,
+            error_rate: float = 0.,
+            seed: int = 0
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.error_rate = error_rate
+
+        self.requests: dict[str, int] = {}
+        self.role_connections: dict[str, dict] = {}
+        self.schema: list = []
+
+        self._random = random.Random(seed)
+        self._windows: dict[tuple[str, str], tuple[float, int]] = {}
+        self._tokens = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if self.latency:
+            await asyncio.sleep(self.latency * (1 + self._random.uniform(-self.jitter, self.jitter)))
+
+        for method, pattern, name in _ROUTES:
+            if request.method == method and pattern.fullmatch(request.url.path):
+                break
+        else:
+            return httpx.Response(404, json={'message': '404: Not Found', 'code': 0})
+
+        self.requests[name] = self.requests.get(name, 0) + 1
+
+        headers = {}
+        if self.rate_limit is not None:
+            headers = self._take(name, request.headers.get('Authorization', ''))
+            if headers is None:
+                return self._too_many_requests(name, request)
+
+        if self._random.random() < self.error_rate:
+            return httpx.Response(500, json={'message': '500: Internal Server Error', 'code': 0}, headers=headers)
+
+        await request.aread()
+        return httpx.Response(200, json=getattr(self, f'_{name}')(request), headers=headers)
+
+    def _take(self, name: str, identity: str) -> dict | None:
+        limit, window = self.rate_limit
+        now = time.monotonic()
+
+        started, used = self._windows.get((name, identity), (now, 0))
+        if now - started >= window:
+            started, used = now, 0
+        if used >= limit:
+            return None
+
+        self._windows[name, identity] = (started, used + 1)
+        return {
+            'X-RateLimit-Bucket': name,
+            'X-RateLimit-Limit': str(limit),
+            'X-RateLimit-Remaining': str(limit - used - 1),
+            'X-RateLimit-Reset-After': f'{window - (now - started):.3f}',
+        }
+
+    def _too_many_requests(self, name: str, request: httpx.Request) -> httpx.Response:
+        limit, window = self.rate_limit
+        started, _ = self._windows[name, request.headers.get('Authorization', '')]
+        retry_after = max(window - (time.monotonic() - started), 0.)
+        return httpx.Response(
+            429,
+            json={'message': 'You are being rate limited.', 'retry_after': retry_after, 'global': False},
+            headers={
+                'X-RateLimit-Bucket': name,
+                'X-RateLimit-Limit': str(limit),
+                'X-RateLimit-Remaining': '0',
+                'X-RateLimit-Reset-After': f'{retry_after:.3f}',
+                'Retry-After': str(int(retry_after) + 1),
+            }
+        )
+
+    def _token(self, request: httpx.Request) -> dict:
+        form = parse_qs(request.content.decode())
+        if form.get('grant_type') not in (['authorization_code'], ['refresh_token']):
+            raise ValueError('Unknown grant type')
+
+        self._tokens += 1
+        return {
+            'access_token': f'access-{self._tokens}',
+            'refresh_token': f'refresh-{self._tokens}',
+            'expires_in': 604800,
+            'token_type': 'Bearer',
+            'scope': 'role_connections.write identify',
+        }
+
+    def _me(self, request: httpx.Request) -> dict:
+        user_id = str(abs(hash(request.headers['Authorization'])))
+        return {'application': {'id': '1'}, 'scopes': ['identify'], 'user': {'id': user_id, 'username': 'user'}}
+
+    def _get_role_connection(self, request: httpx.Request) -> dict:
+        return self.role_connections.get(request.headers['Authorization'], {})
+
+    def _put_role_connection(self, request: httpx.Request) -> dict:
+        body = json.loads(request.content)
+        body['metadata'] = {k: _stringify(v) for k, v in body.get('metadata', {}).items()}  # Discord returns strings
+        self.role_connections[request.headers['Authorization']] = body
+        return body
+
+    def _get_schema(self, request: httpx.Request) -> list:
+        return self.schema
+
+    def _put_schema(self, request: httpx.Request) -> list:
+        self.schema = json.loads(request.content)
+        return self.schema
+
+
+def _stringify(value) -> str:
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    return str(value)
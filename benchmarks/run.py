@@ -0,0 +1,165 @@
+"""
+Benchmark suite, runs the client against `FakeDiscord` and measures pure-CPU paths of `Metadata`.
+
+    python benchmarks/run.py --output results.json [--latency 0.05] [--users 2000] [--only bulk]
+
+Results are printed and written as JSON, to be compared across releases.
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import sys
+import time
+import timeit
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+sys.path.insert(1, str(Path(__file__).parent.parent))  # the package itself, when it is not installed
+
+from bench_import import bench_import  # noqa: E402
+from bench_metadata import BenchMetadata  # noqa: E402
+from bench_replay import bench_replay  # noqa: E402
+from bench_tokens import bench_tokens  # noqa: E402
+from fake_discord import FakeDiscord  # noqa: E402
+
+from discord_connections import Client  # noqa: E402
+from discord_connections.datatypes import DiscordToken  # noqa: E402
+from discord_connections.retry import RetryPolicy  # noqa: E402
+
+GROUPS = ['single', 'bulk', 'cpu', 'tokens', 'import', 'replay']
+
+
+def _client(fake: FakeDiscord) -> Client:
+    return Client(1, 'http://localhost/callback', 'secret', 'bot', transport=fake,
+                  retry_policy=RetryPolicy(max_attempts=5, base_delay=.01))
+
+
+def _token(i: int) -> DiscordToken:
+    return DiscordToken(access_token=f'access-{i}', refresh_token=f'refresh-{i}', expires_in=604800)
+
+
+def _latencies(samples: list[float]) -> dict:
+    samples = sorted(samples)
+    return {
+        'calls': len(samples),
+        'mean_ms': statistics.fmean(samples) * 1e3,
+        'p50_ms': samples[len(samples) // 2] * 1e3,
+        'p99_ms': samples[min(len(samples) - 1, int(len(samples) * .99))] * 1e3,
+    }
+
+
+async def bench_single(args) -> dict:
+    fake = FakeDiscord(latency=args.latency, jitter=.2)
+    results = {}
+
+    async with _client(fake) as client:
+        metadata = BenchMetadata(books_read=1, hours_spent=2, is_author=True)
+        calls = {
+            'push_metadata': lambda i: client.push_metadata(_token(i), metadata),
+            'refresh_token': lambda i: client.refresh_token(_token(i)),
+            'get_metadata': lambda i: client.get_metadata(_token(i)),
+        }
+        for name, call in calls.items():
+            samples = []
+            for i in range(args.calls):
+                started = time.perf_counter()
+                await call(i)
+                samples.append(time.perf_counter() - started)
+            results[name] = _latencies(samples)
+
+    return results
+
+
+async def bench_bulk(args) -> dict:
+    results = {}
+
+    for concurrency in args.concurrency:
+        fake = FakeDiscord(latency=args.latency, jitter=.2, rate_limit=(5, 1.), error_rate=args.error_rate)
+        items = [
+            (_token(i), BenchMetadata(books_read=i, hours_spent=i, is_author=bool(i % 2))) for i in range(args.users)
+        ]
+
+        async with _client(fake) as client:
+            started = time.perf_counter()
+            errors = 0
+            async for result in client.push_metadata_many(items, concurrency=concurrency):
+                errors += not result.ok
+            elapsed = time.perf_counter() - started
+
+        results[f'concurrency_{concurrency}'] = {
+            'users': args.users,
+            'seconds': elapsed,
+            'users_per_second': args.users / elapsed,
+            'errors': errors,
+            'requests': fake.requests.get('put_role_connection', 0),
+        }
+
+    return results
+
+
+def bench_cpu(args) -> dict:
+    instance = BenchMetadata(books_read=10, hours_spent=20, is_author=True, platform_username='user')
+    paths = {
+        'Metadata.__init__': lambda: BenchMetadata(books_read=10, hours_spent=20, is_author=True),
+        'Metadata.from_trusted': lambda: BenchMetadata.from_trusted((10, 20, True)),
+        'Metadata.to_dict': instance.to_dict,
+        'Metadata.to_json': instance.to_json,
+        'Metadata.to_schema': BenchMetadata.to_schema,
+    }
+
+    results = {}
+    for name, stmt in paths.items():
+        seconds = min(timeit.repeat(stmt, number=args.number, repeat=5))
+        results[name] = {'us_per_op': seconds / args.number * 1e6}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', type=Path, help='file to write JSON results to')
+    parser.add_argument('--only', choices=GROUPS, action='append', help='groups to run')
+    parser.add_argument('--latency', type=float, default=.02, help='latency of the fake API, seconds')
+    parser.add_argument('--error-rate', type=float, default=0., help='share of requests failing with 500')
+    parser.add_argument('--calls', type=int, default=200, help='calls per single-call benchmark')
+    parser.add_argument('--users', type=int, default=1000, help='users per bulk sync benchmark')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 10, 50, 100])
+    parser.add_argument('--tokens', type=int, default=100_000, help='tokens per token loading benchmark')
+    parser.add_argument('--number', type=int, default=100_000, help='iterations per CPU benchmark')
+    parser.add_argument('--recording', type=Path, help='recorded traffic to replay, a bulk sync is recorded otherwise')
+    parser.add_argument('--speed', type=float, nargs='+', default=[1., 4.], help='replay speeds')
+    args = parser.parse_args()
+
+    groups = args.only or GROUPS
+    report = {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': {k: v for k, v in vars(args).items() if k not in ('output', 'only')},
+        'results': {},
+    }
+
+    if 'single' in groups:
+        report['results']['single'] = asyncio.run(bench_single(args))
+    if 'bulk' in groups:
+        report['results']['bulk'] = asyncio.run(bench_bulk(args))
+    if 'cpu' in groups:
+        report['results']['cpu'] = bench_cpu(args)
+    if 'tokens' in groups:
+        report['results']['tokens'] = bench_tokens(args.tokens)
+    if 'import' in groups:
+        report['results']['import'] = bench_import()
+    if 'replay' in groups:
+        report['results']['replay'] = bench_replay(args.recording, args.speed, args.users, args.latency)
+
+    output = json.dumps(report, indent=2, default=str)
+    print(output)
+    if args.output:
+        args.output.write_text(output)
+
+
+if __name__ == '__main__':
+    main()
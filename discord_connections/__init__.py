@@ -1,3 +1,42 @@
-from .client import Client
-from .datatypes.metadata import Metadata, MetadataType, MetadataField
-from .datatypes.tokens import DiscordToken
+"""
+Names are imported on first access (PEP 562), so e.g. `from discord_connections import Metadata` does not import
+httpx and pydantic
+"""
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .blocking import SyncClient, SyncDiscordConnections
+    from .client import Client, DiscordConnections
+    from .datatypes.metadata import Metadata, MetadataType, MetadataField
+    from .datatypes.tokens import DiscordToken
+
+
+_LAZY = {
+    'Client': '.client',
+    'DiscordConnections': '.client',
+    'SyncClient': '.blocking',
+    'SyncDiscordConnections': '.blocking',
+    'Metadata': '.datatypes.metadata',
+    'MetadataType': '.datatypes.metadata',
+    'MetadataField': '.datatypes.metadata',
+    'DiscordToken': '.datatypes.tokens',
+}
+
+__all__ = list(_LAZY)
+
+
+def __getattr__(name: str):
+    try:
+        module = _LAZY[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+
+    from importlib import import_module
+
+    value = globals()[name] = getattr(import_module(module, __name__), name)
+    return value
+
+
+def __dir__():
+    return sorted([*globals(), *__all__])
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import Any, Coroutine, Iterable, Iterator
+
+from .bulk import PushItem, PushResult
+from .client import DiscordConnections
+from .datatypes import DiscordToken, Metadata, Scope
+from .storage.schemas import SchemaStore
+
+
+class SyncDiscordConnections:
+    """
+    Blocking counterpart of `DiscordConnections` for scripts without an event loop, takes the same arguments.
+
+    Calls run on one event loop in a background thread, so all of them share the pooled connections, rate limits
+    and retries of the wrapped `client`. Can be used from several threads at once. Call `close()` (or use
+    `with`) when done.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.client = DiscordConnections(*args, **kwargs)
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='discord-connections', daemon=True)
+        self._thread.start()
+
+    def _run(self, coroutine: Coroutine) -> Any:
+        if self._loop.is_closed():
+            coroutine.close()
+            raise RuntimeError('Client is closed')
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def close(self) -> None:
+        if self._loop.is_closed():
+            return
+
+        self._run(self.client.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def oauth_url(self) -> tuple[str, str]:
+        return self.client.oauth_url
+
+    def get_oauth_url(self, state: str, *, add_scopes: list[Scope] = None) -> str:
+        return self.client.get_oauth_url(state, add_scopes=add_scopes)
+
+    def get_oauth_token(self, code: str) -> DiscordToken:
+        return self._run(self.client.get_oauth_token(code))
+
+    def refresh_token(self, token: DiscordToken) -> DiscordToken:
+        return self._run(self.client.refresh_token(token))
+
+    def get_user_data(self, token: DiscordToken) -> dict:
+        return self._run(self.client.get_user_data(token))
+
+    def push_metadata(
+            self,
+            token: DiscordToken,
+            metadata: Metadata | bytes,
+            *,
+            user_id: int | str = None,
+            force: bool = False
+    ) -> bool:
+        return self._run(self.client.push_metadata(token, metadata, user_id=user_id, force=force))
+
+    def push_metadata_many(
+            self,
+            items: Iterable[PushItem],
+            *,
+            concurrency: int = 10,
+            force: bool = False
+    ) -> Iterator[PushResult]:
+        """
+        Same as `DiscordConnections.push_metadata_many`, `items` are iterated in the background thread
+        """
+
+        results = self.client.push_metadata_many(items, concurrency=concurrency, force=force)
+        try:
+            while True:
+                try:
+                    yield self._run(results.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            if not self._loop.is_closed():
+                self._run(results.aclose())
+
+    def get_metadata(self, token: DiscordToken) -> dict:
+        return self._run(self.client.get_metadata(token))
+
+    def get_metadata_schema(self) -> list[dict]:
+        return self._run(self.client.get_metadata_schema())
+
+    def register_metadata_schema(self, metadata: type[Metadata]) -> dict:
+        return self._run(self.client.register_metadata_schema(metadata))
+
+    def ensure_metadata_schema(
+            self,
+            metadata: type[Metadata],
+            *,
+            store: SchemaStore = None,
+            force: bool = False
+    ) -> bool:
+        return self._run(self.client.ensure_metadata_schema(metadata, store=store, force=force))
+
+
+SyncClient = SyncDiscordConnections
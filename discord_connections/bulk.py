@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, AsyncIterable, AsyncIterator, Iterable
+
+from .datatypes import DiscordToken, Metadata
+from .exceptions import AuthExpiredError
+from .priority import bulk_context
+
+if TYPE_CHECKING:
+    from .client import DiscordConnections
+
+
+PushItem = tuple[DiscordToken, Metadata | bytes] | tuple[DiscordToken, Metadata | bytes, int | str]
+
+_DONE = object()
+
+
+@dataclass
+class PushResult:
+    token: DiscordToken  # token actually used, check `refreshed` to know if it must be saved
+    metadata: Metadata | bytes
+    user_id: int | str | None = None
+    refreshed: bool = False
+    skipped: bool = False  # nothing changed since the last push for `user_id`
+    error: Exception | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class PushStats:
+    sent: int = 0
+    skipped: int = 0
+
+
+async def push_metadata_many(
+        client: DiscordConnections,
+        items: Iterable[PushItem] | AsyncIterable[PushItem],
+        *,
+        concurrency: int = 10,
+        force: bool = False
+) -> AsyncIterator[PushResult]:
+    """
+    Pushes metadata for many users with at most `concurrency` requests in flight, yielding results as they complete.
+
+    Items are pulled from `items` lazily, so only about `concurrency` of them are held in memory at once. Requests are
+    sent in the bulk lane. Expired tokens are refreshed, and so are tokens rejected with 401 (the push is retried
+    once), save tokens of results with `refreshed`.
+    """
+
+    if concurrency < 1:
+        raise ValueError('`concurrency` must be at least 1')
+
+    todo = asyncio.Queue(concurrency)
+    done = asyncio.Queue(concurrency)
+
+    async def stop_workers():
+        for _ in range(concurrency):
+            await todo.put(_DONE)
+
+    async def feed():
+        try:
+            async for item in _aiter(items):
+                await todo.put(item)
+        except Exception:
+            await stop_workers()
+            raise
+        await stop_workers()
+
+    async def work():
+        try:
+            while (item := await todo.get()) is not _DONE:
+                await done.put(await _push_one(client, item, force))
+        except Exception as e:  # malformed item, it is a caller's bug, so it is raised rather than reported
+            await done.put(e)
+            return
+        await done.put(_DONE)
+
+    feeder = asyncio.create_task(feed())
+    workers = [asyncio.create_task(work(), context=bulk_context()) for _ in range(concurrency)]
+    try:
+        running = concurrency
+        while running:
+            result = await done.get()
+            if result is _DONE:
+                running -= 1
+                continue
+            if isinstance(result, Exception):
+                raise result
+            yield result
+
+        await feeder  # re-raises errors of `items` iteration
+    finally:
+        for task in [feeder, *workers]:
+            task.cancel()
+        await asyncio.gather(feeder, *workers, return_exceptions=True)
+
+
+async def _push_one(client: DiscordConnections, item: PushItem, force: bool) -> PushResult:
+    result = PushResult(*item)
+    try:
+        if result.token.expired:
+            await _refresh(client, result)
+        try:
+            sent = await client.push_metadata(result.token, result.metadata, user_id=result.user_id, force=force)
+        except AuthExpiredError:
+            if result.refreshed:
+                raise
+            await _refresh(client, result)  # revoked or expired earlier than `expires_ts` says, retried once
+            sent = await client.push_metadata(result.token, result.metadata, user_id=result.user_id, force=force)
+        result.skipped = not sent
+    except Exception as e:
+        result.error = e
+    return result
+
+
+async def _refresh(client: DiscordConnections, result: PushResult) -> None:
+    result.token = await client.refresh_token(result.token)
+    result.refreshed = True
+
+
+async def _aiter(items: Iterable | AsyncIterable) -> AsyncIterator:
+    if isinstance(items, AsyncIterable):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+
+class TTLCache:
+    """
+    LRU cache of at most `maxsize` items, each of them expires `ttl` seconds after it was set
+    """
+
+    def __init__(self, ttl: float, maxsize: int):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._items: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            expires_at, value = self._items[key]
+        except KeyError:
+            return default
+
+        if expires_at <= time.monotonic():
+            del self._items[key]
+            return default
+
+        self._items.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self._items[key] = (time.monotonic() + self.ttl, value)
+        self._items.move_to_end(key)
+        if len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def pop(self, key: str) -> None:
+        self._items.pop(key, None)
+
+    def clear(self) -> None:
+        self._items.clear()
+
+
+_MISSING = object()
+
+
+class ResponseCache:
+    """
+    Cache of `get_metadata` and `get_user_data` responses, keyed by user's access token.
+
+    Concurrent lookups of the same missing key wait for a single request. Cached responses are shared, so they must
+    not be modified.
+    """
+
+    METADATA = 'metadata'
+    USER_DATA = 'user_data'
+
+    def __init__(self, *, metadata_ttl: float = 300, user_data_ttl: float = 3600, maxsize: int = 10_000):
+        self._caches = {
+            self.METADATA: TTLCache(metadata_ttl, maxsize),
+            self.USER_DATA: TTLCache(user_data_ttl, maxsize),
+        }
+        self._pending: dict[tuple[str, str], asyncio.Task] = {}
+        self._overwritten: set[tuple[str, str]] = set()  # keys set while their fetch was in flight
+
+    async def get_or_fetch(self, endpoint: str, key: str, fetch: Callable[[], Awaitable[dict]]) -> dict:
+        value = self._caches[endpoint].get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        task = self._pending.get((endpoint, key))
+        if task is None:
+            task = self._pending[endpoint, key] = asyncio.create_task(self._fetch(endpoint, key, fetch))
+            task.add_done_callback(lambda _: self._pending.pop((endpoint, key), None))
+
+        return await asyncio.shield(task)
+
+    async def _fetch(self, endpoint: str, key: str, fetch: Callable[[], Awaitable[dict]]) -> dict:
+        try:
+            value = await fetch()
+        finally:
+            overwritten = (endpoint, key) in self._overwritten
+            self._overwritten.discard((endpoint, key))
+
+        if not overwritten:
+            self._caches[endpoint].set(key, value)
+        return value
+
+    def reset(self) -> None:
+        """
+        Forgets lookups in flight, for use from another event loop
+        """
+
+        self._pending.clear()
+        self._overwritten.clear()
+
+    def set(self, endpoint: str, key: str, value: dict) -> None:
+        if (endpoint, key) in self._pending:
+            self._overwritten.add((endpoint, key))
+        self._caches[endpoint].set(key, value)
+
+    def invalidate(self, key: str, endpoint: str = None) -> None:
+        for name, cache in self._caches.items():
+            if endpoint is None or name == endpoint:
+                if (name, key) in self._pending:
+                    self._overwritten.add((name, key))
+                cache.pop(key)
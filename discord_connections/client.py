@@ -1,40 +1,252 @@
+import asyncio
+import time
 import uuid
 from datetime import datetime, timedelta
+from typing import AsyncIterable, AsyncIterator, Iterable
 from urllib.parse import urlencode
 
 import httpx
 import json
 
-from datatypes import DiscordToken, Metadata, MetadataField, Scope
-from exceptions import RequestError
+from .bulk import PushItem, PushResult, PushStats, push_metadata_many
+from .cache import ResponseCache
+from .datatypes import DiscordToken, Metadata, MetadataField, Scope
+from .datatypes.metadata import schema_fingerprint
+from .exceptions import RequestError
+from .instrumentation import Instrumentation
+from .priority import PriorityLanes
+from .ratelimit import RateLimiter, get_retry_after
+from .retry import CircuitBreaker, RetryPolicy
+from .storage.payloads import PayloadStore, payload_digest
+from .storage.schemas import SchemaStore
+
+
+DEFAULT_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30)
+DEFAULT_TIMEOUT = httpx.Timeout(10, connect=5)
 
 
 class DiscordConnections:
-    def __init__(self, client_id: int | str, redirect_uri: str, client_secret: str, discord_token: str):
+    def __init__(
+            self,
+            client_id: int | str,
+            redirect_uri: str,
+            client_secret: str,
+            discord_token: str,
+            *,
+            http_client: httpx.AsyncClient = None,
+            transport: httpx.AsyncBaseTransport = None,
+            limits: httpx.Limits = DEFAULT_LIMITS,
+            timeout: httpx.Timeout | float = DEFAULT_TIMEOUT,
+            http2: bool = False,
+            rate_limiter: RateLimiter = None,
+            payload_store: PayloadStore = None,
+            cache: ResponseCache = None,
+            retry_policy: RetryPolicy = None,
+            circuit_breaker: CircuitBreaker = None,
+            instrumentation: Instrumentation = None,
+    ):
+        """
+        One pooled `httpx.AsyncClient` is shared by all calls, so connections to Discord are kept alive between
+        requests. Either pass your own `http_client` (it is not closed by `aclose`), or a `transport`
+        (e.g. `httpx.MockTransport`) to build the pooled client on. `http2=True` requires `httpx[http2]`.
+        Pooled connections belong to the event loop they were opened on, so when the client is used from another loop
+        (e.g. a second `asyncio.run`, or a framework running every request on a new loop), the pooled client is built
+        anew, and the rate limiter and cache drop their locks and queues (not what they know). Using the client from
+        two loops at the same time is not supported. An own `http_client` must be used from one loop only.
+
+        With `payload_store`, `push_metadata` remembers what was pushed for each `user_id` and skips unchanged pushes.
+        With `cache`, responses of `get_metadata` and `get_user_data` are cached, `push_metadata` updates the cached
+        role connection with the one Discord returns.
+
+        Transient failures are retried according to `retry_policy` (`retry.NO_RETRY` to disable). With
+        `circuit_breaker`, calls fail fast with `CircuitOpenError` while Discord keeps failing.
+
+        `instrumentation` receives events of every request (see `instrumentation.Metrics` for example).
+
+        The default `rate_limiter` sends bulk requests (`push_metadata_many` and other background helpers) in their
+        own lane, so interactive calls like `get_oauth_token` are not queued behind them (see `priority`): requests in
+        flight are capped at `limits.max_connections` (as the connection pool caps them anyway), and bulk requests
+        leave a tenth of it to interactive ones, whatever `concurrency` they are sent with. With no connection limit,
+        or a `rate_limiter` of your own without `lanes`, requests are not prioritized.
+        """
+
+        if http_client is not None and transport is not None:
+            raise ValueError('Only `http_client` OR `transport` can be provided at the same time')
+
         self.client_id = int(client_id)
         self.redirect_uri = redirect_uri
         self.client_secret = client_secret
         self.discord_token = discord_token
 
-    # TODO headers and data to kwargs
-    async def _request(self, method: str, url: str, headers: dict, data: dict = None) -> dict:
-        async with httpx.AsyncClient() as client:
-            response = await client.request(method, url, data=data, headers=headers)
+        self._http = http_client
+        self._owns_http = http_client is None
+        self._http_loop: asyncio.AbstractEventLoop | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None  # of the last request
+        self._http_options = {'transport': transport, 'limits': limits, 'timeout': timeout, 'http2': http2}
+
+        if rate_limiter is None:
+            lanes = PriorityLanes(limits.max_connections) if limits.max_connections else None
+            rate_limiter = RateLimiter(lanes=lanes)
+        self.rate_limiter = rate_limiter
+        self.payload_store = payload_store
+        self.cache = cache
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker
+        self.push_stats = PushStats()
+
+        self.instrumentation = instrumentation
+        self.rate_limiter.instrumentation = instrumentation
+        if instrumentation is not None:
+            instrumentation.attach(self)
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        if not self._owns_http:
+            return self._http
+
+        loop = _running_loop()
+        if self._http is None or self._http.is_closed or self._http_loop is not loop:
+            self._http = httpx.AsyncClient(**self._http_options)  # one of another loop can't be closed from here
+            self._http_loop = loop
+        return self._http
+
+    def _use_loop(self, loop: asyncio.AbstractEventLoop) -> None:
+        if self._loop is not None:  # locks and queues of the previous loop can't be used on this one
+            self.rate_limiter.reset()
+            if self.cache is not None:
+                self.cache.reset()
+        self._loop = loop
+
+    async def aclose(self) -> None:
+        if self._owns_http and self._http is not None:
+            if self._http_loop is _running_loop():
+                await self._http.aclose()
+            self._http = None
 
-            if response.status_code != 200:
-                raise RequestError(response.status_code, response.text)
+    async def __aenter__(self):
+        _ = self.http
+        return self
 
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
+
+    async def _request(
+            self,
+            method: str,
+            url: str,
+            *,
+            route: str = None,
+            headers: dict = None,
+            data: dict = None,
+            content: str | bytes = None
+    ) -> dict:
+        headers = headers or {}
+        route = route or f'{method} {url}'
+        instrumentation = self.instrumentation
+
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._use_loop(loop)
+
+        if instrumentation is None:
+            return await self._send(method, url, route, headers, data, content)
+
+        context = instrumentation.on_call(route, method)
+        try:
+            result = await self._send(method, url, route, headers, data, content)
+        except BaseException as e:
+            instrumentation.on_call_end(route, e, context)
+            raise
+        instrumentation.on_call_end(route, None, context)
+        return result
+
+    async def _send(
+            self,
+            method: str,
+            url: str,
+            route: str,
+            headers: dict,
+            data: dict | None,
+            content: str | bytes | None
+    ) -> dict:
+        breaker = self.circuit_breaker
+        instrumentation = self.instrumentation
+        started = time.monotonic()
+
+        def send():
+            return self.http.request(method, url, headers=headers, data=data, content=content)
+
+        if instrumentation is not None:
+            send = self._instrumented(route, method, send)
+
+        attempt = 0
+        while True:
+            if breaker is not None:
+                breaker.check()
+
+            try:
+                response = await self.rate_limiter.request(route, headers.get('Authorization', ''), send)
+                if response.status_code != 200:
+                    raise RequestError.from_response(
+                        response.status_code,
+                        response.text,
+                        get_retry_after(response) if response.status_code == 429 else None
+                    )
+            except Exception as e:
+                if breaker is not None:
+                    if breaker.is_failure(e):
+                        breaker.record_failure()
+                    else:
+                        breaker.record_success()
+
+                delay = self.retry_policy.next_delay(method, e, attempt, started)
+                if delay is None:
+                    raise
+                if instrumentation is not None:
+                    instrumentation.on_retry(route, attempt + 1, delay, e)
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            except BaseException:
+                if breaker is not None:
+                    breaker.cancel_probe()
+                raise
+
+            if breaker is not None:
+                breaker.record_success()
             return response.json()
 
+    def _instrumented(self, route: str, method: str, send):
+        instrumentation = self.instrumentation
+
+        async def instrumented_send() -> httpx.Response:
+            context = instrumentation.on_request(route, method)
+            started = time.perf_counter()
+            try:
+                response = await send()
+            except Exception as e:
+                instrumentation.on_error(route, e, time.perf_counter() - started, context)
+                raise
+
+            instrumentation.on_response(
+                route, response.status_code, time.perf_counter() - started, len(response.request.content), context
+            )
+            return response
+
+        return instrumented_send
+
     @property
     def oauth_url(self, *, add_scopes: list[Scope] = None) -> tuple[str, str]:
         """
         Returns auth link and UUID (in string) to check if response is correct
         """
 
+        state = str(uuid.uuid4())
+        return self.get_oauth_url(state, add_scopes=add_scopes), state
+
+    def get_oauth_url(self, state: str, *, add_scopes: list[Scope] = None) -> str:
         scope = ' '.join(map(str, [Scope.ROLE_CONNECTIONS_WRITE, Scope.IDENTIFY, *(add_scopes or [])]))
 
-        state = str(uuid.uuid4())
         query = {
             'client_id': self.client_id,
             'redirect_uri': self.redirect_uri,
@@ -44,9 +256,7 @@ class DiscordConnections:
             'prompt': 'consent',
         }
 
-        url = f'https://discord.com/api/oauth2/authorize?{urlencode(query)}'
-
-        return url, state
+        return f'https://discord.com/api/oauth2/authorize?{urlencode(query)}'
 
     async def get_oauth_token(self, code: str) -> DiscordToken:
         URL = 'https://discord.com/api/v10/oauth2/token'
@@ -62,8 +272,8 @@ class DiscordConnections:
             'redirect_uri': self.redirect_uri,
         }
 
-        token_data = await self._request('POST', URL, headers, data)
-        return DiscordToken(**token_data)
+        token_data = await self._request('POST', URL, route='POST /oauth2/token', headers=headers, data=data)
+        return DiscordToken.from_response(token_data)
 
     async def refresh_token(self, token: DiscordToken) -> DiscordToken:
         URL = 'https://discord.com/api/v10/oauth2/token'
@@ -78,8 +288,11 @@ class DiscordConnections:
             'refresh_token': token.refresh_token,
         }
 
-        token_data = await self._request('POST', URL, headers, data)
-        return DiscordToken(**token_data)
+        if self.instrumentation is not None:
+            self.instrumentation.on_token_refresh()
+
+        token_data = await self._request('POST', URL, route='POST /oauth2/token', headers=headers, data=data)
+        return DiscordToken.from_response(token_data)
 
     async def get_user_data(self, token: DiscordToken) -> dict:
         URL = 'https://discord.com/api/v10/oauth2/@me'
@@ -87,18 +300,70 @@ class DiscordConnections:
             'Authorization': f'Bearer {token.access_token}',
         }
 
-        user_data = await self._request('GET', URL, headers)
-        return user_data
+        def fetch():
+            return self._request('GET', URL, route='GET /oauth2/@me', headers=headers)
+
+        if self.cache is not None:
+            return await self.cache.get_or_fetch(ResponseCache.USER_DATA, token.access_token, fetch)
+        return await fetch()
+
+    async def push_metadata(
+            self,
+            token: DiscordToken,
+            metadata: Metadata | bytes,
+            *,
+            user_id: int | str = None,
+            force: bool = False
+    ) -> bool:
+        """
+        `metadata` can also be a ready JSON body (e.g. from `Metadata.batch`).
+
+        Returns `False` if the push was skipped because the same metadata was already pushed for `user_id`
+        (only when `payload_store` is set), `True` otherwise
+        """
 
-    async def push_metadata(self, token: DiscordToken, metadata: Metadata) -> None:
         URL = f'https://discord.com/api/v10/users/@me/applications/{self.client_id}/role-connection'
 
         headers = {
             'Authorization': f'Bearer {token.access_token}',
             'Content-Type': 'application/json',
         }
+        content = metadata if isinstance(metadata, bytes) else metadata.to_json()
+
+        track = self.payload_store is not None and user_id is not None
+        if track:
+            digest = payload_digest(content)
+            if not force and await self.payload_store.get(user_id) == digest:
+                self.push_stats.skipped += 1
+                return False
+
+        connection = await self._request(
+            'PUT', URL, route='PUT /users/@me/role-connection', headers=headers, content=content
+        )
+        self.push_stats.sent += 1
+
+        if self.cache is not None:
+            # Discord answers with the role connection as `get_metadata` returns it (metadata values as strings)
+            self.cache.set(ResponseCache.METADATA, token.access_token, connection)
+
+        if track:
+            await self.payload_store.set(user_id, digest)  # noqa
+        return True
+
+    def push_metadata_many(
+            self,
+            items: Iterable[PushItem] | AsyncIterable[PushItem],
+            *,
+            concurrency: int = 10,
+            force: bool = False
+    ) -> AsyncIterator[PushResult]:
+        """
+        Pushes `(token, metadata)` or `(token, metadata, user_id)` items with bounded concurrency, refreshing expired
+        tokens on the way, and yields `PushResult` for every item as soon as it is done (in order of completion, not
+        of `items`)
+        """
 
-        await self._request('PUT', URL, headers, data=json.dumps(metadata.to_dict()))  # noqa
+        return push_metadata_many(self, items, concurrency=concurrency, force=force)
 
     async def get_metadata(self, token: DiscordToken) -> dict:
         URL = f'https://discord.com/api/v10/users/@me/applications/{self.client_id}/role-connection'
@@ -107,17 +372,66 @@ class DiscordConnections:
             'Authorization': f'Bearer {token.access_token}',
         }
 
-        return await self._request('GET', URL, headers)
+        def fetch():
+            return self._request('GET', URL, route='GET /users/@me/role-connection', headers=headers)
 
-    async def register_metadata_schema(self, metadata: Metadata) -> dict:
+        if self.cache is not None:
+            return await self.cache.get_or_fetch(ResponseCache.METADATA, token.access_token, fetch)
+        return await fetch()
+
+    async def get_metadata_schema(self) -> list[dict]:
+        URL = f'https://discord.com/api/v10/applications/{self.client_id}/role-connections/metadata'
+
+        headers = {
+            'Authorization': f'Bot {self.discord_token}',
+        }
+
+        return await self._request('GET', URL, route='GET /role-connections/metadata', headers=headers)
+
+    async def register_metadata_schema(self, metadata: type[Metadata]) -> dict:
         URL = f'https://discord.com/api/v10/applications/{self.client_id}/role-connections/metadata'
 
         headers = {
             'Content-Type': 'application/json',
             'Authorization': f'Bot {self.discord_token}',
         }
+        content = json.dumps(metadata.to_schema())
+
+        return await self._request('PUT', URL, route='PUT /role-connections/metadata', headers=headers, content=content)
+
+    async def ensure_metadata_schema(
+            self,
+            metadata: type[Metadata],
+            *,
+            store: SchemaStore = None,
+            force: bool = False
+    ) -> bool:
+        """
+        Registers the schema of `metadata` unless it is registered already: first `store` is checked for the
+        fingerprint of the last registered schema, then the schema registered on Discord is fetched and compared.
+
+        Returns `True` if the schema was registered
+        """
+
+        fingerprint = metadata.schema_fingerprint
+        registered = False
+        if not force:
+            if store is not None and await store.get(self.client_id) == fingerprint:
+                return False
+            registered = schema_fingerprint(await self.get_metadata_schema()) == fingerprint
+
+        if not registered:
+            await self.register_metadata_schema(metadata)
+        if store is not None:
+            await store.set(self.client_id, fingerprint)
+        return not registered
+
 
-        return await self._request('PUT', URL, headers, data=json.dumps(metadata.to_schema()))  # noqa
+def _running_loop() -> asyncio.AbstractEventLoop | None:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
 
 
 Client = DiscordConnections
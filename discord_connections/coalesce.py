@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import TYPE_CHECKING
+
+from .datatypes import Metadata
+from .priority import bulk_context
+from .token_manager import TokenManager
+
+if TYPE_CHECKING:
+    from .client import DiscordConnections
+
+
+logger = logging.getLogger(__name__)
+
+
+class UpdateQueue:
+    """
+    Merges bursts of metadata updates of the same user into one push.
+
+    An update is pushed `window` seconds after the first not yet pushed update of the user, with the latest metadata
+    put by then. At most `concurrency` pushes run at once and a user never has two pushes in flight. Pending updates
+    are kept encoded; once they take more than `max_bytes`, `put` of a new user waits until some are pushed. Pushes
+    are sent in the bulk lane.
+    """
+
+    ENTRY_OVERHEAD = 200  # approximate bytes taken by bookkeeping of a pending user
+
+    def __init__(
+            self,
+            client: DiscordConnections,
+            tokens: TokenManager,
+            *,
+            window: float = 2.,
+            concurrency: int = 10,
+            max_bytes: int = 64 * 1024 * 1024,
+    ):
+        if concurrency < 1:
+            raise ValueError('`concurrency` must be at least 1')
+
+        self.client = client
+        self.tokens = tokens
+        self.window = window
+        self.concurrency = concurrency
+        self.max_bytes = max_bytes
+
+        self.received = 0
+        self.sent = 0
+        self.failed = 0
+
+        self._pending: dict[str, bytes] = {}
+        self._due: deque[tuple[float, str]] = deque()  # ordered by time, `window` is the same for all
+        self._ready: asyncio.Queue[str] = asyncio.Queue()
+        self._in_flight: set[str] = set()
+        self._deferred: set[str] = set()  # became due while their previous push was in flight
+        self._size = 0
+        self._changed = asyncio.Condition()
+        self._wakeup = asyncio.Event()
+        self._closing = False
+        self._flushing = 0
+        self._tasks: list[asyncio.Task] = []
+
+    @property
+    def size(self) -> int:
+        """
+        Approximate memory taken by pending updates, bytes
+        """
+
+        return self._size
+
+    def __len__(self):
+        return len(self._pending)
+
+    async def put(self, user_id: int | str, metadata: Metadata | bytes) -> None:
+        if self._closing:
+            raise RuntimeError('Queue is closed')
+        self._start()
+
+        user_id = str(user_id)
+        payload = metadata if isinstance(metadata, bytes) else metadata.to_json()
+        self.received += 1
+
+        if user_id not in self._pending:
+            async with self._changed:
+                await self._changed.wait_for(lambda: self._size < self.max_bytes or not self._pending)
+
+        previous = self._pending.get(user_id)
+        self._pending[user_id] = payload
+        if previous is None:
+            self._size += len(payload) + self.ENTRY_OVERHEAD
+            self._due.append((0. if self._flushing else time.monotonic() + self.window, user_id))
+            self._wakeup.set()
+        else:
+            self._size += len(payload) - len(previous)
+
+    async def flush(self) -> None:
+        """
+        Pushes all pending updates right away and waits until they are pushed, updates put meanwhile are pushed right
+        away too
+        """
+
+        self._flushing += 1
+        try:
+            self._due = deque((0., user_id) for _, user_id in self._due)
+            self._wakeup.set()
+            async with self._changed:
+                await self._changed.wait_for(lambda: not self._pending and not self._in_flight)
+        finally:
+            self._flushing -= 1
+
+    async def close(self) -> None:
+        """
+        Pushes pending updates and stops, `put` is not allowed afterwards
+        """
+
+        self._closing = True
+        await self.flush()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def __aenter__(self):
+        self._start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def _start(self) -> None:
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._dispatch())]
+            self._tasks += [asyncio.create_task(self._work(), context=bulk_context()) for _ in range(self.concurrency)]
+
+    async def _dispatch(self) -> None:
+        while True:
+            if not self._due:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            due_at, user_id = self._due[0]
+            delay = due_at - time.monotonic()
+            if delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)  # woken up early by `flush`
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self._due.popleft()
+            if user_id in self._in_flight:
+                self._deferred.add(user_id)
+            else:
+                self._ready.put_nowait(user_id)
+
+    async def _work(self) -> None:
+        while True:
+            user_id = await self._ready.get()
+            payload = self._pending.pop(user_id)
+            self._in_flight.add(user_id)
+            try:
+                await self._push(user_id, payload)
+            finally:
+                self._in_flight.discard(user_id)
+                self._size -= len(payload) + self.ENTRY_OVERHEAD
+                if user_id in self._deferred:
+                    self._deferred.discard(user_id)
+                    self._ready.put_nowait(user_id)
+                async with self._changed:
+                    self._changed.notify_all()
+
+    async def _push(self, user_id: str, payload: bytes) -> None:
+        try:
+            token = await self.tokens.get_valid_token(user_id)
+            await self.client.push_metadata(token, payload, user_id=user_id)
+        except Exception as e:
+            self.failed += 1
+            logger.warning("Failed to push metadata of user %s: %r", user_id, e)
+        else:
+            self.sent += 1
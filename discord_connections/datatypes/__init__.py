@@ -1,3 +1,34 @@
-from .tokens import DiscordToken
-from .metadata import Metadata, MetadataField, MetadataType
-from .scopes import Scope
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .tokens import DiscordToken
+    from .metadata import Metadata, MetadataField, MetadataProvider, MetadataType
+    from .scopes import Scope
+
+
+_LAZY = {
+    'DiscordToken': '.tokens',
+    'Metadata': '.metadata',
+    'MetadataField': '.metadata',
+    'MetadataProvider': '.metadata',
+    'MetadataType': '.metadata',
+    'Scope': '.scopes',
+}
+
+__all__ = list(_LAZY)
+
+
+def __getattr__(name: str):
+    try:
+        module = _LAZY[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+
+    from importlib import import_module
+
+    value = globals()[name] = getattr(import_module(module, __name__), name)
+    return value
+
+
+def __dir__():
+    return sorted([*globals(), *__all__])
@@ -4,9 +4,18 @@ https://discord.com/developers/docs/resources/application-role-connection-metada
 
 from __future__ import annotations
 
+import hashlib
+import json
 import re
-from datetime import datetime
+from datetime import datetime, timezone
 from enum import Enum
+from itertools import repeat
+from typing import Any, Awaitable, Callable, Iterator, Sequence
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 
 class MetadataType(Enum):
@@ -25,8 +34,18 @@ class MetadataType(Enum):
 
 KEY_PATTERN = re.compile(r'[a-z0-9_]*')
 
+INT_MIN, INT_MAX = -2 ** 63, 2 ** 63 - 1  # Discord stores integer metadata as 64-bit signed
+
 
 class MetadataField:
+    """
+    Declared on `Metadata` subclasses, where it works as a descriptor: values are stored in the instance, and
+    reading the attribute from an instance returns a view of the field bound to that instance.
+    """
+
+    _instance: Metadata | None = None
+    _index: int | None = None
+
     def __init__(
             self,
             field_type: MetadataType,
@@ -46,6 +65,7 @@ class MetadataField:
         self._description_localization = description_localization
 
         self._validate()
+        self._check = _compile_check(self)
 
     @property
     def key(self):
@@ -59,25 +79,46 @@ class MetadataField:
 
     @property
     def value(self):
+        if self._instance is not None:
+            return self._instance._values[self._index]
         return self._value
 
     @value.setter
     def value(self, value):
-        if self._is_valid_value(value):
+        value = self._check(value)
+        if self._instance is not None:
+            self._instance._values[self._index] = value
+        else:
             self._value = value
 
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+
+        bound = object.__new__(MetadataField)
+        bound.__dict__.update(self.__dict__)
+        bound._instance = instance
+        return bound
+
+    def __set__(self, instance, value):
+        instance._values[self._index] = self._check(value)
+
     def __repr__(self):
-        return f"{self.__class__.__name__} <{self._name}: {self._value} {self._description}>"
+        return f"{self.__class__.__name__} <{self._name}: {self.value} {self._description}>"
 
     def __call__(self, *args, **kwargs):
-        return MetadataField(
-            field_type=self._type,
-            key=self._key,
-            name=self._name,
-            description=self._description,
-            name_localizations=self._name_localizations,
-            description_localization=self._description_localization
-        )
+        field = object.__new__(MetadataField)  # already validated, no need to do it again
+        field.__dict__.update(self.__dict__)
+        field._value = None
+        field.__dict__.pop('_instance', None)
+        field.__dict__.pop('_index', None)
+        return field
+
+    def _copy(self) -> MetadataField:
+        field = object.__new__(MetadataField)
+        field.__dict__.update(self.__dict__)
+        field._check = _compile_check(field)  # reports errors with the key of the copy
+        return field
 
     def to_dict(self):
         return {
@@ -92,21 +133,35 @@ class MetadataField:
     def _validate(self):
         self._validate_name()
         self._validate_description()
+        self._validate_localizations(self._name_localizations, 100)
+        self._validate_localizations(self._description_localization, 200)
+
+    def _validate_column(self, column: Sequence, trusted: bool = False) -> list:
+        """
+        Checks a whole column of values at once, same rules as for a single value. NumPy arrays of a matching dtype
+        (int64 at most for integers, `datetime64` is naive, so taken as local time like naive datetimes) and `trusted`
+        columns are accepted without checking values one by one.
+        """
 
-    def _is_valid_value(self, value):
-        if value is None:
-            return True
         match self._type:
             case MetadataType.INT_LTE | MetadataType.INT_GTE | MetadataType.INT_EQ | MetadataType.INT_NE:
-                if not isinstance(value, int):
-                    raise ValueError('Value must me an integer')
+                dtype_kinds = 'iub'
             case MetadataType.DT_LTE | MetadataType.DT_GTE:
-                if not isinstance(value, datetime):
-                    raise ValueError('Value must me a datetime')
-            case MetadataType.BOOL_EQ | MetadataType.BOOL_NE:
-                if not isinstance(value, bool):
-                    raise ValueError('Value must me a boolean')
-        return True
+                dtype_kinds = 'M'
+            case _:
+                dtype_kinds = 'b'
+
+        dtype = getattr(column, 'dtype', None)
+        if dtype is not None and dtype.kind in dtype_kinds and not (dtype.kind == 'u' and dtype.itemsize == 8):
+            if dtype.kind == 'M':  # converted the same way as single values, so payloads are byte-identical
+                column = column.astype('datetime64[us]').tolist()
+                return [None if v is None else v.astimezone(timezone.utc) for v in column]
+            return column.tolist()
+
+        column = column.tolist() if dtype is not None else list(column)
+        if trusted:
+            return column
+        return list(map(self._check, column))
 
     def _validate_key(self):
         if not isinstance(self._key, str):
@@ -129,6 +184,19 @@ class MetadataField:
             raise ValueError('Description must be from 1 to 200 characters long')
         return True
 
+    @staticmethod
+    def _validate_localizations(localizations: dict | None, max_length: int):
+        if localizations is None:
+            return True
+        if not isinstance(localizations, dict):
+            raise ValueError('Localizations must me a dict')
+        for locale, text in localizations.items():
+            if not isinstance(locale, str) or not isinstance(text, str):
+                raise ValueError('Localizations must map locales to strings')
+            if not 1 <= len(text) <= max_length:
+                raise ValueError(f'Localization `{locale}` must be from 1 to {max_length} characters long')
+        return True
+
 
 class MetadataBase(type):
     platform_name: str = None
@@ -145,15 +213,35 @@ class MetadataBase(type):
         if not all([isinstance(v, MetadataField) for v in custom_fields.values()]):
             raise ValueError('All custom fields must be `MetadataFieldMeta` instances only')
 
-        if not 1 <= len(custom_fields) <= 5:
-            raise ValueError(f'From 1 to 5 custom fields available only ({len(custom_fields)} provided)')
-
+        # fields are copied, so one field object can be declared by several classes with their own layouts
+        custom_fields = {k: v._copy() for k, v in custom_fields.items()}
         for field_name, field_value in custom_fields.items():
             field_value.key = field_name
+            field_value._validate_key()
+
+        fields = {f.key: f._copy() for parent in parents for f in parent._fields}
+        fields.update(custom_fields)
+        if not 1 <= len(fields) <= 5:
+            raise ValueError(f'From 1 to 5 custom fields available only ({len(fields)} provided)')
+
+        # `platform_username` is an instance slot, so a class level value becomes the default for instances
+        default_username = attributedict.pop('platform_username', None)
+        attributedict.setdefault('__slots__', ())
+        attributedict.update(fields)
+
+        new_cls = super().__new__(cls, clsname, superclasses, attributedict)
 
-        attributedict.update(custom_fields)
+        # field layout is computed once here, instances only keep a list of raw values in the same order
+        for index, field in enumerate(fields.values()):
+            field._index = index
 
-        return super().__new__(cls, clsname, superclasses, attributedict)
+        new_cls._fields = tuple(fields.values())
+        new_cls._keys = tuple(fields)
+        new_cls._setters = {key: (index, field._check) for index, (key, field) in enumerate(fields.items())}
+        if default_username is not None:
+            new_cls._default_username = default_username
+
+        return new_cls
 
     def __init__(cls, clsname, superclasses, attributedict):
         parents = [s for s in superclasses if isinstance(s, MetadataBase)]
@@ -163,78 +251,290 @@ class MetadataBase(type):
                 raise ValueError('`platform_name` must be set up')
 
             if not isinstance(cls.platform_name, str):
-                ValueError('`platform_name` must be a `str`')
+                raise ValueError('`platform_name` must be a `str`')
 
-            # if 'platform_username' not in attributedict:
-            #     attributedict.update({'platform_username': None})
-            #
-            # print(attributedict)
+            cls._encoder = staticmethod(_compile_encoder(cls))
+            cls.schema_fingerprint = schema_fingerprint(cls.to_schema())
 
         super().__init__(clsname, superclasses, attributedict)
 
 
 class Metadata(metaclass=MetadataBase):
-    def __init__(self, args: dict = None, /, **kwargs):
-        self.platform_name: str | None
-        self.platform_username: str | None
+    __slots__ = ('_values', 'platform_username')
+
+    platform_name: str | None
+    platform_username: str | None
 
-        custom_fields = [k for k in dir(self) if isinstance(getattr(self, k), MetadataField)]
-        for f in custom_fields:
-            self.__dict__[f] = getattr(self, f)()
+    schema_fingerprint: str  # see `schema_fingerprint()`
 
-        if 'platform_username' not in dir(self):
-            self.platform_username = None
-        custom_fields.append('platform_username')
+    _fields: tuple[MetadataField, ...] = ()
+    _keys: tuple[str, ...] = ()
+    _setters: dict[str, tuple[int, Callable[[Any], Any]]] = {}  # key -> (index, field value check)
+    _default_username: str | None = None
+    _encoder: Callable[[str | None, Sequence], bytes]
 
+    def __init__(self, args: dict = None, /, **kwargs):
         if args and kwargs:
             raise ValueError('Only args OR kwargs can be provided at the same time')
 
         if args:
             kwargs = args
 
-        for k, v in kwargs.items():
-            if k not in custom_fields:
-                raise ValueError(f'Unknown field `{k}`')
+        self._values = values = [None] * len(self._fields)
+        self.platform_username = self._default_username
 
-            setattr(self, k, v)
+        setters = self._setters
+        for k, v in kwargs.items():
+            try:
+                index, check = setters[k]
+            except KeyError:
+                if k != 'platform_username':
+                    raise ValueError(f'Unknown field `{k}`') from None
+                self.platform_username = v
+            else:
+                values[index] = check(v)
 
-    def __setattr__(self, key, value):
-        try:
-            item_value = self.__dict__[key]  # ???
-        except KeyError:
-            super().__setattr__(key, value)
-            return
+    @classmethod
+    def from_trusted(cls, values: dict | Sequence, platform_username: str = None) -> Metadata:
+        """
+        Fast path for values known to be valid (e.g. loaded from own database): nothing is checked or converted.
+        `values` are either a dict by field key or a sequence in order of fields.
+        """
 
-        if isinstance(item_value, MetadataField):
-            item_value.value = value
-        else:
-            super().__setattr__(key, value)
+        metadata = object.__new__(cls)
+        metadata._values = [values.get(k) for k in cls._keys] if isinstance(values, dict) else list(values)
+        metadata.platform_username = cls._default_username if platform_username is None else platform_username
+        return metadata
 
     def to_dict(self):
         output = {
             'platform_name': self.platform_name,
             'platform_username': self.platform_username,
             'metadata': {
-                v.key: v.value for v in self.__dict__.values() if isinstance(v, MetadataField) and v.value is not None
+                k: v for k, v in zip(self._keys, self._values) if v is not None
             }  # null is not permitted in discord metadata, so we check if v.value is not none
         }
 
         return {k: v for k, v in output.items() if v is not None}  # null is not permitted in discord metadata
 
+    def to_json(self) -> bytes:
+        """
+        Same as `to_dict`, but encoded to JSON (datetimes in ISO 8601) by the encoder compiled for this class
+        """
+
+        return self._encoder(self.platform_username, self._values)
+
+    @classmethod
+    def from_remote(cls, data: dict) -> Metadata:
+        """
+        Parses a role connection as `get_metadata` returns it (values are strings there), unknown keys are ignored
+        """
+
+        remote = data.get('metadata') or {}
+        values = [None] * len(cls._fields)
+        for index, field in enumerate(cls._fields):
+            value = remote.get(field.key)
+            if value is not None:
+                values[index] = _PARSERS[field._type](value)
+
+        metadata = cls.from_trusted(values)
+        metadata.platform_username = data.get('platform_username')
+        return metadata
+
+    def diff(self, other: Metadata) -> dict[str, tuple[Any, Any]]:
+        """
+        Returns `{key: (own value, other value)}` of fields (and `platform_username`) which differ
+        """
+
+        differences = {k: (a, b) for k, a, b in zip(self._keys, self._values, other._values) if a != b}
+        if self.platform_username != other.platform_username:
+            differences['platform_username'] = (self.platform_username, other.platform_username)
+        return differences
+
+    @classmethod
+    def batch(cls, columns: dict[str, Sequence], *, trusted: bool = False) -> MetadataBatch:
+        return MetadataBatch(cls, columns, trusted=trusted)
+
     @classmethod
     def to_schema(cls):
-        output = [v.to_dict() for v in cls.__dict__.values() if isinstance(v, MetadataField)]
+        output = [f.to_dict() for f in cls._fields]
         return output
 
     def __repr__(self):
         return f"{self.__class__.__name__}({self.to_dict()})"
 
-    # def __getattribute__(self, item):
-    #     item_value = super().__getattribute__(item)
-    #     if isinstance(item_value, MetadataField):
-    #         return item_value.value
-    #     else:
-    #         return item_value
+
+# builds metadata of a user by their id, `None` if there is nothing to push
+MetadataProvider = Callable[[str], Awaitable[Metadata | None]]
+
+
+class MetadataBatch:
+    """
+    Metadata of many users given as columns (lists or NumPy arrays of the same length, keyed by field name, plus
+    optional `platform_username`). Every column is validated once (unless `trusted`), iterating yields a JSON body
+    per row, ready for `push_metadata`, without creating `Metadata` instances.
+    """
+
+    def __init__(self, metadata_class: type[Metadata], columns: dict[str, Sequence], *, trusted: bool = False):
+        fields = {f.key: f for f in metadata_class._fields}
+
+        lengths = {len(c) for c in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError('All columns must have the same length')
+
+        self.metadata_class = metadata_class
+        self._length = lengths.pop() if lengths else 0
+        self._usernames = None
+        self._columns = {}
+
+        for key, column in columns.items():
+            if key == 'platform_username':
+                self._usernames = column.tolist() if hasattr(column, 'tolist') else list(column)
+            elif key in fields:
+                self._columns[key] = fields[key]._validate_column(column, trusted)
+            else:
+                raise ValueError(f'Unknown field `{key}`')
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self) -> Iterator[bytes]:
+        encoder = self.metadata_class._encoder
+        default_username = self.metadata_class._default_username
+        usernames = self._usernames if self._usernames is not None else repeat(default_username, self._length)
+        columns = [self._columns.get(k, repeat(None)) for k in self.metadata_class._keys]
+
+        for username, *values in zip(usernames, *columns):
+            yield encoder(username, values)
+
+
+_SCHEMA_KEYS = ('type', 'key', 'name', 'description', 'name_localizations', 'description_localizations')
+
+
+def schema_fingerprint(schema: list[dict]) -> str:
+    """
+    Stable hash of a schema as `Metadata.to_schema` returns it or as Discord sends it back (unknown keys and empty
+    localizations are ignored, field order matters)
+    """
+
+    canonical = [{k: field[k] for k in _SCHEMA_KEYS if field.get(k)} for field in schema]
+    encoded = json.dumps(canonical, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.blake2b(encoded.encode(), digest_size=16).hexdigest()
+
+
+def _compile_check(field: MetadataField) -> Callable[[Any], Any]:
+    """
+    Builds the check of values of `field`, which returns the value to store or raises `ValueError`. Datetimes are
+    converted to UTC, naive ones are taken as local time (as `DiscordToken` does).
+    """
+
+    match field._type:
+        case MetadataType.INT_LTE | MetadataType.INT_GTE | MetadataType.INT_EQ | MetadataType.INT_NE:
+            def check(value):
+                if value.__class__ is int and INT_MIN <= value <= INT_MAX or value is None:
+                    return value
+                if not isinstance(value, int):
+                    raise ValueError(f'Value must me an integer (field `{field._key}`)')
+                if not INT_MIN <= value <= INT_MAX:
+                    raise ValueError(f'Value must be a 64-bit integer (field `{field._key}`)')
+                return value
+
+        case MetadataType.DT_LTE | MetadataType.DT_GTE:
+            def check(value):
+                if value is None:
+                    return None
+                if not isinstance(value, datetime):
+                    raise ValueError(f'Value must me a datetime (field `{field._key}`)')
+                return value.astimezone(timezone.utc)
+
+        case _:
+            def check(value):
+                if value.__class__ is bool or value is None:
+                    return value
+                raise ValueError(f'Value must me a boolean (field `{field._key}`)')
+
+    return check
+
+
+def _parse_int(value: str) -> int:
+    return int(value)
+
+
+def _parse_bool(value: str) -> bool:
+    if isinstance(value, str):
+        return value not in ('0', 'false', '')
+    return bool(value)
+
+
+def _parse_datetime(value: str) -> datetime:
+    return datetime.fromisoformat(value).astimezone(timezone.utc)
+
+
+_PARSERS = {
+    MetadataType.INT_LTE: _parse_int,
+    MetadataType.INT_GTE: _parse_int,
+    MetadataType.INT_EQ: _parse_int,
+    MetadataType.INT_NE: _parse_int,
+    MetadataType.DT_LTE: _parse_datetime,
+    MetadataType.DT_GTE: _parse_datetime,
+    MetadataType.BOOL_EQ: _parse_bool,
+    MetadataType.BOOL_NE: _parse_bool,
+}
+
+
+def _format_int(value: int) -> str:
+    return str(value) if value.__class__ is int else json.dumps(value)  # bool is an int too
+
+
+def _format_bool(value: bool) -> str:
+    return 'true' if value else 'false'
+
+
+def _format_datetime(value: datetime) -> str:
+    return f'"{value.isoformat()}"'
+
+
+_FORMATTERS = {
+    MetadataType.INT_LTE: _format_int,
+    MetadataType.INT_GTE: _format_int,
+    MetadataType.INT_EQ: _format_int,
+    MetadataType.INT_NE: _format_int,
+    MetadataType.DT_LTE: _format_datetime,
+    MetadataType.DT_GTE: _format_datetime,
+    MetadataType.BOOL_EQ: _format_bool,
+    MetadataType.BOOL_NE: _format_bool,
+}
+
+
+def _compile_encoder(metadata_class: MetadataBase) -> Callable[[str | None, Sequence], bytes]:
+    """
+    Builds the JSON encoder of `metadata_class` payloads from its field layout: keys are pre-encoded and every
+    value goes straight to the formatter of its field type. orjson is used instead when installed.
+    """
+
+    platform_name = metadata_class.platform_name
+    keys = metadata_class._keys
+
+    if orjson is not None:
+        def encode(platform_username, values):
+            output = {'platform_name': platform_name}
+            if platform_username is not None:
+                output['platform_username'] = platform_username
+            output['metadata'] = {k: v for k, v in zip(keys, values) if v is not None}
+            return orjson.dumps(output)
+
+        return encode
+
+    head = '{"platform_name":' + json.dumps(platform_name)
+    fields = [(f'"{f.key}":', _FORMATTERS[f._type]) for f in metadata_class._fields]
+
+    def encode(platform_username, values):
+        body = ','.join([key + fmt(v) for (key, fmt), v in zip(fields, values) if v is not None])
+        if platform_username is None:
+            return f'{head},"metadata":{{{body}}}}}'.encode()
+        return f'{head},"platform_username":{json.dumps(platform_username)},"metadata":{{{body}}}}}'.encode()
+
+    return encode
 
 
 # TODO refactor EVERYTHING HERE
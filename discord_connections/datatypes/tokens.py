@@ -1,24 +1,101 @@
-from datetime import timedelta, datetime
-from typing import Optional, Self
+from __future__ import annotations
 
-from pydantic import BaseModel, model_validator
+import time
+from datetime import datetime, timedelta, timezone
+from functools import cache
+from typing import Iterable
 
 
-class DiscordToken(BaseModel):
-    access_token: str
-    refresh_token: str
-    expires_in: timedelta
-    expires_at: Optional[datetime] = None
+class DiscordToken:
+    """
+    OAuth2 token of a user.
 
-    @model_validator(mode='after')
-    def set_expires_at(self) -> Self:
-        if not self.expires_at:
-            self.expires_at = datetime.now() + self.expires_in
-        return self
+    Expiry is kept as `expires_ts`, unix time in seconds, so it does not depend on the local timezone. Construction
+    does not validate anything: use `from_response` for data coming from Discord and `from_row` / `from_rows` for
+    data from own storage.
+    """
+
+    __slots__ = ('access_token', 'refresh_token', '_expires_in', 'expires_ts')
+
+    def __init__(
+            self,
+            access_token: str,
+            refresh_token: str,
+            expires_in: float | timedelta,
+            expires_at: float | datetime = None
+    ):
+        self.access_token = access_token
+        self.refresh_token = refresh_token
+        self._expires_in = expires_in.total_seconds() if isinstance(expires_in, timedelta) else float(expires_in)
+
+        if expires_at is None:
+            self.expires_ts = time.time() + self._expires_in
+        elif isinstance(expires_at, datetime):
+            self.expires_ts = expires_at.timestamp()  # naive datetimes are taken as local time
+        else:
+            self.expires_ts = float(expires_at)
+
+    @classmethod
+    def from_response(cls, data: dict) -> DiscordToken:
+        """
+        Validates a response of the token endpoint
+        """
+
+        response = _token_response().model_validate(data)
+        return cls(response.access_token, response.refresh_token, response.expires_in)
+
+    @classmethod
+    def from_row(cls, access_token: str, refresh_token: str, expires_in: float, expires_ts: float) -> DiscordToken:
+        """
+        Builds a token from values of `to_row`, trusting them
+        """
+
+        token = object.__new__(cls)
+        token.access_token = access_token
+        token.refresh_token = refresh_token
+        token._expires_in = expires_in
+        token.expires_ts = expires_ts
+        return token
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[tuple[str, str, float, float]]) -> list[DiscordToken]:
+        from_row = cls.from_row
+        return [from_row(*row) for row in rows]
+
+    def to_row(self) -> tuple[str, str, float, float]:
+        return self.access_token, self.refresh_token, self._expires_in, self.expires_ts
 
     @property
-    def expired(self):
-        return datetime.now() > self.expires_at
+    def expires_in(self) -> timedelta:
+        return timedelta(seconds=self._expires_in)
+
+    @property
+    def expires_at(self) -> datetime:
+        return datetime.fromtimestamp(self.expires_ts, timezone.utc)
+
+    @property
+    def expired(self) -> bool:
+        return time.time() > self.expires_ts
+
+    def expires_within(self, seconds: float) -> bool:
+        return self.expires_ts - seconds < time.time()
+
+    def __eq__(self, other):
+        if not isinstance(other, DiscordToken):
+            return NotImplemented
+        return self.to_row() == other.to_row()
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(expires_at={self.expires_at.isoformat()})'  # no secrets in logs
+
+
+@cache
+def _token_response():
+    from pydantic import BaseModel
 
+    class TokenResponse(BaseModel):
+        access_token: str
+        refresh_token: str
+        expires_in: float
 
-# TODO TZ awareness?
+    return TokenResponse
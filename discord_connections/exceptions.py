@@ -17,6 +17,66 @@ class RequestError(ClientError):
     def message(self):
         return f"{self.status_code} returned: {self.msg}"
 
+    @classmethod
+    def from_response(cls, status_code: int, msg: str, retry_after: float = None) -> 'RequestError':
+        if status_code == 429:
+            return RateLimitedError(status_code, msg, retry_after)
+        if status_code == 401:
+            return AuthExpiredError(status_code, msg)
+        if status_code >= 500:
+            return ServerError(status_code, msg)
+        return RequestError(status_code, msg)
+
+
+@dataclass
+class RateLimitedError(RequestError):
+    retry_after: float | None = None
+
+    @property
+    def message(self):
+        return f"Rate limited, retry after {self.retry_after}s: {self.msg}"
+
+
+@dataclass
+class AuthExpiredError(RequestError):
+    @property
+    def message(self):
+        return f"Token is expired or revoked: {super().message}"
+
+
+@dataclass
+class ServerError(RequestError):
+    @property
+    def message(self):
+        return f"Discord server error: {super().message}"
+
+
+@dataclass
+class CircuitOpenError(ClientError):
+    retry_in: float
+
+    @property
+    def message(self):
+        return f"Discord is failing, requests are paused for {self.retry_in:.1f}s"
+
+
+@dataclass
+class TokenNotFoundError(ClientError):
+    user_id: int | str
+
+    @property
+    def message(self):
+        return f"No token stored for user {self.user_id}"
+
+
+@dataclass
+class InvalidStateError(ClientError):
+    state: str
+
+    @property
+    def message(self):
+        return "OAuth state is unknown, expired or already used"
+
 
 # class GetOAuthTokenError(RequestError):
 #     @property
@@ -0,0 +1,279 @@
+"""
+Hooks called by the client around every API call. Nothing is called unless an instrumentation is passed to the
+client, so by default instrumentation costs nothing.
+"""
+
+from __future__ import annotations
+
+import bisect
+from collections import defaultdict
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .client import DiscordConnections
+    from .priority import PriorityLanes
+
+
+class Instrumentation:
+    """
+    Base class with no-op hooks, override the ones you need. `route` is a short name of the endpoint,
+    e.g. `PUT /users/@me/role-connection`.
+
+    A call (e.g. one `push_metadata`) makes one or more requests: rate limit waits and retries happen between
+    `on_call` and `on_call_end`, every request sent is reported by `on_request` and `on_response` or `on_error`.
+    """
+
+    def attach(self, client: DiscordConnections) -> None:
+        """
+        Called once by the client this instrumentation is passed to
+        """
+
+    def on_call(self, route: str, method: str) -> Any:
+        """
+        Called when a call starts, returned value is passed to `on_call_end`
+        """
+
+    def on_call_end(self, route: str, error: BaseException | None, context: Any) -> None:
+        ...
+
+    def on_request(self, route: str, method: str) -> Any:
+        """
+        Called before a request is sent, returned value is passed to `on_response` or `on_error` of this request
+        """
+
+    def on_response(self, route: str, status_code: int, elapsed: float, bytes_sent: int, context: Any) -> None:
+        ...
+
+    def on_error(self, route: str, error: Exception, elapsed: float, context: Any) -> None:
+        """
+        Called when a request failed without a response (network error, timeout)
+        """
+
+    def on_rate_limit_wait(self, route: str, waited: float) -> None:
+        ...
+
+    def on_rate_limited(self, route: str, retry_after: float, is_global: bool) -> None:
+        """
+        Called when Discord responded with 429
+        """
+
+    def on_retry(self, route: str, attempt: int, delay: float, error: Exception) -> None:
+        ...
+
+    def on_token_refresh(self) -> None:
+        ...
+
+
+class MultiInstrumentation(Instrumentation):
+    def __init__(self, *instrumentations: Instrumentation):
+        self.instrumentations = instrumentations
+
+    def attach(self, client):
+        for i in self.instrumentations:
+            i.attach(client)
+
+    def on_call(self, route, method):
+        return [i.on_call(route, method) for i in self.instrumentations]
+
+    def on_call_end(self, route, error, context):
+        for i, c in zip(self.instrumentations, context):
+            i.on_call_end(route, error, c)
+
+    def on_request(self, route, method):
+        return [i.on_request(route, method) for i in self.instrumentations]
+
+    def on_response(self, route, status_code, elapsed, bytes_sent, context):
+        for i, c in zip(self.instrumentations, context):
+            i.on_response(route, status_code, elapsed, bytes_sent, c)
+
+    def on_error(self, route, error, elapsed, context):
+        for i, c in zip(self.instrumentations, context):
+            i.on_error(route, error, elapsed, c)
+
+    def on_rate_limit_wait(self, route, waited):
+        for i in self.instrumentations:
+            i.on_rate_limit_wait(route, waited)
+
+    def on_rate_limited(self, route, retry_after, is_global):
+        for i in self.instrumentations:
+            i.on_rate_limited(route, retry_after, is_global)
+
+    def on_retry(self, route, attempt, delay, error):
+        for i in self.instrumentations:
+            i.on_retry(route, attempt, delay, error)
+
+    def on_token_refresh(self):
+        for i in self.instrumentations:
+            i.on_token_refresh()
+
+
+class Histogram:
+    BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1., 2.5, 5., 10.)
+
+    def __init__(self, buckets: tuple[float, ...] = BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last one is +Inf
+        self.sum = 0.
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics(Instrumentation):
+    """
+    Collects counters and latency histograms in memory, `expose()` renders them in Prometheus text format.
+
+    Requests in flight are counted, plus requests in flight and waiting for a slot per priority lane when the client
+    has `PriorityLanes` (httpx does not expose the state of its connection pool).
+    """
+
+    def __init__(self, prefix: str = 'discord_connections'):
+        self.prefix = prefix
+
+        self.latency: dict[str, Histogram] = defaultdict(Histogram)
+        self.responses: dict[tuple[str, int], int] = defaultdict(int)
+        self.errors: dict[tuple[str, str], int] = defaultdict(int)
+        self.rate_limit_wait: dict[str, Histogram] = defaultdict(Histogram)
+        self.rate_limited: dict[tuple[str, bool], int] = defaultdict(int)
+        self.retries: dict[str, int] = defaultdict(int)
+        self.bytes_sent: dict[str, int] = defaultdict(int)
+        self.token_refreshes = 0
+        self.in_flight: dict[str, int] = defaultdict(int)
+        self.lanes: PriorityLanes | None = None
+
+    def attach(self, client):
+        self.lanes = client.rate_limiter.lanes
+
+    def on_request(self, route, method):
+        self.in_flight[route] += 1
+
+    def on_response(self, route, status_code, elapsed, bytes_sent, context):
+        self.in_flight[route] -= 1
+        self.latency[route].observe(elapsed)
+        self.responses[route, status_code] += 1
+        self.bytes_sent[route] += bytes_sent
+
+    def on_error(self, route, error, elapsed, context):
+        self.in_flight[route] -= 1
+        self.latency[route].observe(elapsed)
+        self.errors[route, type(error).__name__] += 1
+
+    def on_rate_limit_wait(self, route, waited):
+        self.rate_limit_wait[route].observe(waited)
+
+    def on_rate_limited(self, route, retry_after, is_global):
+        self.rate_limited[route, is_global] += 1
+
+    def on_retry(self, route, attempt, delay, error):
+        self.retries[route] += 1
+
+    def on_token_refresh(self):
+        self.token_refreshes += 1
+
+    def expose(self) -> str:
+        p = self.prefix
+        lines = []
+
+        def counter(name: str, help_text: str, values: dict[tuple, int], labels: tuple[str, ...], kind='counter'):
+            lines.append(f'# HELP {p}_{name} {help_text}')
+            lines.append(f'# TYPE {p}_{name} {kind}')
+            for key, value in values.items():
+                lines.append(f'{p}_{name}{_labels(zip(labels, key))} {value}')
+
+        def gauge(name: str, help_text: str, values: dict[tuple, int], labels: tuple[str, ...]):
+            counter(name, help_text, values, labels, kind='gauge')
+
+        def histogram(name: str, help_text: str, values: dict[str, Histogram]):
+            lines.append(f'# HELP {p}_{name} {help_text}')
+            lines.append(f'# TYPE {p}_{name} histogram')
+            for route, h in values.items():
+                cumulative = 0
+                for le, count in zip([*map(str, h.buckets), '+Inf'], h.counts):
+                    cumulative += count
+                    lines.append(f'{p}_{name}_bucket{_labels([("route", route), ("le", le)])} {cumulative}')
+                lines.append(f'{p}_{name}_sum{_labels([("route", route)])} {h.sum}')
+                lines.append(f'{p}_{name}_count{_labels([("route", route)])} {h.count}')
+
+        histogram('request_duration_seconds', 'Duration of requests to Discord', self.latency)
+        counter('responses_total', 'Responses by status code', self.responses, ('route', 'status'))
+        counter('errors_total', 'Requests failed without a response', self.errors, ('route', 'error'))
+        histogram('rate_limit_wait_seconds', 'Time spent waiting for rate limits', self.rate_limit_wait)
+        counter('rate_limited_total', '429 responses', self.rate_limited, ('route', 'global'))
+        counter('retries_total', 'Retried requests', {(k,): v for k, v in self.retries.items()}, ('route',))
+        counter('bytes_sent_total', 'Bytes of request bodies', {(k,): v for k, v in self.bytes_sent.items()},
+                ('route',))
+        counter('token_refreshes_total', 'Refreshed tokens', {(): self.token_refreshes}, ())
+        gauge('requests_in_flight', 'Requests sent and not answered yet', {(k,): v for k, v in self.in_flight.items()},
+              ('route',))
+        if self.lanes is not None:
+            in_flight = {(p.name.lower(),): v for p, v in self.lanes.in_flight.items()}
+            waiting = {(p.name.lower(),): v for p, v in self.lanes.waiting.items()}
+            gauge('lane_in_flight', 'Requests in flight by priority lane', in_flight, ('priority',))
+            gauge('lane_waiting', 'Requests waiting for a slot by priority lane', waiting, ('priority',))
+
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(pairs) -> str:
+    labels = ','.join(f'{k}="{_escape(v)}"' for k, v in pairs)
+    return f'{{{labels}}}' if labels else ''
+
+
+def _escape(value) -> str:
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class OpenTelemetryInstrumentation(Instrumentation):
+    """
+    Creates a span per call, current while the call runs, with a client span per request sent as its child and
+    rate limits and retries as its events. Requires `opentelemetry-api`
+    """
+
+    def __init__(self, tracer=None):
+        from opentelemetry import context, trace
+
+        self._context = context
+        self._trace = trace
+        self.tracer = tracer or trace.get_tracer('discord_connections')
+
+    def on_call(self, route, method):
+        span = self.tracer.start_span(route, attributes={'http.request.method': method})
+        return span, self._context.attach(self._trace.set_span_in_context(span))
+
+    def on_call_end(self, route, error, context):
+        span, token = context
+        if error is not None:
+            span.record_exception(error)
+            span.set_status(self._trace.Status(self._trace.StatusCode.ERROR, str(error)))
+        span.end()
+        self._context.detach(token)
+
+    def on_request(self, route, method):
+        return self.tracer.start_span(
+            route, kind=self._trace.SpanKind.CLIENT, attributes={'http.request.method': method}
+        )
+
+    def on_response(self, route, status_code, elapsed, bytes_sent, context):
+        context.set_attribute('http.response.status_code', status_code)
+        context.set_attribute('http.request.body.size', bytes_sent)
+        if status_code >= 400:
+            context.set_status(self._trace.Status(self._trace.StatusCode.ERROR))
+        context.end()
+
+    def on_error(self, route, error, elapsed, context):
+        context.record_exception(error)
+        context.set_status(self._trace.Status(self._trace.StatusCode.ERROR, str(error)))
+        context.end()
+
+    def on_rate_limited(self, route, retry_after, is_global):
+        span = self._trace.get_current_span()
+        span.add_event('rate_limited', {'route': route, 'retry_after': retry_after, 'global': is_global})
+
+    def on_retry(self, route, attempt, delay, error):
+        span = self._trace.get_current_span()
+        span.add_event('retry', {'route': route, 'attempt': attempt, 'delay': delay, 'error': repr(error)})
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import asyncio
+import uuid
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from .datatypes import DiscordToken, Metadata, MetadataProvider, Scope
+from .exceptions import InvalidStateError
+from .storage.states import MemoryStateStore, StateStore
+from .storage.tokens import TokenStore
+
+if TYPE_CHECKING:
+    from .client import DiscordConnections
+
+
+@dataclass
+class LinkResult:
+    user_id: str  # id the token is stored under, see `AccountLinker.get_authorization_url`
+    token: DiscordToken
+    user_data: dict  # response of `get_user_data`
+    metadata: Metadata | None = None
+    pushed: bool = False
+    push_error: Exception | None = None  # of the provider or the push, the account is linked anyway
+
+    @property
+    def discord_user_id(self) -> str:
+        return self.user_data['user']['id']
+
+
+class AccountLinker:
+    """
+    Whole "link account" flow in two calls: `get_authorization_url` to redirect a user to Discord, `link` in the OAuth
+    callback.
+
+    `state` is issued and checked by `states` (pass a shared store, e.g. `SQLiteStateStore`, when callbacks can reach
+    another process). With `tokens`, the token is saved. With `provider`, initial metadata is pushed right away.
+    Requests which do not depend on each other run concurrently.
+    """
+
+    def __init__(
+            self,
+            client: DiscordConnections,
+            *,
+            states: StateStore = None,
+            tokens: TokenStore = None,
+            provider: MetadataProvider = None,
+            state_ttl: float = 300,
+            add_scopes: list[Scope] = None,
+    ):
+        self.client = client
+        self.states = states or MemoryStateStore()
+        self.tokens = tokens
+        self.provider = provider
+        self.state_ttl = state_ttl
+        self.add_scopes = add_scopes
+
+    async def get_authorization_url(self, user_id: int | str = None) -> str:
+        """
+        `user_id` is the id of the user in your application, if known. The token is saved and metadata is built for
+        it, so metadata can be built while the token is being exchanged. Otherwise, the Discord user id is used.
+        """
+
+        state = uuid.uuid4().hex
+        await self.states.add(state, '' if user_id is None else str(user_id), self.state_ttl)
+        return self.client.get_oauth_url(state, add_scopes=self.add_scopes)
+
+    async def link(self, code: str, state: str) -> LinkResult:
+        """
+        Raises `InvalidStateError` if `state` was not issued by `get_authorization_url` or has expired
+        """
+
+        user_id = await self.states.pop(state)
+        if user_id is None:
+            raise InvalidStateError(state)
+
+        # the code is spent once exchanged, so the token is saved before anything else can fail
+        if user_id and self.provider is not None:
+            token, metadata = await asyncio.gather(self.client.get_oauth_token(code), self._provide(user_id))
+            await self._save(user_id, token)
+            user_data, push_error = await asyncio.gather(
+                self.client.get_user_data(token), self._push(user_id, token, metadata)
+            )
+        else:
+            token = await self.client.get_oauth_token(code)
+            user_data = await self.client.get_user_data(token)
+            user_id = user_id or user_data['user']['id']
+            await self._save(user_id, token)
+            metadata = await self._provide(user_id)
+            push_error = await self._push(user_id, token, metadata)
+
+        if isinstance(metadata, Exception):
+            metadata, push_error = None, metadata
+
+        pushed = metadata is not None and push_error is None
+        return LinkResult(user_id, token, user_data, metadata, pushed=pushed, push_error=push_error)
+
+    async def _save(self, user_id: str, token: DiscordToken) -> None:
+        if self.tokens is not None:
+            await self.tokens.set(user_id, token)
+
+    async def _provide(self, user_id: str) -> Metadata | Exception | None:
+        if self.provider is None:
+            return None
+
+        try:
+            return await self.provider(user_id)
+        except Exception as e:
+            return e
+
+    async def _push(self, user_id: str, token: DiscordToken, metadata: Metadata | Exception | None) -> Exception | None:
+        if metadata is None or isinstance(metadata, Exception):
+            return None
+
+        try:
+            await self.client.push_metadata(token, metadata, user_id=user_id, force=True)  # may be a re-link
+        except Exception as e:
+            return e
+        return None
@@ -0,0 +1,148 @@
+"""
+Requests of a client are sent in one of two lanes: interactive (default) or bulk. Background work (`push_metadata_many`,
+`SyncScheduler`, `UpdateQueue`, `Reconciler`, `ShardedRunner`) runs in the bulk lane, so a user who is linking their
+account right now is not queued behind thousands of background pushes.
+
+The lane is taken from a context variable, use `with use_priority(Priority.BULK):` around own background calls.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import Context, ContextVar, copy_context
+from enum import IntEnum
+from typing import Iterator
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0
+    BULK = 1
+
+
+_priority: ContextVar[Priority] = ContextVar('discord_connections_priority', default=Priority.INTERACTIVE)
+
+
+def get_priority() -> Priority:
+    return _priority.get()
+
+
+@contextmanager
+def use_priority(priority: Priority) -> Iterator[None]:
+    """
+    Sends requests made inside in the lane of `priority`, tasks created inside inherit it. Not to be used across
+    `yield` of an async generator, create tasks with `context=bulk_context()` there instead
+    """
+
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def bulk_context() -> Context:
+    """
+    Copy of the current context with bulk priority, for `asyncio.create_task(..., context=bulk_context())`
+    """
+
+    context = copy_context()
+    context.run(_priority.set, Priority.BULK)
+    return context
+
+
+class PriorityLanes:
+    """
+    Limits requests in flight to `concurrency`, of which bulk requests never take the last `reserved` (a tenth by
+    default), and bulk requests wait while any interactive one does.
+
+    Rate limit headroom: bulk requests leave `bucket_reserve` requests of every rate limit window to interactive ones
+    (e.g. of the token endpoint shared by code exchanges and refreshes), and with `bulk_rate` bulk requests are sent
+    at most that many per second (e.g. 40 leaves 10 of the global limit of 50 to interactive requests).
+    """
+
+    def __init__(
+            self,
+            concurrency: int = 100,
+            *,
+            reserved: int = None,
+            bucket_reserve: int = 1,
+            bulk_rate: float = None
+    ):
+        if reserved is None:
+            reserved = concurrency // 10
+        if not 0 <= reserved < concurrency:
+            raise ValueError('`reserved` must be at least 0 and less than `concurrency`')
+
+        self.concurrency = concurrency
+        self.reserved = reserved
+        self.bucket_reserve = bucket_reserve
+        self.bulk_rate = bulk_rate
+
+        self.in_flight = {Priority.INTERACTIVE: 0, Priority.BULK: 0}
+        self._waiters: dict[Priority, deque[asyncio.Future]] = {Priority.INTERACTIVE: deque(), Priority.BULK: deque()}
+        self._next_bulk_at = 0.
+
+    def reset(self) -> None:
+        """
+        Forgets requests in flight and waiting, for use from another event loop
+        """
+
+        self.in_flight = {Priority.INTERACTIVE: 0, Priority.BULK: 0}
+        self._waiters = {Priority.INTERACTIVE: deque(), Priority.BULK: deque()}
+        self._next_bulk_at = 0.
+
+    @property
+    def waiting(self) -> dict[Priority, int]:
+        return {priority: len(waiters) for priority, waiters in self._waiters.items()}
+
+    def _can_send(self, priority: Priority) -> bool:
+        in_flight = self.in_flight[Priority.INTERACTIVE] + self.in_flight[Priority.BULK]
+        if priority is Priority.INTERACTIVE:
+            return in_flight < self.concurrency
+        return (
+            not self._waiters[Priority.INTERACTIVE]
+            and in_flight < self.concurrency
+            and self.in_flight[Priority.BULK] < self.concurrency - self.reserved
+        )
+
+    async def acquire(self, priority: Priority) -> None:
+        if priority is Priority.BULK and self.bulk_rate:
+            now = time.monotonic()
+            send_at = max(now, self._next_bulk_at)
+            self._next_bulk_at = send_at + 1 / self.bulk_rate
+            if send_at > now:
+                await asyncio.sleep(send_at - now)
+
+        waiters = self._waiters[priority]
+        if not waiters and self._can_send(priority):
+            self.in_flight[priority] += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        waiters.append(waiter)
+        try:
+            await waiter
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                self.release(priority)  # the slot was handed over already
+            else:
+                if waiter in waiters:
+                    waiters.remove(waiter)
+                self._wake()  # bulk requests may have waited for this one
+            raise
+
+    def release(self, priority: Priority) -> None:
+        self.in_flight[priority] -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        for priority in Priority:
+            waiters = self._waiters[priority]
+            while waiters and self._can_send(priority):
+                waiter = waiters.popleft()
+                if not waiter.done():
+                    self.in_flight[priority] += 1
+                    waiter.set_result(None)
@@ -0,0 +1,276 @@
+"""
+https://discord.com/developers/docs/topics/rate-limits
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Awaitable, Callable, Protocol
+
+import httpx
+
+from .instrumentation import Instrumentation
+from .priority import Priority, PriorityLanes, get_priority
+
+
+class Bucket:
+    """
+    State of one Discord rate limit bucket (for one route and one authorization).
+
+    Until the first response with rate limit headers is received only one request at a time is let through, after
+    that requests are queued and sent while `remaining` allows, waiting for the reset otherwise.
+    """
+
+    def __init__(self):
+        self.limit: int | None = None
+        self.remaining: int | None = None
+        self.reset_at: float = 0.
+        self.limited: bool = True  # set to False if Discord sends no rate limit headers for this bucket
+        self.pending: int = 0
+
+        self._lock = asyncio.Lock()
+        self._probe: asyncio.Event | None = None
+
+    def reset(self) -> None:
+        """
+        Drops requests in progress and the lock, which belong to an event loop, keeping the state of the window
+        """
+
+        self.pending = 0
+        self._lock = asyncio.Lock()
+        self._probe = None
+
+    @property
+    def idle(self) -> bool:
+        return not self.pending and time.monotonic() >= self.reset_at
+
+    async def acquire(self, reserve: int = 0) -> None:
+        """
+        With `reserve`, that many requests of a known window are left to callers without one, waiting for the next
+        window outside of the queue, so those callers are not stuck behind
+        """
+
+        self.pending += 1
+        try:
+            while (delay := await self._acquire(reserve)) is not None:
+                await asyncio.sleep(delay)
+        except BaseException:
+            self.pending -= 1
+            raise
+
+    async def _acquire(self, reserve: int) -> float | None:
+        async with self._lock:
+            while True:
+                if self._probe is not None:
+                    await self._probe.wait()
+                    continue
+
+                now = time.monotonic()
+                if self.remaining is not None and self.remaining <= 0 and now < self.reset_at:
+                    await asyncio.sleep(self.reset_at - now)
+                    continue
+
+                if not self.limited:
+                    return None
+
+                if self.limit is None or now >= self.reset_at:
+                    # unknown bucket or a new window: send one request and learn the state from its headers
+                    self.limit = None
+                    self._probe = asyncio.Event()
+                    return None
+
+                if self.remaining <= reserve:
+                    return self.reset_at - now
+
+                self.remaining -= 1
+                return None
+
+    def release(self, response: httpx.Response = None) -> None:
+        self.pending -= 1
+
+        if response is not None:
+            self._update(response)
+
+        if self._probe is not None:
+            self._probe.set()
+            self._probe = None
+
+    def block(self, retry_after: float) -> None:
+        self.remaining = 0
+        self.reset_at = max(self.reset_at, time.monotonic() + retry_after)
+
+    def _update(self, response: httpx.Response) -> None:
+        headers = response.headers
+        try:
+            limit = int(headers['X-RateLimit-Limit'])
+            remaining = int(headers['X-RateLimit-Remaining'])
+            reset_at = time.monotonic() + float(headers['X-RateLimit-Reset-After'])
+        except (KeyError, ValueError):
+            # errors (e.g. 5xx of a proxy) may come without headers from limited routes too, so only successes count
+            if response.is_success and self.limit is None and not self.reset_at:
+                self.limited = False
+            return
+
+        # responses can arrive out of order, so inside the same window we only trust a smaller `remaining`
+        if self.limit is None or reset_at > self.reset_at + 1:
+            self.remaining = remaining
+        else:
+            self.remaining = min(self.remaining, remaining)
+
+        self.limit = limit
+        self.reset_at = max(self.reset_at, reset_at)
+
+
+class Budget(Protocol):
+    async def acquire(self) -> None:
+        """
+        Waits until one more request can be sent
+        """
+
+    def pause(self, seconds: float) -> None:
+        """
+        Lets no requests through for `seconds` (global rate limit was hit)
+        """
+
+
+class RateLimiter:
+    """
+    Per-route-bucket rate limiter used by the client.
+
+    Buckets are keyed by `X-RateLimit-Bucket` (or route until it is known) plus authorization, because OAuth2 limits
+    are applied per user token. 429 responses are waited out and retried up to `max_retries` times.
+
+    `budget` limits all requests together, e.g. to share the global limit between processes
+    (see `sharding.SharedBudget`). With `lanes`, interactive requests get reserved concurrency and rate limit headroom
+    over bulk ones (see `priority`).
+    """
+
+    SWEEP_EVERY = 1000
+
+    def __init__(self, *, max_retries: int = 5, budget: Budget = None, lanes: PriorityLanes = None):
+        self.max_retries = max_retries
+        self.budget = budget
+        self.lanes = lanes
+        self.instrumentation: Instrumentation | None = None
+
+        self._buckets: dict[str, Bucket] = {}
+        self._hashes: dict[str, str] = {}
+        self._global_reset_at: float = 0.
+        self._lookups = 0
+
+    def reset(self) -> None:
+        """
+        Drops the state bound to the current event loop (locks, queued requests), called by the client when it is
+        used from another loop. What is known about buckets is kept
+        """
+
+        for bucket in self._buckets.values():
+            bucket.reset()
+        if self.lanes is not None:
+            self.lanes.reset()
+
+    async def request(
+            self,
+            route: str,
+            identity: str,
+            send: Callable[[], Awaitable[httpx.Response]]
+    ) -> httpx.Response:
+        instrumentation = self.instrumentation
+        lanes = self.lanes
+        priority = get_priority()
+        reserve = lanes.bucket_reserve if lanes is not None and priority is Priority.BULK else 0
+
+        for attempt in range(self.max_retries + 1):
+            if instrumentation is not None:
+                started = time.perf_counter()
+
+            await self._wait_global()
+            bucket = self._get_bucket(route, identity)
+            await bucket.acquire(reserve)
+            try:
+                if self.budget is not None:
+                    await self.budget.acquire()
+                if lanes is not None:
+                    await lanes.acquire(priority)
+            except BaseException:
+                bucket.release()
+                raise
+
+            if instrumentation is not None:
+                instrumentation.on_rate_limit_wait(route, time.perf_counter() - started)  # noqa
+
+            try:
+                response = await send()
+            except BaseException:
+                bucket.release()
+                raise
+            finally:
+                if lanes is not None:
+                    lanes.release(priority)
+            bucket.release(response)
+            self._remember_hash(route, identity, bucket, response)
+
+            if response.status_code != 429 or attempt == self.max_retries:
+                return response
+
+            retry_after = get_retry_after(response)
+            is_global = bool(response.headers.get('X-RateLimit-Global')) or \
+                response.headers.get('X-RateLimit-Scope') == 'global'
+
+            if instrumentation is not None:
+                instrumentation.on_rate_limited(route, retry_after, is_global)
+
+            if is_global:
+                self._global_reset_at = max(self._global_reset_at, time.monotonic() + retry_after)
+                if self.budget is not None:
+                    self.budget.pause(retry_after)
+            else:
+                bucket.block(retry_after)
+
+        raise AssertionError('unreachable')
+
+    async def _wait_global(self) -> None:
+        while (delay := self._global_reset_at - time.monotonic()) > 0:
+            await asyncio.sleep(delay)
+
+    def _get_bucket(self, route: str, identity: str) -> Bucket:
+        self._lookups += 1
+        if self._lookups % self.SWEEP_EVERY == 0:
+            self._sweep()
+
+        key = f'{self._hashes.get(route, route)}:{identity}'
+        try:
+            return self._buckets[key]
+        except KeyError:
+            bucket = self._buckets[key] = Bucket()
+            return bucket
+
+    def _remember_hash(self, route: str, identity: str, bucket: Bucket, response: httpx.Response) -> None:
+        bucket_hash = response.headers.get('X-RateLimit-Bucket')
+        if not bucket_hash or self._hashes.get(route) == bucket_hash:
+            return
+
+        old_key = f'{self._hashes.get(route, route)}:{identity}'
+        self._hashes[route] = bucket_hash
+        if self._buckets.get(old_key) is bucket:
+            del self._buckets[old_key]
+        shared = self._buckets.setdefault(f'{bucket_hash}:{identity}', bucket)
+        if shared is not bucket:  # another route of the same bucket was seen first, it must learn this response
+            shared._update(response)
+
+    def _sweep(self) -> None:
+        for key in [k for k, b in self._buckets.items() if b.idle]:
+            del self._buckets[key]
+
+
+def get_retry_after(response: httpx.Response) -> float:
+    try:
+        return float(response.json()['retry_after'])
+    except (ValueError, KeyError, TypeError):
+        pass
+
+    try:
+        return float(response.headers['Retry-After'])
+    except (KeyError, ValueError):
+        return 1.
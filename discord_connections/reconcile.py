@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from contextlib import aclosing
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, AsyncIterable, AsyncIterator, Iterable
+
+from .bulk import _aiter
+from .cache import ResponseCache
+from .datatypes import Metadata
+from .priority import bulk_context
+from .storage.checkpoints import CheckpointStore
+from .token_manager import TokenManager
+
+if TYPE_CHECKING:
+    from .client import DiscordConnections
+
+
+ReconcileItem = tuple[int | str, Metadata]  # user id and metadata as it must be according to own data
+
+
+@dataclass
+class ReconcileResult:
+    user_id: str
+    local: Metadata
+    remote: Metadata | None = None
+    differences: dict[str, tuple[Any, Any]] = field(default_factory=dict)  # key -> (local value, remote value)
+    pushed: bool = False
+    error: Exception | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def drifted(self) -> bool:
+        return bool(self.differences)
+
+
+@dataclass
+class ReconcileStats:
+    checked: int = 0
+    drifted: int = 0
+    pushed: int = 0
+    failed: int = 0
+    resumed: int = 0  # skipped as checked by the interrupted run
+
+
+class Reconciler:
+    """
+    Finds users whose role connection on Discord differs from their metadata according to own data, and with
+    `fix=True` pushes metadata of those users only.
+
+    Remote role connections are fetched in the bulk lane with at most `concurrency` requests in flight. With
+    `checkpoints`, every checked user is saved there (every `batch_size` users), so an interrupted run continues with
+    `resume=True` instead of starting over.
+    """
+
+    def __init__(
+            self,
+            client: DiscordConnections,
+            tokens: TokenManager,
+            *,
+            checkpoints: CheckpointStore = None,
+            fix: bool = False,
+            concurrency: int = 10,
+            batch_size: int = 500,
+    ):
+        if concurrency < 1:
+            raise ValueError('`concurrency` must be at least 1')
+
+        self.client = client
+        self.tokens = tokens
+        self.checkpoints = checkpoints
+        self.fix = fix
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.stats = ReconcileStats()
+
+    async def run(
+            self,
+            items: Iterable[ReconcileItem] | AsyncIterable[ReconcileItem],
+            *,
+            resume: bool = False
+    ) -> AsyncIterator[ReconcileResult]:
+        """
+        Yields a result for every checked user, in order of completion. If the run is interrupted, close it
+        (`await run.aclose()`, or `contextlib.aclosing`), so users checked so far are saved to `checkpoints`
+        """
+
+        self.stats = ReconcileStats()
+        if self.checkpoints is not None and not resume:
+            await self.checkpoints.clear()
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        batch = []
+        async for user_id, local in _aiter(items):
+            batch.append((str(user_id), local))
+            if len(batch) >= self.batch_size:
+                async with aclosing(self._run_batch(batch, semaphore, resume)) as results:  # saves checkpoints
+                    async for result in results:
+                        yield result
+                batch = []
+
+        if batch:
+            async with aclosing(self._run_batch(batch, semaphore, resume)) as results:
+                async for result in results:
+                    yield result
+
+    async def _run_batch(
+            self,
+            batch: list[tuple[str, Metadata]],
+            semaphore: asyncio.Semaphore,
+            resume: bool
+    ) -> AsyncIterator[ReconcileResult]:
+        if self.checkpoints is not None and resume:
+            done = await self.checkpoints.get_many(user_id for user_id, _ in batch)
+            self.stats.resumed += len(done)
+            batch = [(user_id, local) for user_id, local in batch if user_id not in done]
+
+        tasks = [
+            asyncio.create_task(self._check(user_id, local, semaphore), context=bulk_context())
+            for user_id, local in batch
+        ]
+        checked = {}
+        try:
+            for task in asyncio.as_completed(tasks):
+                result = await task
+                self._count(result)
+                if result.ok:
+                    checked[result.user_id] = time.time()
+                yield result
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if self.checkpoints is not None and checked:
+                await self.checkpoints.set_many(checked)
+
+    async def _check(self, user_id: str, local: Metadata, semaphore: asyncio.Semaphore) -> ReconcileResult:
+        result = ReconcileResult(user_id, local)
+        try:
+            async with semaphore:
+                token = await self.tokens.get_valid_token(user_id)
+                if self.client.cache is not None:
+                    self.client.cache.invalidate(token.access_token, ResponseCache.METADATA)  # must be fresh
+
+                result.remote = local.from_remote(await self.client.get_metadata(token))
+                result.differences = local.diff(result.remote)
+                if result.drifted and self.fix:
+                    await self.client.push_metadata(token, local, user_id=user_id, force=True)
+                    result.pushed = True
+        except Exception as e:
+            result.error = e
+        return result
+
+    def _count(self, result: ReconcileResult) -> None:
+        if not result.ok:
+            self.stats.failed += 1
+            return
+
+        self.stats.checked += 1
+        self.stats.drifted += result.drifted
+        self.stats.pushed += result.pushed
@@ -0,0 +1,317 @@
+"""
+Recording of real traffic and its replay, to reproduce production load locally and compare versions of the client:
+
+    client = Client(..., transport=RecordingTransport('traffic.jsonl'))  # requests go to Discord and are recorded
+    client = Client(..., transport=ReplayTransport('traffic.jsonl', speed=2.))  # served from the recording
+    report = await replay_traffic(client, 'traffic.jsonl', speed=2.)  # requests sent as they were recorded
+
+Recordings are JSON lines, one request per line, appended as responses arrive:
+
+    {"at": 0.012, "elapsed": 0.087, "method": "PUT", "path": "/api/v10/...", "auth": "Bearer redacted-1f2e...",
+     "request": "{...}", "status": 200, "headers": {"x-ratelimit-remaining": "4", ...}, "response": "{...}"}
+
+Secrets never reach the file: authorization, client secret, codes and tokens are replaced by pseudonyms, the same
+secret gets the same pseudonym within a recording, so e.g. a refreshed token can be followed.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import secrets
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Iterator
+from urllib.parse import parse_qsl, urlencode
+
+import httpx
+
+from .datatypes import DiscordToken
+
+if TYPE_CHECKING:
+    from .client import DiscordConnections
+
+
+SECRET_FIELDS = frozenset({'client_secret', 'code', 'access_token', 'refresh_token'})
+RECORDED_HEADERS = re.compile(r'x-ratelimit-.*|retry-after')
+TIMING_HEADERS = frozenset({'x-ratelimit-reset-after', 'retry-after'})  # scaled by `speed` on replay
+
+
+@dataclass
+class Exchange:
+    at: float  # seconds since the recording started
+    elapsed: float  # until the response was received
+    method: str
+    path: str
+    auth: str | None
+    request: str | None
+    status: int
+    headers: dict[str, str]
+    response: str
+
+    @property
+    def form(self) -> dict[str, str]:
+        return dict(parse_qsl(self.request or ''))
+
+
+def load_recording(path: str | os.PathLike) -> Iterator[Exchange]:
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            if line.strip():
+                yield Exchange(**json.loads(line))
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """
+    Sends requests through `transport` (a plain `httpx.AsyncHTTPTransport()` by default, pass your own for custom
+    limits or HTTP/2) and appends every exchange to `path`, with secrets redacted.
+
+    Exchanges are written `buffer_size` at a time in a thread, so the event loop does not wait for the disk, and on
+    `flush()` and `aclose()` (closing the client closes its transport).
+    """
+
+    def __init__(
+            self,
+            path: str | os.PathLike,
+            transport: httpx.AsyncBaseTransport = None,
+            *,
+            buffer_size: int = 100
+    ):
+        self.transport = transport or httpx.AsyncHTTPTransport()
+        self.buffer_size = buffer_size
+        self.recorded = 0
+
+        self._file = open(path, 'a', encoding='utf-8')
+        self._buffer: list[str] = []
+        self._writing = asyncio.Lock()
+        self._key = secrets.token_bytes(16)  # pseudonyms can't be matched against known tokens
+        self._started = time.monotonic()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        at = time.monotonic()
+        response = await self.transport.handle_async_request(request)
+        try:
+            content = await response.aread()
+        finally:
+            await response.aclose()
+        elapsed = time.monotonic() - at
+
+        exchange = {
+            'at': round(at - self._started, 6),
+            'elapsed': round(elapsed, 6),
+            'method': request.method,
+            'path': request.url.path,
+            'auth': self._redact_auth(request.headers.get('Authorization')),
+            'request': self._redact_request(request) if request.content else None,
+            'status': response.status_code,
+            'headers': {k: v for k, v in response.headers.items() if RECORDED_HEADERS.fullmatch(k)},
+            'response': self._redact_json(content.decode(errors='replace')),
+        }
+        if not self._file.closed:
+            self._buffer.append(json.dumps(exchange, separators=(',', ':')) + '\n')
+            self.recorded += 1
+            if len(self._buffer) >= self.buffer_size:
+                await self.flush()
+
+        # content is decoded already, so it must not be decoded again by the client
+        headers = [(k, v) for k, v in response.headers.items() if k not in ('content-encoding', 'content-length')]
+        return httpx.Response(response.status_code, headers=headers, content=content, extensions=response.extensions)
+
+    async def flush(self) -> None:
+        async with self._writing:  # keeps lines in order
+            lines, self._buffer = self._buffer, []
+            if lines and not self._file.closed:
+                await asyncio.to_thread(self._write, lines)
+
+    def _write(self, lines: list[str]) -> None:
+        self._file.writelines(lines)
+        self._file.flush()
+
+    async def aclose(self) -> None:
+        await self.flush()
+        self._file.close()
+        await self.transport.aclose()
+
+    def _pseudonym(self, secret: str) -> str:
+        return 'redacted-' + hashlib.blake2b(secret.encode(), digest_size=8, key=self._key).hexdigest()
+
+    def _redact_auth(self, authorization: str | None) -> str | None:
+        if not authorization:
+            return None
+        scheme, _, credentials = authorization.partition(' ')
+        return f'{scheme} {self._pseudonym(credentials)}'
+
+    def _redact_request(self, request: httpx.Request) -> str:
+        body = request.content.decode(errors='replace')
+        if request.headers.get('Content-Type', '').startswith('application/x-www-form-urlencoded'):
+            form = parse_qsl(body, keep_blank_values=True)
+            return urlencode([(k, self._pseudonym(v) if k in SECRET_FIELDS else v) for k, v in form])
+        return self._redact_json(body)
+
+    def _redact_json(self, body: str) -> str:
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return body
+
+        if isinstance(data, dict) and SECRET_FIELDS.intersection(data):
+            data = {k: self._pseudonym(v) if k in SECRET_FIELDS and isinstance(v, str) else v for k, v in data.items()}
+            return json.dumps(data, separators=(',', ':'))
+        return body
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """
+    Answers requests with responses of a recording, including rate limit headers and 429s. Responses are served per
+    method and path in recorded order (from the start again when they run out, unless `cycle=False`, then 404).
+
+    Every response takes as long as it took when recorded divided by `speed`, timing headers are scaled the same way,
+    `speed=None` answers at once and zeroes them.
+    """
+
+    def __init__(self, path: str | os.PathLike, *, speed: float | None = 1., cycle: bool = True):
+        self.speed = speed
+        self.cycle = cycle
+        self.served = 0
+
+        self._exchanges: dict[tuple[str, str], list[Exchange]] = {}
+        for exchange in load_recording(path):
+            self._exchanges.setdefault((exchange.method, exchange.path), []).append(exchange)
+        self._queues = {key: deque(exchanges) for key, exchanges in self._exchanges.items()}
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        key = request.method, request.url.path
+        queue = self._queues.get(key)
+        if queue is not None and not queue and self.cycle:
+            queue.extend(self._exchanges[key])
+        if not queue:
+            return httpx.Response(404, json={'message': '404: Not Found', 'code': 0})
+
+        exchange = queue.popleft()
+        self.served += 1
+        if self.speed:
+            await asyncio.sleep(exchange.elapsed / self.speed)
+
+        await request.aread()
+        return httpx.Response(
+            exchange.status,
+            headers={'Content-Type': 'application/json', **self._scale_headers(exchange.headers)},
+            content=self._scale_body(exchange),
+        )
+
+    def _scale_headers(self, headers: dict[str, str]) -> dict[str, str]:
+        if self.speed == 1:
+            return headers
+        return {k: f'{self._scale(float(v)):.3f}' if k in TIMING_HEADERS else v for k, v in headers.items()}
+
+    def _scale_body(self, exchange: Exchange) -> bytes:
+        if exchange.status != 429 or self.speed == 1:
+            return exchange.response.encode()
+        try:
+            data = json.loads(exchange.response)
+            data['retry_after'] = self._scale(float(data['retry_after']))
+        except (ValueError, KeyError, TypeError):
+            return exchange.response.encode()
+        return json.dumps(data).encode()
+
+    def _scale(self, seconds: float) -> float:
+        return seconds / self.speed if self.speed else 0.
+
+
+@dataclass
+class ReplayReport:
+    sent: int = 0
+    failed: int = 0
+    skipped: int = 0  # requests the client has no call for
+    seconds: float = 0.
+    max_lag: float = 0.  # how far sending fell behind the recorded schedule, seconds
+
+    @property
+    def requests_per_second(self) -> float:
+        return self.sent / self.seconds if self.seconds else 0.
+
+
+async def replay_traffic(
+        client: DiscordConnections,
+        path: str | os.PathLike,
+        *,
+        speed: float = 1.
+) -> ReplayReport:
+    """
+    Makes the same calls through `client` as were recorded in `path`, at recorded moments divided by `speed`, and
+    waits for all of them. Redacted tokens are used as they are, so the client is expected to run against
+    `ReplayTransport` (or any stand-in accepting any token)
+    """
+
+    report = ReplayReport()
+    tasks = set()
+
+    async def call(exchange: Exchange) -> None:
+        try:
+            await _call(client, exchange)
+        except Exception:
+            report.failed += 1
+        else:
+            report.sent += 1
+
+    started = time.monotonic()
+    for exchange in load_recording(path):
+        if _route(exchange) is None:
+            report.skipped += 1
+            continue
+
+        delay = started + exchange.at / speed - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        else:
+            report.max_lag = max(report.max_lag, -delay)
+
+        task = asyncio.create_task(call(exchange))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    if tasks:
+        await asyncio.gather(*tasks)
+    report.seconds = time.monotonic() - started
+    return report
+
+
+_ROUTES = [
+    ('POST', re.compile(r'/api/v10/oauth2/token'), 'token'),
+    ('GET', re.compile(r'/api/v10/oauth2/@me'), 'user_data'),
+    ('GET', re.compile(r'/api/v10/users/@me/applications/\d+/role-connection'), 'get_metadata'),
+    ('PUT', re.compile(r'/api/v10/users/@me/applications/\d+/role-connection'), 'push_metadata'),
+    ('GET', re.compile(r'/api/v10/applications/\d+/role-connections/metadata'), 'get_schema'),
+]
+
+
+def _route(exchange: Exchange) -> str | None:
+    for method, pattern, name in _ROUTES:
+        if exchange.method == method and pattern.fullmatch(exchange.path):
+            return name
+    return None
+
+
+async def _call(client: DiscordConnections, exchange: Exchange) -> None:
+    name = _route(exchange)
+    _, _, access_token = (exchange.auth or '').partition(' ')
+    token = DiscordToken(access_token, '', 604800)
+
+    if name == 'token':
+        form = exchange.form
+        if form.get('grant_type') == 'refresh_token':
+            await client.refresh_token(DiscordToken('', form.get('refresh_token', ''), 0))
+        else:
+            await client.get_oauth_token(form.get('code', ''))
+    elif name == 'user_data':
+        await client.get_user_data(token)
+    elif name == 'get_metadata':
+        await client.get_metadata(token)
+    elif name == 'push_metadata':
+        await client.push_metadata(token, (exchange.request or '{}').encode(), force=True)
+    elif name == 'get_schema':
+        await client.get_metadata_schema()
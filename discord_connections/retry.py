@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import random
+import time
+from dataclasses import dataclass
+
+import httpx
+
+from .exceptions import CircuitOpenError, ServerError
+
+# errors raised before the request could reach Discord, safe to retry for any method
+_NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    Retries of transient failures (5xx and network errors) with exponential backoff and full jitter.
+
+    Requests with a method from `idempotent_methods` (e.g. PUT of a role connection) are retried after any transient
+    failure, other ones (POST of token exchange, which consumes the code) only if they could not be sent at all.
+    """
+
+    max_attempts: int = 3
+    base_delay: float = .5
+    max_delay: float = 10.
+    deadline: float | None = 30.  # seconds for all attempts of one call
+    idempotent_methods: frozenset[str] = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+
+    def is_retryable(self, method: str, error: Exception) -> bool:
+        if isinstance(error, _NOT_SENT_ERRORS):
+            return True
+        if method.upper() not in self.idempotent_methods:
+            return False
+        return isinstance(error, (ServerError, httpx.TransportError))
+
+    def next_delay(self, method: str, error: Exception, attempt: int, started: float) -> float | None:
+        """
+        Returns how long to wait before the next attempt, or `None` to give up; `attempt` starts from 0
+        """
+
+        if attempt + 1 >= self.max_attempts or not self.is_retryable(method, error):
+            return None
+
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if self.deadline is not None and time.monotonic() + delay - started > self.deadline:
+            return None
+        return delay
+
+
+NO_RETRY = RetryPolicy(max_attempts=1)
+
+
+class CircuitBreaker:
+    """
+    Fails fast with `CircuitOpenError` after `failure_threshold` consecutive failures (5xx or network errors), for
+    `recovery_time` seconds. After that a single probe request is let through: its success closes the circuit,
+    its failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 10, recovery_time: float = 30.):
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._probing = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    @staticmethod
+    def is_failure(error: Exception) -> bool:
+        return isinstance(error, (ServerError, httpx.TransportError))
+
+    def check(self) -> None:
+        if self.opened_at is None:
+            return
+
+        retry_in = self.opened_at + self.recovery_time - time.monotonic()
+        if retry_in > 0 or self._probing:
+            raise CircuitOpenError(max(retry_in, 0.))
+        self._probing = True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def cancel_probe(self) -> None:
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._probing or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        self._probing = False
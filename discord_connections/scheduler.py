@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import logging
+import time
+from datetime import timedelta
+from typing import TYPE_CHECKING
+
+from .datatypes import DiscordToken, MetadataProvider
+from .exceptions import TokenNotFoundError
+from .priority import Priority, use_priority
+from .storage.checkpoints import CheckpointStore, MemoryCheckpointStore
+from .token_manager import TokenManager
+
+if TYPE_CHECKING:
+    from .client import DiscordConnections
+
+
+logger = logging.getLogger(__name__)
+
+
+class _User:
+    __slots__ = ('last_synced', 'changed', 'expires_at', 'version')
+
+    def __init__(self, last_synced: float = 0., expires_at: float = float('inf')):
+        self.last_synced = last_synced
+        self.changed = False
+        self.expires_at = expires_at
+        self.version = 0
+
+
+class SyncScheduler:
+    """
+    Continuously keeps metadata of all linked users up to date.
+
+    Users are taken from the token store of `tokens`, metadata of each of them is built by `provider` (`None` means
+    nothing to push). Most stale users go first, users marked with `mark_changed` are moved ahead by
+    `changed_boost` and users whose token expires within `tokens.renew_within` by `expiry_boost`. No user is synced
+    more often than every `min_interval`. Sync times are saved to `checkpoints` after every batch, so after a restart
+    recently synced users are not synced again.
+    """
+
+    def __init__(
+            self,
+            client: DiscordConnections,
+            tokens: TokenManager,
+            provider: MetadataProvider,
+            *,
+            checkpoints: CheckpointStore = None,
+            min_interval: timedelta = timedelta(hours=12),
+            retry_interval: timedelta = timedelta(minutes=15),
+            changed_boost: timedelta = timedelta(days=1),
+            expiry_boost: timedelta = timedelta(hours=1),
+            batch_size: int = 100,
+            concurrency: int = 10,
+    ):
+        self.client = client
+        self.tokens = tokens
+        self.provider = provider
+        self.checkpoints = checkpoints or MemoryCheckpointStore()
+        self.min_interval = min_interval.total_seconds()
+        self.retry_interval = retry_interval.total_seconds()
+        self.changed_boost = changed_boost.total_seconds()
+        self.expiry_boost = expiry_boost.total_seconds()
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+
+        self.synced = 0
+        self.failed = 0
+
+        self._users: dict[str, _User] = {}
+        self._ready: list[tuple[float, int, str, int]] = []  # (priority, seq, user_id, version), smaller goes first
+        self._waiting: list[tuple[float, int, str, int]] = []  # (due_at, seq, user_id, version)
+        self._seq = 0
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._runner: asyncio.Task | None = None
+
+    async def load(self) -> None:
+        """
+        Schedules every user of the token store, resuming from checkpoints
+        """
+
+        async for page in self.tokens.store.iter_all(page_size=self.batch_size * 10):
+            synced = await self.checkpoints.get_many(user_id for user_id, _ in page)
+            for user_id, token in page:
+                user = self._users.setdefault(user_id, _User())
+                user.last_synced = synced.get(user_id, user.last_synced)
+                user.expires_at = token.expires_ts
+                self._schedule(user_id, user)
+
+    def add(self, user_id: int | str, *, changed: bool = False) -> None:
+        """
+        Schedules a user (e.g. just linked), `changed=True` tells that their source data has changed
+        """
+
+        user_id = str(user_id)
+        user = self._users.setdefault(user_id, _User())
+        user.changed = user.changed or changed
+        self._schedule(user_id, user)
+        self._wakeup.set()
+
+    def mark_changed(self, user_id: int | str) -> None:
+        self.add(user_id, changed=True)
+
+    def remove(self, user_id: int | str) -> None:
+        self._users.pop(str(user_id), None)  # queued entries of unknown users are dropped when popped
+
+    def __len__(self):
+        return len(self._users)
+
+    def _schedule(self, user_id: str, user: _User) -> None:
+        user.version += 1
+        self._seq += 1
+
+        due_at = user.last_synced + self.min_interval
+        if due_at > time.time():
+            heapq.heappush(self._waiting, (due_at, self._seq, user_id, user.version))
+            return
+
+        priority = user.last_synced
+        if user.changed:
+            priority -= self.changed_boost
+        if user.expires_at - time.time() < self.tokens.renew_within.total_seconds():
+            priority -= self.expiry_boost
+        heapq.heappush(self._ready, (priority, self._seq, user_id, user.version))
+
+    def _is_current(self, user_id: str, version: int) -> bool:
+        user = self._users.get(user_id)
+        return user is not None and user.version == version
+
+    def _next_batch(self) -> list[tuple[str, int]]:
+        now = time.time()
+        while self._waiting and self._waiting[0][0] <= now:
+            _, _, user_id, version = heapq.heappop(self._waiting)
+            if self._is_current(user_id, version):
+                self._schedule(user_id, self._users[user_id])
+
+        batch = []
+        while self._ready and len(batch) < self.batch_size:
+            _, _, user_id, version = heapq.heappop(self._ready)
+            if self._is_current(user_id, version):
+                batch.append((user_id, version))
+        return batch
+
+    async def _sleep_until_due(self) -> None:
+        while self._waiting and not self._is_current(*self._waiting[0][2:]):
+            heapq.heappop(self._waiting)
+
+        timeout = self._waiting[0][0] - time.time() if self._waiting else None
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _sync_one(self, user_id: str) -> DiscordToken | None:
+        try:
+            token = await self.tokens.get_valid_token(user_id)
+            metadata = await self.provider(user_id)
+            if metadata is not None:
+                await self.client.push_metadata(token, metadata, user_id=user_id)
+        except TokenNotFoundError:
+            self.remove(user_id)  # unlinked meanwhile
+        except Exception as e:
+            logger.warning("Failed to sync metadata of user %s: %r", user_id, e)
+        else:
+            return token
+
+    async def _sync_batch(self, batch: list[tuple[str, int]]) -> None:
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def sync(user_id: str) -> DiscordToken | None:
+            async with semaphore:
+                return await self._sync_one(user_id)
+
+        results = await asyncio.gather(*[sync(user_id) for user_id, _ in batch])
+
+        now = time.time()
+        checkpoints = {}
+        for (user_id, version), token in zip(batch, results):
+            user = self._users.get(user_id)
+            if user is None:
+                continue
+
+            if token is not None:
+                self.synced += 1
+                user.last_synced = checkpoints[user_id] = now
+                user.expires_at = token.expires_ts
+                if user.version == version:  # otherwise changed again while syncing
+                    user.changed = False
+            else:
+                self.failed += 1
+                # try again after `retry_interval`, but not sooner than `min_interval` allows
+                user.last_synced = max(user.last_synced, now - self.min_interval + self.retry_interval)
+
+            self._schedule(user_id, user)
+
+        await self.checkpoints.set_many(checkpoints)
+
+    async def run(self) -> None:
+        """
+        Syncs users until `stop()` is called, the batch in progress is finished and saved before returning. Requests
+        are sent in the bulk lane
+        """
+
+        self._stopping = False
+        with use_priority(Priority.BULK):
+            while not self._stopping:
+                batch = self._next_batch()
+                if batch:
+                    await self._sync_batch(batch)
+                else:
+                    await self._sleep_until_due()
+
+    async def start(self) -> None:
+        if self._runner is None:
+            await self.load()
+            self._runner = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        self._stopping = True
+        self._wakeup.set()
+        if self._runner is not None:
+            await self._runner
+            self._runner = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
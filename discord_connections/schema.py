@@ -0,0 +1,123 @@
+"""
+Registers metadata schemas of one or many applications, skipping those already registered
+
+    python -m discord_connections.schema [--store schemas.sqlite3] [--force] [--check] APP [APP ...]
+
+APP is `module:MetadataClass` or `module:MetadataClass@client_id`. Bot token of an application is read from
+`DISCORD_TOKEN_<client_id>` or `DISCORD_TOKEN`, client id defaults to `CLIENT_ID`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sys
+from collections import Counter
+from dataclasses import dataclass
+from importlib import import_module
+
+from .client import DiscordConnections
+from .datatypes import Metadata
+from .datatypes.metadata import schema_fingerprint
+from .storage.schemas import SchemaStore, SQLiteSchemaStore
+
+
+@dataclass
+class App:
+    metadata: type[Metadata]
+    client_id: str
+    discord_token: str
+
+    @classmethod
+    def parse(cls, spec: str) -> App:
+        path, _, client_id = spec.partition('@')
+        module, _, name = path.partition(':')
+        if not module or not name:
+            raise ValueError(f'`{spec}` must be `module:MetadataClass[@client_id]`')
+
+        metadata = getattr(import_module(module), name)
+        if not isinstance(metadata, type) or not issubclass(metadata, Metadata):
+            raise ValueError(f'`{path}` is not a `Metadata` subclass')
+
+        client_id = client_id or os.environ.get('CLIENT_ID')
+        if not client_id:
+            raise ValueError(f'No client id for `{spec}`, add `@client_id` or set CLIENT_ID')
+
+        discord_token = os.environ.get(f'DISCORD_TOKEN_{client_id}') or os.environ.get('DISCORD_TOKEN')
+        if not discord_token:
+            raise ValueError(f'No bot token for {client_id}, set DISCORD_TOKEN_{client_id} or DISCORD_TOKEN')
+
+        return cls(metadata, client_id, discord_token)
+
+
+async def ensure_schemas(
+        apps: list[App],
+        *,
+        store: SchemaStore = None,
+        force: bool = False,
+        check: bool = False
+) -> dict[str, str | Exception]:
+    """
+    Returns a status per client id: 'registered', 'unchanged', 'outdated' (with `check`, nothing is registered then)
+    or the error. Client ids must be unique, one application has one schema
+    """
+
+    client_ids = [app.client_id for app in apps]
+    if len(set(client_ids)) != len(client_ids):
+        raise ValueError('Every application must be given once, client ids repeat')
+
+    async def ensure(app: App) -> str:
+        async with DiscordConnections(app.client_id, None, None, app.discord_token) as client:
+            if check:
+                registered = schema_fingerprint(await client.get_metadata_schema())
+                return 'unchanged' if registered == app.metadata.schema_fingerprint else 'outdated'
+            changed = await client.ensure_metadata_schema(app.metadata, store=store, force=force)
+            return 'registered' if changed else 'unchanged'
+
+    results = await asyncio.gather(*[ensure(app) for app in apps], return_exceptions=True)
+    return {app.client_id: result for app, result in zip(apps, results)}
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m discord_connections.schema',
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument('apps', nargs='+', metavar='APP')
+    parser.add_argument('--store', help='SQLite file remembering registered schemas, shared between runs')
+    parser.add_argument('--force', action='store_true', help='register even if nothing changed')
+    parser.add_argument('--check', action='store_true', help='only compare with registered schemas')
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, os.getcwd())  # modules with metadata are usually in the current project
+    try:
+        apps = [App.parse(spec) for spec in args.apps]
+    except (ImportError, AttributeError, ValueError) as e:
+        parser.error(str(e))
+    if duplicates := [client_id for client_id, n in Counter(app.client_id for app in apps).items() if n > 1]:
+        parser.error(f'Client ids given more than once: {", ".join(duplicates)}')
+
+    store = SQLiteSchemaStore(args.store) if args.store else None
+    try:
+        results = asyncio.run(ensure_schemas(apps, store=store, force=args.force, check=args.check))
+    finally:
+        if store is not None:
+            store.close()
+
+    failed = False
+    for app in apps:
+        result = results[app.client_id]
+        if isinstance(result, Exception):
+            failed = True
+            result = f'failed: {getattr(result, "message", None) or result!r}'
+        elif result == 'outdated':
+            failed = True
+        print(f'{app.client_id} {app.metadata.__name__}: {result}')
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
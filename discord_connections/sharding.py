@@ -0,0 +1,218 @@
+"""
+Syncing users in several processes at once, for user bases one event loop can't keep up with
+"""
+
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import inspect
+import multiprocessing
+import queue
+import time
+import zlib
+from dataclasses import dataclass, field
+from typing import AsyncIterable, AsyncIterator, Callable, Iterable
+
+from .bulk import PushItem, PushResult, _aiter
+from .client import DiscordConnections
+
+
+def shard_of(user_id: int | str, shards: int) -> int:
+    """
+    Stable across processes and runs, unlike `hash()`
+    """
+
+    return zlib.crc32(str(user_id).encode()) % shards
+
+
+class SharedBudget:
+    """
+    Token bucket of `rate` requests per second (with bursts up to `burst`) shared by all processes it is passed to
+    on start, plugs into `RateLimiter(budget=...)`.
+    """
+
+    def __init__(self, rate: float, burst: float = None, *, context: multiprocessing.context.BaseContext = None):
+        self.rate = rate
+        self.burst = burst or rate
+        context = context or multiprocessing.get_context()
+        self._state = context.Array('d', [self.burst, time.monotonic(), 0.])  # tokens, updated_at, paused_until
+
+    def _take(self) -> float:
+        """
+        Takes a token if there is one, returns how long to wait otherwise
+        """
+
+        with self._state.get_lock():
+            tokens, updated_at, paused_until = self._state[:]
+            now = time.monotonic()
+            if now < paused_until:
+                return paused_until - now
+
+            tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+            delay = 0. if tokens >= 1 else (1 - tokens) / self.rate
+            self._state[0] = tokens - 1 if tokens >= 1 else tokens
+            self._state[1] = now
+            return delay
+
+    async def acquire(self) -> None:
+        while (delay := self._take()) > 0:
+            await asyncio.sleep(delay)
+
+    def pause(self, seconds: float) -> None:
+        with self._state.get_lock():
+            self._state[2] = max(self._state[2], time.monotonic() + seconds)
+
+
+@dataclass
+class ShardStats:
+    shard: int
+    sent: int = 0
+    skipped: int = 0
+    failed: int = 0
+    seconds: float = 0.
+    errors: list[tuple[str, str]] = field(default_factory=list)  # (user_id, error), first `max_errors` only
+    crashed: str | None = None
+    done: bool = False
+
+
+@dataclass
+class ShardedReport:
+    shards: list[ShardStats]
+
+    @property
+    def sent(self) -> int:
+        return sum(s.sent for s in self.shards)
+
+    @property
+    def skipped(self) -> int:
+        return sum(s.skipped for s in self.shards)
+
+    @property
+    def failed(self) -> int:
+        return sum(s.failed for s in self.shards)
+
+    @property
+    def done(self) -> bool:
+        return all(s.done for s in self.shards)
+
+
+class ShardedRunner:
+    """
+    Pushes metadata of all users from `shards` worker processes, each syncing users with `shard_of(user_id) == shard`
+    through its own client made by `make_client()`. All requests fit into one global budget of `rate` per second.
+
+    `source(shard, shards)` runs in a worker and yields `(token, metadata, user_id)` items, it is best to only
+    select users of the shard from the database; items of other shards are skipped anyway. `on_result(result)`, if
+    given, is called in the worker for every result (e.g. to save a refreshed token). All callables must be
+    importable by the worker, i.e. defined at module level.
+    """
+
+    def __init__(
+            self,
+            make_client: Callable[[], DiscordConnections],
+            source: Callable[[int, int], Iterable[PushItem] | AsyncIterable[PushItem]],
+            *,
+            shards: int = None,
+            rate: float = 50.,
+            burst: float = None,
+            concurrency: int = 10,
+            force: bool = False,
+            on_result: Callable[[PushResult], object] = None,
+            report_every: float = 1.,
+            max_errors: int = 100,
+            context: multiprocessing.context.BaseContext = None,
+    ):
+        self.make_client = make_client
+        self.source = source
+        self.shards = shards or multiprocessing.cpu_count()
+        self.rate = rate
+        self.burst = burst
+        self.concurrency = concurrency
+        self.force = force
+        self.on_result = on_result
+        self.report_every = report_every
+        self.max_errors = max_errors
+        self.context = context or multiprocessing.get_context()
+
+    def run(self, on_progress: Callable[[ShardedReport], None] = None) -> ShardedReport:
+        """
+        Blocks until every shard is done, `on_progress` is called with the report as it changes
+        """
+
+        budget = SharedBudget(self.rate, self.burst, context=self.context)
+        reports = self.context.Queue()
+        report = ShardedReport([ShardStats(shard) for shard in range(self.shards)])
+
+        workers = [
+            self.context.Process(target=self._work, args=(shard, budget, reports), name=f'discord-connections-{shard}')
+            for shard in range(self.shards)
+        ]
+        for worker in workers:
+            worker.start()
+
+        try:
+            while True:
+                alive = any(worker.is_alive() for worker in workers)
+                try:
+                    stats = reports.get(timeout=self.report_every if alive else .1)
+                except queue.Empty:
+                    if not alive:
+                        break
+                    continue
+
+                report.shards[stats.shard] = stats
+                if on_progress is not None:
+                    on_progress(report)
+        finally:
+            for worker in workers:
+                worker.join()
+
+        for worker, stats in zip(workers, report.shards):
+            if not stats.done:
+                stats.crashed = stats.crashed or f'worker exited with code {worker.exitcode}'
+                stats.done = True
+        return report
+
+    def _work(self, shard: int, budget: SharedBudget, reports: multiprocessing.Queue) -> None:
+        asyncio.run(self._sync_shard(shard, budget, reports))
+
+    async def _sync_shard(self, shard: int, budget: SharedBudget, reports: multiprocessing.Queue) -> None:
+        stats = ShardStats(shard)
+        started = reported = time.monotonic()
+
+        try:
+            client = self.make_client()
+            client.rate_limiter.budget = budget
+            async with client:
+                items = self._own_items(shard)
+                async for result in client.push_metadata_many(items, concurrency=self.concurrency, force=self.force):
+                    if not result.ok:
+                        stats.failed += 1
+                        if len(stats.errors) < self.max_errors:
+                            stats.errors.append((str(result.user_id), repr(result.error)))
+                    elif result.skipped:
+                        stats.skipped += 1
+                    else:
+                        stats.sent += 1
+
+                    if self.on_result is not None and inspect.isawaitable(awaitable := self.on_result(result)):
+                        await awaitable
+
+                    if time.monotonic() - reported >= self.report_every:
+                        reported = time.monotonic()
+                        stats.seconds = reported - started
+                        reports.put(dataclasses.replace(stats, errors=list(stats.errors)))
+        except Exception as e:
+            stats.crashed = repr(e)
+
+        stats.seconds = time.monotonic() - started
+        stats.done = True
+        reports.put(stats)
+
+    async def _own_items(self, shard: int) -> AsyncIterator[PushItem]:
+        async for item in _aiter(self.source(shard, self.shards)):
+            if len(item) < 3:
+                raise ValueError('Sharded items must be `(token, metadata, user_id)`')
+            if shard_of(item[2], self.shards) == shard:
+                yield item
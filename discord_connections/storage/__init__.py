@@ -0,0 +1,5 @@
+from .payloads import PayloadStore, MemoryPayloadStore, SQLitePayloadStore
+from .tokens import TokenStore, MemoryTokenStore, SQLiteTokenStore
+from .checkpoints import CheckpointStore, MemoryCheckpointStore, SQLiteCheckpointStore
+from .states import StateStore, MemoryStateStore, SQLiteStateStore
+from .schemas import SchemaStore, MemorySchemaStore, SQLiteSchemaStore
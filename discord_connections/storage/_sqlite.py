@@ -0,0 +1,42 @@
+"""
+Base of SQLite stores
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+
+class SQLiteStore:
+    """
+    One connection in autocommit mode, used from worker threads (stores call `_execute` with `asyncio.to_thread`, so
+    queries do not block the event loop) one at a time. WAL lets other processes read while one writes.
+    """
+
+    def __init__(self, path: str, *schema: str):
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        for statement in schema:
+            self._connection.execute(statement)
+
+    def _execute(self, query: str, params: tuple) -> list[tuple]:
+        with self._lock:
+            return self._connection.execute(query, params).fetchall()
+
+    def _execute_many(self, query: str, params: list[tuple]) -> None:
+        with self._transaction() as connection:
+            connection.executemany(query, params)
+
+    @contextmanager
+    def _transaction(self, begin: str = 'BEGIN') -> Iterator[sqlite3.Connection]:
+        with self._lock, self._connection:
+            self._connection.execute(begin)
+            yield self._connection
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
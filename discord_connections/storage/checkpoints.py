@@ -0,0 +1,88 @@
+"""
+Progress of long-running jobs: when every user was last processed, so a restarted job resumes where it stopped
+"""
+
+from __future__ import annotations
+
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Iterable
+
+from ._sqlite import SQLiteStore
+
+
+class CheckpointStore(ABC):
+    @abstractmethod
+    async def get_many(self, user_ids: Iterable[int | str]) -> dict[str, float]:
+        """
+        Returns unix timestamps of the last checkpoint of users which have one
+        """
+
+    @abstractmethod
+    async def set_many(self, checkpoints: dict[int | str, float]) -> None:
+        ...
+
+    @abstractmethod
+    async def clear(self) -> None:
+        ...
+
+
+class MemoryCheckpointStore(CheckpointStore):
+    def __init__(self):
+        self._checkpoints: dict[str, float] = {}
+
+    async def get_many(self, user_ids: Iterable[int | str]) -> dict[str, float]:
+        found = {}
+        for user_id in map(str, user_ids):
+            if user_id in self._checkpoints:
+                found[user_id] = self._checkpoints[user_id]
+        return found
+
+    async def set_many(self, checkpoints: dict[int | str, float]) -> None:
+        self._checkpoints.update((str(k), v) for k, v in checkpoints.items())
+
+    async def clear(self) -> None:
+        self._checkpoints.clear()
+
+
+class SQLiteCheckpointStore(SQLiteStore, CheckpointStore):
+    """
+    On-disk store, several jobs can share one file using different `name`s
+    """
+
+    BATCH = 500
+
+    def __init__(self, path: str, name: str = 'sync'):
+        super().__init__(
+            path,
+            'CREATE TABLE IF NOT EXISTS checkpoints ('
+            'name TEXT NOT NULL, user_id TEXT NOT NULL, checkpoint REAL NOT NULL, PRIMARY KEY (name, user_id)'
+            ') WITHOUT ROWID'
+        )
+        self.name = name
+
+    async def get_many(self, user_ids: Iterable[int | str]) -> dict[str, float]:
+        user_ids = [str(u) for u in user_ids]
+        found = {}
+        for i in range(0, len(user_ids), self.BATCH):
+            batch = user_ids[i:i + self.BATCH]
+            rows = await asyncio.to_thread(
+                self._execute,
+                'SELECT user_id, checkpoint FROM checkpoints '
+                f'WHERE name = ? AND user_id IN ({",".join("?" * len(batch))})',
+                (self.name, *batch)
+            )
+            found.update(rows)
+        return found
+
+    async def set_many(self, checkpoints: dict[int | str, float]) -> None:
+        rows = [(self.name, str(k), v) for k, v in checkpoints.items()]
+        for i in range(0, len(rows), self.BATCH):
+            await asyncio.to_thread(
+                self._execute_many,
+                'INSERT OR REPLACE INTO checkpoints (name, user_id, checkpoint) VALUES (?, ?, ?)',
+                rows[i:i + self.BATCH]
+            )
+
+    async def clear(self) -> None:
+        await asyncio.to_thread(self._execute, 'DELETE FROM checkpoints WHERE name = ?', (self.name,))
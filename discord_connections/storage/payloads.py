@@ -0,0 +1,85 @@
+"""
+Stores of the last successfully pushed metadata payload per user, used to skip pushes that change nothing
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+from ._sqlite import SQLiteStore
+
+
+def payload_digest(payload: bytes) -> bytes:
+    return hashlib.blake2b(payload, digest_size=16).digest()
+
+
+class PayloadStore(ABC):
+    @abstractmethod
+    async def get(self, user_id: int | str) -> bytes | None:
+        ...
+
+    @abstractmethod
+    async def set(self, user_id: int | str, digest: bytes) -> None:
+        ...
+
+    @abstractmethod
+    async def delete(self, user_id: int | str) -> None:
+        ...
+
+
+class MemoryPayloadStore(PayloadStore):
+    """
+    In-memory LRU store, keeps digests of at most `maxsize` users
+    """
+
+    def __init__(self, maxsize: int = 100_000):
+        self.maxsize = maxsize
+        self._digests: OrderedDict[str, bytes] = OrderedDict()
+
+    async def get(self, user_id: int | str) -> bytes | None:
+        key = str(user_id)
+        digest = self._digests.get(key)
+        if digest is not None:
+            self._digests.move_to_end(key)
+        return digest
+
+    async def set(self, user_id: int | str, digest: bytes) -> None:
+        key = str(user_id)
+        self._digests[key] = digest
+        self._digests.move_to_end(key)
+        if len(self._digests) > self.maxsize:
+            self._digests.popitem(last=False)
+
+    async def delete(self, user_id: int | str) -> None:
+        self._digests.pop(str(user_id), None)
+
+
+class SQLitePayloadStore(SQLiteStore, PayloadStore):
+    """
+    On-disk store, queries run in a worker thread to not block the event loop
+    """
+
+    def __init__(self, path: str):
+        super().__init__(
+            path,
+            'CREATE TABLE IF NOT EXISTS pushed_metadata (user_id TEXT PRIMARY KEY, digest BLOB NOT NULL) WITHOUT ROWID'
+        )
+
+    async def get(self, user_id: int | str) -> bytes | None:
+        rows = await asyncio.to_thread(
+            self._execute, 'SELECT digest FROM pushed_metadata WHERE user_id = ?', (str(user_id),)
+        )
+        return rows[0][0] if rows else None
+
+    async def set(self, user_id: int | str, digest: bytes) -> None:
+        await asyncio.to_thread(
+            self._execute,
+            'INSERT OR REPLACE INTO pushed_metadata (user_id, digest) VALUES (?, ?)',
+            (str(user_id), digest)
+        )
+
+    async def delete(self, user_id: int | str) -> None:
+        await asyncio.to_thread(self._execute, 'DELETE FROM pushed_metadata WHERE user_id = ?', (str(user_id),))
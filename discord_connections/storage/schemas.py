@@ -0,0 +1,57 @@
+"""
+Stores of the fingerprint of the last metadata schema registered per application, so deploys skip registering it again
+"""
+
+from __future__ import annotations
+
+import asyncio
+from abc import ABC, abstractmethod
+
+from ._sqlite import SQLiteStore
+
+
+class SchemaStore(ABC):
+    @abstractmethod
+    async def get(self, client_id: int | str) -> str | None:
+        ...
+
+    @abstractmethod
+    async def set(self, client_id: int | str, fingerprint: str) -> None:
+        ...
+
+
+class MemorySchemaStore(SchemaStore):
+    def __init__(self):
+        self._fingerprints: dict[str, str] = {}
+
+    async def get(self, client_id: int | str) -> str | None:
+        return self._fingerprints.get(str(client_id))
+
+    async def set(self, client_id: int | str, fingerprint: str) -> None:
+        self._fingerprints[str(client_id)] = fingerprint
+
+
+class SQLiteSchemaStore(SQLiteStore, SchemaStore):
+    """
+    On-disk store, can be shared by processes of one host (or put on a shared volume)
+    """
+
+    def __init__(self, path: str):
+        super().__init__(
+            path,
+            'CREATE TABLE IF NOT EXISTS registered_schemas (client_id TEXT PRIMARY KEY, fingerprint TEXT NOT NULL) '
+            'WITHOUT ROWID'
+        )
+
+    async def get(self, client_id: int | str) -> str | None:
+        rows = await asyncio.to_thread(
+            self._execute, 'SELECT fingerprint FROM registered_schemas WHERE client_id = ?', (str(client_id),)
+        )
+        return rows[0][0] if rows else None
+
+    async def set(self, client_id: int | str, fingerprint: str) -> None:
+        await asyncio.to_thread(
+            self._execute,
+            'INSERT OR REPLACE INTO registered_schemas (client_id, fingerprint) VALUES (?, ?)',
+            (str(client_id), fingerprint)
+        )
@@ -0,0 +1,81 @@
+"""
+Stores of OAuth `state` values issued with authorization links, each of them is accepted once before it expires
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+from ._sqlite import SQLiteStore
+
+
+class StateStore(ABC):
+    @abstractmethod
+    async def add(self, state: str, value: str, ttl: float) -> None:
+        ...
+
+    @abstractmethod
+    async def pop(self, state: str) -> str | None:
+        """
+        Returns the value `state` was added with and forgets it, `None` if it is unknown or expired
+        """
+
+
+class MemoryStateStore(StateStore):
+    """
+    In-process store, fits a single server. Keeps at most `maxsize` states, the oldest are dropped first.
+    """
+
+    def __init__(self, maxsize: int = 100_000):
+        self.maxsize = maxsize
+        self._states: OrderedDict[str, tuple[float, str]] = OrderedDict()
+
+    async def add(self, state: str, value: str, ttl: float) -> None:
+        self._states[state] = (time.monotonic() + ttl, value)
+        if len(self._states) > self.maxsize:
+            self._states.popitem(last=False)
+
+    async def pop(self, state: str) -> str | None:
+        expires_at, value = self._states.pop(state, (0., None))
+        return value if expires_at > time.monotonic() else None
+
+
+class SQLiteStateStore(SQLiteStore, StateStore):
+    """
+    On-disk store, can be shared by several processes of one host. Expired states are deleted on `add`.
+    """
+
+    def __init__(self, path: str):
+        super().__init__(
+            path,
+            'CREATE TABLE IF NOT EXISTS oauth_states ('
+            'state TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL'
+            ') WITHOUT ROWID'
+        )
+
+    def _add(self, state: str, value: str, expires_at: float) -> None:
+        with self._transaction() as connection:
+            connection.execute('DELETE FROM oauth_states WHERE expires_at < ?', (time.time(),))
+            connection.execute(
+                'INSERT OR REPLACE INTO oauth_states (state, value, expires_at) VALUES (?, ?, ?)',
+                (state, value, expires_at)
+            )
+
+    def _pop(self, state: str) -> str | None:
+        with self._transaction('BEGIN IMMEDIATE') as connection:  # other processes must not pop the state meanwhile
+            rows = connection.execute(
+                'SELECT value, expires_at FROM oauth_states WHERE state = ?', (state,)
+            ).fetchall()
+            connection.execute('DELETE FROM oauth_states WHERE state = ?', (state,))
+        if rows and rows[0][1] > time.time():
+            return rows[0][0]
+        return None
+
+    async def add(self, state: str, value: str, ttl: float) -> None:
+        await asyncio.to_thread(self._add, state, value, time.time() + ttl)
+
+    async def pop(self, state: str) -> str | None:
+        return await asyncio.to_thread(self._pop, state)
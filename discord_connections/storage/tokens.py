@@ -0,0 +1,183 @@
+"""
+Persistence of users' Discord tokens
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from datetime import timedelta
+from typing import AsyncIterator, Iterable
+
+from ..datatypes import DiscordToken
+from ._sqlite import SQLiteStore
+
+
+class TokenStore(ABC):
+    @abstractmethod
+    async def get(self, user_id: int | str) -> DiscordToken | None:
+        ...
+
+    @abstractmethod
+    async def set(self, user_id: int | str, token: DiscordToken) -> None:
+        ...
+
+    @abstractmethod
+    async def delete(self, user_id: int | str) -> None:
+        ...
+
+    @abstractmethod
+    async def expiring(
+            self,
+            before: float,
+            limit: int,
+            after: tuple[float, str] = None
+    ) -> list[tuple[str, DiscordToken]]:
+        """
+        Returns up to `limit` `(user_id, token)` pairs expiring before unix time `before`, ordered by
+        `(expires_ts, user_id)` and starting after `after` (such pair of the last returned token), if provided
+        """
+
+    async def get_many(self, user_ids: Iterable[int | str]) -> dict[str, DiscordToken]:
+        tokens = {}
+        for user_id in user_ids:
+            token = await self.get(user_id)
+            if token is not None:
+                tokens[str(user_id)] = token
+        return tokens
+
+    async def set_many(self, tokens: Iterable[tuple[int | str, DiscordToken]]) -> None:
+        for user_id, token in tokens:
+            await self.set(user_id, token)
+
+    async def iter_expiring(
+            self,
+            within: timedelta,
+            page_size: int = 1000
+    ) -> AsyncIterator[list[tuple[str, DiscordToken]]]:
+        """
+        Yields pages of `(user_id, token)` pairs expiring within `within` from now, soonest first. Pages are fetched
+        one by one, so tokens can be refreshed while iterating.
+        """
+
+        async for page in self._iter_before(time.time() + within.total_seconds(), page_size):
+            yield page
+
+    async def iter_all(self, page_size: int = 1000) -> AsyncIterator[list[tuple[str, DiscordToken]]]:
+        """
+        Yields pages of all `(user_id, token)` pairs, soonest expiring first
+        """
+
+        async for page in self._iter_before(float('inf'), page_size):
+            yield page
+
+    async def _iter_before(self, before: float, page_size: int) -> AsyncIterator[list[tuple[str, DiscordToken]]]:
+        after = None
+        while page := await self.expiring(before, page_size, after):
+            yield page
+            user_id, token = page[-1]
+            after = (token.expires_ts, user_id)
+
+
+class MemoryTokenStore(TokenStore):
+    def __init__(self):
+        self._tokens: dict[str, DiscordToken] = {}
+
+    async def get(self, user_id: int | str) -> DiscordToken | None:
+        return self._tokens.get(str(user_id))
+
+    async def set(self, user_id: int | str, token: DiscordToken) -> None:
+        self._tokens[str(user_id)] = token
+
+    async def delete(self, user_id: int | str) -> None:
+        self._tokens.pop(str(user_id), None)
+
+    async def expiring(
+            self,
+            before: float,
+            limit: int,
+            after: tuple[float, str] = None
+    ) -> list[tuple[str, DiscordToken]]:
+        found = [
+            (k, v) for k, v in self._tokens.items()
+            if v.expires_ts < before and (after is None or (v.expires_ts, k) > after)
+        ]
+        found.sort(key=lambda kv: (kv[1].expires_ts, kv[0]))
+        return found[:limit]
+
+
+class SQLiteTokenStore(SQLiteStore, TokenStore):
+    """
+    On-disk store, queries run in a worker thread to not block the event loop. Tokens are indexed by expiry, so
+    expiring ones are found without scanning the table.
+    """
+
+    BATCH = 500  # keeps `IN (...)` under SQLite variables limit
+
+    _UPSERT = (
+        'INSERT OR REPLACE INTO discord_tokens (user_id, access_token, refresh_token, expires_in, expires_at) '
+        'VALUES (?, ?, ?, ?, ?)'
+    )
+
+    def __init__(self, path: str):
+        super().__init__(
+            path,
+            'CREATE TABLE IF NOT EXISTS discord_tokens ('
+            'user_id TEXT PRIMARY KEY, access_token TEXT NOT NULL, refresh_token TEXT NOT NULL, '
+            'expires_in REAL NOT NULL, expires_at REAL NOT NULL'
+            ') WITHOUT ROWID',
+            'CREATE INDEX IF NOT EXISTS discord_tokens_expires_at ON discord_tokens (expires_at, user_id)',
+        )
+
+    async def get(self, user_id: int | str) -> DiscordToken | None:
+        rows = await asyncio.to_thread(
+            self._execute,
+            'SELECT access_token, refresh_token, expires_in, expires_at FROM discord_tokens WHERE user_id = ?',
+            (str(user_id),)
+        )
+        return DiscordToken.from_row(*rows[0]) if rows else None
+
+    @staticmethod
+    def _to_row(user_id: int | str, token: DiscordToken) -> tuple:
+        return str(user_id), *token.to_row()
+
+    async def get_many(self, user_ids: Iterable[int | str]) -> dict[str, DiscordToken]:
+        user_ids = [str(u) for u in user_ids]
+        tokens = {}
+        for i in range(0, len(user_ids), self.BATCH):
+            batch = user_ids[i:i + self.BATCH]
+            rows = await asyncio.to_thread(
+                self._execute,
+                'SELECT user_id, access_token, refresh_token, expires_in, expires_at FROM discord_tokens '
+                f'WHERE user_id IN ({",".join("?" * len(batch))})',
+                tuple(batch)
+            )
+            tokens.update(zip([row[0] for row in rows], DiscordToken.from_rows(row[1:] for row in rows)))
+        return tokens
+
+    async def set(self, user_id: int | str, token: DiscordToken) -> None:
+        await asyncio.to_thread(self._execute, self._UPSERT, self._to_row(user_id, token))
+
+    async def set_many(self, tokens: Iterable[tuple[int | str, DiscordToken]]) -> None:
+        rows = [self._to_row(user_id, token) for user_id, token in tokens]
+        for i in range(0, len(rows), self.BATCH):
+            await asyncio.to_thread(self._execute_many, self._UPSERT, rows[i:i + self.BATCH])
+
+    async def delete(self, user_id: int | str) -> None:
+        await asyncio.to_thread(self._execute, 'DELETE FROM discord_tokens WHERE user_id = ?', (str(user_id),))
+
+    async def expiring(
+            self,
+            before: float,
+            limit: int,
+            after: tuple[float, str] = None
+    ) -> list[tuple[str, DiscordToken]]:
+        after_at, after_user_id = after or (float('-inf'), '')
+        rows = await asyncio.to_thread(
+            self._execute,
+            'SELECT user_id, access_token, refresh_token, expires_in, expires_at FROM discord_tokens '
+            'WHERE expires_at < ? AND (expires_at, user_id) > (?, ?) ORDER BY expires_at, user_id LIMIT ?',
+            (before, after_at, after_user_id, limit)
+        )
+        return list(zip([row[0] for row in rows], DiscordToken.from_rows(row[1:] for row in rows)))
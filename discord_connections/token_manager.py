@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import timedelta
+from typing import TYPE_CHECKING
+
+from .datatypes import DiscordToken
+from .exceptions import TokenNotFoundError
+from .storage.tokens import TokenStore
+
+if TYPE_CHECKING:
+    from .client import DiscordConnections
+
+
+logger = logging.getLogger(__name__)
+
+
+class TokenManager:
+    """
+    Keeps users' tokens valid.
+
+    Concurrent refreshes of the same user's token are merged into one request (Discord rotates the refresh token, so
+    a second refresh with the old one would fail). While running (`async with manager:` or `start()`), tokens
+    expiring within `renew_within` are renewed in the background every `renew_interval` seconds, `batch_size` at
+    a time.
+    """
+
+    def __init__(
+            self,
+            client: DiscordConnections,
+            store: TokenStore,
+            *,
+            min_validity: timedelta = timedelta(minutes=1),
+            renew_within: timedelta = timedelta(hours=1),
+            renew_interval: float = 60,
+            batch_size: int = 100,
+    ):
+        self.client = client
+        self.store = store
+        self.min_validity = min_validity
+        self.renew_within = renew_within
+        self.renew_interval = renew_interval
+        self.batch_size = batch_size
+
+        self._refreshing: dict[str, asyncio.Task] = {}
+        self._renewer: asyncio.Task | None = None
+
+    async def get_valid_token(self, user_id: int | str) -> DiscordToken:
+        token = await self.store.get(user_id)
+        if token is None:
+            raise TokenNotFoundError(user_id)
+
+        if self._expires_within(token, self.min_validity):
+            return await self.refresh(user_id, self.min_validity)
+        return token
+
+    async def set_token(self, user_id: int | str, token: DiscordToken) -> None:
+        await self.store.set(user_id, token)
+
+    async def refresh(self, user_id: int | str, margin: timedelta = None) -> DiscordToken:
+        """
+        Refreshes the token of `user_id`, unless (with `margin`) it is valid for longer than `margin` by the time
+        the refresh starts. Joins a refresh of the same user which is already in progress.
+        """
+
+        key = str(user_id)
+        task = self._refreshing.get(key)
+        if task is None:
+            task = self._refreshing[key] = asyncio.create_task(self._refresh(key, margin))
+            task.add_done_callback(lambda _: self._refreshing.pop(key, None))
+
+        return await asyncio.shield(task)
+
+    async def _refresh(self, user_id: str, margin: timedelta | None) -> DiscordToken:
+        token = await self.store.get(user_id)
+        if token is None:
+            raise TokenNotFoundError(user_id)
+
+        if margin is not None and not self._expires_within(token, margin):
+            return token  # already refreshed by someone else
+
+        token = await self.client.refresh_token(token)
+        await self.store.set(user_id, token)
+        return token
+
+    async def renew_expiring(self) -> int:
+        """
+        Renews all tokens expiring within `renew_within`, returns how many were renewed.
+
+        Raises `ValueError` if renewed tokens expire within `renew_within` again (it is not shorter than the lifetime
+        of tokens), as they would be renewed on every pass.
+        """
+
+        seen = set()  # a renewed token can show up again on a later page
+        renewed = 0
+        async for page in self.store.iter_expiring(self.renew_within, self.batch_size):
+            user_ids = [user_id for user_id, _ in page if user_id not in seen]
+            seen.update(user_ids)
+            results = await asyncio.gather(
+                *[self.refresh(user_id, self.renew_within) for user_id in user_ids], return_exceptions=True
+            )
+            for user_id, result in zip(user_ids, results):
+                if isinstance(result, Exception):
+                    logger.warning("Failed to renew token of user %s: %r", user_id, result)
+                    continue
+
+                renewed += 1
+                if self._expires_within(result, self.renew_within):
+                    raise ValueError(
+                        f'`renew_within` ({self.renew_within}) must be shorter than the lifetime of tokens '
+                        f'({result.expires_in})'
+                    )
+
+        return renewed
+
+    async def start(self) -> None:
+        if self._renewer is None:
+            self._renewer = asyncio.create_task(self._renew_forever())
+
+    async def stop(self) -> None:
+        if self._renewer is not None:
+            self._renewer.cancel()
+            await asyncio.gather(self._renewer, return_exceptions=True)
+            self._renewer = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
+
+    async def _renew_forever(self) -> None:
+        while True:
+            try:
+                await self.renew_expiring()
+            except ValueError as e:
+                logger.error("Token renewal stopped: %s", e)
+                return
+            except Exception as e:
+                logger.exception("Token renewal failed: %r", e)
+            await asyncio.sleep(self.renew_interval)
+
+    @staticmethod
+    def _expires_within(token: DiscordToken, margin: timedelta) -> bool:
+        return token.expires_within(margin.total_seconds())
@@ -5,25 +5,26 @@ https://discord.com/developers/docs/tutorials/configuring-app-metadata-for-linke
 
 import os
 
-from discord_connections import Client
+from discord_connections.blocking import SyncClient
 
 # Let's use metadata from first example and register it
 from a_create_metadata import MySuperMetadata
 
 
 if __name__ == '__main__':
-    # 1) Create a client
-    client = Client(
+    # 1) Create a client, blocking one is handy for scripts
+    with SyncClient(
         client_id=os.environ.get('CLIENT_ID'),
         redirect_uri=os.environ.get('REDIRECT_URI'),  # can be None, isn't required for registering the schema
         client_secret=os.environ.get('CLIENT_SECRET'),  # can be None, isn't required for registering the schema
         discord_token=os.environ.get('DISCORD_TOKEN')
-    )
+    ) as client:
+        # 2) Register the schema. It is skipped if the same schema is registered already, so it is safe to run on
+        # every deploy (`register_metadata_schema` registers it unconditionally)
+        print("Registering the schema:", MySuperMetadata.to_schema())
+        registered = client.ensure_metadata_schema(MySuperMetadata)
+        print("Done!" if registered else "Already registered!")
 
-    # 2) Register the schema.
-    print("Registering the schema:", MySuperMetadata.to_schema())
-    client.register_metadata_schema(MySuperMetadata)  # noqa TODO FIX
-    print("Done!")
 
-
-# TODO CLI for registering metadata
+# The same from the command line, for any number of applications at once:
+#   DISCORD_TOKEN=... python -m discord_connections.schema a_create_metadata:MySuperMetadata@<CLIENT_ID>
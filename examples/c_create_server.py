@@ -1,9 +1,8 @@
 """
 It is oversimplified version of server!
 
-Besides this server, you will need to:
-1) implement database to store Discord tokens
-2) implement the way you will retrieve data from the resource you are connecting to Discord
+Besides this server, you will need to implement the way you will retrieve data from the resource you are connecting
+to Discord. Tokens are stored with `SQLiteTokenStore`, implement `TokenStore` to keep them in your own database.
 
 Also, check Discord tutorial:
 https://discord.com/developers/docs/tutorials/configuring-app-metadata-for-linked-roles
@@ -14,58 +13,56 @@ import os
 
 from discord_connections import Client, Metadata
 from discord_connections.datatypes import DiscordToken
+from discord_connections.exceptions import InvalidStateError
+from discord_connections.oauth import AccountLinker
+from discord_connections.storage import MemoryStateStore, SQLiteTokenStore
 
-from flask import Flask, redirect, request, Response, make_response
-from flask.sessions import SecureCookieSessionInterface
+from flask import Flask, redirect, request, Response
 
 from examples.a_create_metadata import MySuperMetadata
 
 app = Flask(__name__)
-app.secret_key = os.environ.get('COOKIE_SECRET')
-session_serializer = SecureCookieSessionInterface().get_signing_serializer(app)
 
 REDIRECT_URL = 'https://discord.com/app'
 
 
-client = Client(
-    client_id=os.environ.get('CLIENT_ID'),
-    client_secret=os.environ.get('CLIENT_SECRET'),
-    redirect_uri=os.environ.get('REDIRECT_URI'),
-    discord_token=os.environ.get('DISCORD_TOKEN')
-)
+tokens = SQLiteTokenStore('tokens.sqlite3')
+states = MemoryStateStore()
+
+
+# Flask runs every async view on a new event loop, so a client is created per request. With an ASGI server (one loop
+# for all requests) create one client at startup instead, so connections to Discord are reused between requests.
+def make_client() -> Client:
+    return Client(
+        client_id=os.environ.get('CLIENT_ID'),
+        client_secret=os.environ.get('CLIENT_SECRET'),
+        redirect_uri=os.environ.get('REDIRECT_URI'),
+        discord_token=os.environ.get('DISCORD_TOKEN')
+    )
 
 
 # This route is for authorising into Discord to connect application to your account
 # After successful authorisation, application will appear at `User Settings > Authorised Apps`
 @app.route('/linked-role')
-def linked_role():
-    url, state = client.oauth_url
-
-    response = make_response(redirect(url))
-    response.set_cookie(key='clientState', value=state, max_age=60 * 5)
-
-    return response
+async def linked_role():
+    linker = AccountLinker(make_client(), states=states, tokens=tokens)  # no requests are made here
+    return redirect(await linker.get_authorization_url())
 
 
 # This route is for callback Discord will send once user authorise the application
-# Callback contains token, which must be stored into database
+# Callback contains code, which is exchanged for token, token is stored into database under Discord user id
 @app.route('/discord-oauth-callback')
 async def discord_oauth_callback():
-    discord_state = request.args.get('state')
-    client_state = request.cookies.get('clientState')
-    if client_state != discord_state:
-        return Response("State verification failed.", status=403)
-
     try:
-        code = request.args['code']
-        token = await client.get_oauth_token(code)
+        async with make_client() as client:
+            linker = AccountLinker(client, states=states, tokens=tokens)
+            result = await linker.link(request.args['code'], request.args.get('state'))
 
-        print("Authorised, token acquired!")
-
-        # Create database to store tokens and save token
-        # database.save(token)
+        print(f"Authorised, token of user {result.user_id} acquired!")
 
         return redirect(REDIRECT_URL)
+    except InvalidStateError:
+        return Response("State verification failed.", status=403)
     except Exception as e:
         return Response(str(e), status=500)
 
@@ -84,8 +81,7 @@ async def update_metadata():
 
 
 async def _update_metadata(user_id: int):
-    # Retrieve token from database by `user_id`
-    token: DiscordToken = ...  # database.get_token(user_id)
+    token: DiscordToken = await tokens.get(user_id)
 
     # Here must be a retrieving data from another resource (e.g. with RestAPI) or from local database by `user_id`
     # data = get_data_for_user(user_id)
@@ -94,13 +90,13 @@ async def _update_metadata(user_id: int):
     # Then you need to create metadata from retrieved earlier data, which will be pushed to Discord
     metadata: Metadata = MySuperMetadata(**data)
 
-    # Refresh token if needed
-    if token.expired:
-        token = await client.refresh_token(token)
-        # Save new token if needed
-        # database.save(token)
+    async with make_client() as client:
+        # Refresh token if needed
+        if token.expired:
+            token = await client.refresh_token(token)
+            await tokens.set(user_id, token)
 
-    await client.push_metadata(token, metadata.to_dict())
+        await client.push_metadata(token, metadata)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,37 @@
+"""
+Pushing metadata for all linked users at once (e.g. nightly re-sync)
+"""
+
+
+import asyncio
+import os
+
+from discord_connections import Client
+from discord_connections.datatypes import DiscordToken
+
+from a_create_metadata import MySuperMetadata
+
+
+async def linked_users():
+    # Stream users from your database, there is no need to load everyone into memory
+    # async for user_id, token, data in database.iterate_users():
+    #     yield token, MySuperMetadata(**data)
+    yield DiscordToken(access_token='...', refresh_token='...', expires_in=604800), MySuperMetadata(books_read=1)
+
+
+async def main():
+    async with Client(
+        client_id=os.environ.get('CLIENT_ID'),
+        client_secret=os.environ.get('CLIENT_SECRET'),
+        redirect_uri=os.environ.get('REDIRECT_URI'),
+        discord_token=os.environ.get('DISCORD_TOKEN')
+    ) as client:
+        async for result in client.push_metadata_many(linked_users(), concurrency=50):
+            if result.refreshed:
+                pass  # database.save(result.token)
+            if not result.ok:
+                print("Failed:", result.metadata, result.error)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
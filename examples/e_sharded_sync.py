@@ -0,0 +1,38 @@
+"""
+Pushing metadata for a big user base from several processes, sharing one rate limit budget
+"""
+
+
+import os
+
+from discord_connections import Client
+from discord_connections.datatypes import DiscordToken
+from discord_connections.sharding import ShardedRunner
+
+from a_create_metadata import MySuperMetadata
+
+
+# Both functions run in worker processes, so they must be defined at module level
+def make_client() -> Client:
+    return Client(
+        client_id=os.environ.get('CLIENT_ID'),
+        client_secret=os.environ.get('CLIENT_SECRET'),
+        redirect_uri=os.environ.get('REDIRECT_URI'),
+        discord_token=os.environ.get('DISCORD_TOKEN')
+    )
+
+
+def linked_users(shard: int, shards: int):
+    # Select only users of this shard if your database can do it, other users are skipped anyway
+    # for user_id, token, data in database.iterate_users():
+    #     yield token, MySuperMetadata(**data), user_id
+    yield DiscordToken(access_token='...', refresh_token='...', expires_in=604800), MySuperMetadata(books_read=1), 1
+
+
+if __name__ == '__main__':
+    runner = ShardedRunner(make_client, linked_users, shards=4, rate=50)
+    report = runner.run(on_progress=lambda r: print(f"sent: {r.sent}, skipped: {r.skipped}, failed: {r.failed}"))
+
+    for stats in report.shards:
+        for user_id, error in stats.errors:
+            print(f"Failed to push metadata of user {user_id}: {error}")
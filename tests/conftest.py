@@ -0,0 +1,33 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT / 'benchmarks'))  # `FakeDiscord` and `BenchMetadata` are shared with benchmarks
+sys.path.insert(1, str(ROOT))
+
+from bench_metadata import BenchMetadata  # noqa: E402
+from fake_discord import FakeDiscord  # noqa: E402
+
+from discord_connections import Client  # noqa: E402
+from discord_connections.datatypes import DiscordToken  # noqa: E402
+from discord_connections.retry import RetryPolicy  # noqa: E402
+
+
+def make_client(transport, **kwargs) -> Client:
+    kwargs.setdefault('retry_policy', RetryPolicy(max_attempts=3, base_delay=.001))
+    return Client(1, 'http://localhost/callback', 'secret', 'bot', transport=transport, **kwargs)
+
+
+def make_token(i: int = 0, expires_in: float = 604800) -> DiscordToken:
+    return DiscordToken(access_token=f'access-{i}', refresh_token=f'refresh-{i}', expires_in=expires_in)
+
+
+def make_metadata(i: int = 0) -> BenchMetadata:
+    return BenchMetadata(books_read=i, hours_spent=i, is_author=bool(i % 2))
+
+
+@pytest.fixture
+def fake() -> FakeDiscord:
+    return FakeDiscord()
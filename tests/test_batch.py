@@ -0,0 +1,82 @@
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from discord_connections.datatypes import Metadata, MetadataField, MetadataType
+from discord_connections.datatypes import metadata as metadata_module
+
+
+class Reader(Metadata):
+    platform_name = 'Library'
+    platform_username = 'reader'
+    read = MetadataField(MetadataType.INT_GTE, 'read', 'books read')
+    author = MetadataField(MetadataType.BOOL_EQ, 'author', 'is an author')
+    since = MetadataField(MetadataType.DT_GTE, 'since', 'reading since')
+
+
+SINCE = [datetime(2024, 1, 1, tzinfo=timezone.utc), datetime(2024, 5, 6, 7, 8, 9, tzinfo=timezone.utc), None]
+
+
+@pytest.fixture(params=['orjson', 'json'])
+def encoder(request, monkeypatch):
+    if request.param == 'json':
+        monkeypatch.setattr(metadata_module, 'orjson', None)
+    elif metadata_module.orjson is None:
+        pytest.skip('orjson is not installed')
+    Reader._encoder = staticmethod(metadata_module._compile_encoder(Reader))
+    yield
+    monkeypatch.undo()
+    Reader._encoder = staticmethod(metadata_module._compile_encoder(Reader))
+
+
+def test_batch_matches_instances(encoder):
+    instances = [Reader(read=i, author=bool(i % 2), since=SINCE[i]) for i in range(3)]
+    batch = Reader.batch({'read': [0, 1, 2], 'author': [False, True, False], 'since': SINCE})
+
+    assert len(batch) == 3
+    assert b''.join(batch) == b''.join(m.to_json() for m in instances)
+    assert b'"platform_username":"reader"' in instances[0].to_json()
+
+
+def test_numpy_columns_match_instances(encoder):
+    np = pytest.importorskip('numpy')
+    since = [d and d.replace(tzinfo=None) for d in SINCE]  # `datetime64` is naive
+    instances = [Reader(read=i, since=since[i]) for i in range(3)]
+    batch = Reader.batch({'read': np.arange(3, dtype=np.int64), 'since': np.array(since, dtype='datetime64[s]')})
+
+    assert b''.join(batch) == b''.join(m.to_json() for m in instances)
+
+
+@pytest.fixture
+def new_york():
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv('TZ', 'America/New_York')
+        time.tzset()
+        yield
+    time.tzset()
+
+
+def test_naive_datetimes_are_local_in_every_path(encoder, new_york):
+    np = pytest.importorskip('numpy')
+    since = [datetime(2024, 1, 1, 12), datetime(2024, 7, 1, 12)]
+    instances = b''.join(Reader(since=d).to_json() for d in since)
+
+    assert b'"2024-01-01T17:00:00+00:00"' in instances and b'"2024-07-01T16:00:00+00:00"' in instances
+    assert b''.join(Reader.batch({'since': since})) == instances
+    assert b''.join(Reader.batch({'since': np.array(since, dtype='datetime64[s]')})) == instances
+
+
+def test_trusted_batch_and_usernames(encoder):
+    batch = Reader.batch({'read': [1, 2], 'platform_username': ['a', 'b']}, trusted=True)
+    expected = [Reader(read=1, platform_username='a').to_json(), Reader(read=2, platform_username='b').to_json()]
+    assert list(batch) == expected
+
+
+def test_batch_is_validated():
+    with pytest.raises(ValueError):
+        Reader.batch({'read': [1, '2']})
+    with pytest.raises(ValueError):
+        Reader.batch({'read': [1, 2], 'author': [True]})
+    with pytest.raises(ValueError):
+        Reader.batch({'unknown': [1]})
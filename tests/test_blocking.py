@@ -0,0 +1,71 @@
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from conftest import make_metadata, make_token
+
+from discord_connections import SyncClient
+from discord_connections.retry import RetryPolicy
+
+
+def make_sync_client(transport) -> SyncClient:
+    return SyncClient(
+        1, 'http://localhost/callback', 'secret', 'bot',
+        transport=transport, retry_policy=RetryPolicy(max_attempts=3, base_delay=.001),
+    )
+
+
+def test_calls_block_until_done(fake):
+    with make_sync_client(fake) as client:
+        assert client.push_metadata(make_token(), make_metadata(3))
+        assert client.get_metadata(make_token())['metadata']['books_read'] == '3'
+
+    assert fake.requests == {'put_role_connection': 1, 'get_role_connection': 1}
+
+
+def test_calls_from_several_threads(fake):
+    with make_sync_client(fake) as client:
+        with ThreadPoolExecutor(4) as executor:
+            sent = list(executor.map(lambda i: client.push_metadata(make_token(i), make_metadata(i)), range(20)))
+
+    assert all(sent)
+    assert fake.requests['put_role_connection'] == 20
+
+
+def test_push_many_yields_all_results(fake):
+    with make_sync_client(fake) as client:
+        items = ((make_token(i), make_metadata(i), i) for i in range(30))
+        results = list(client.push_metadata_many(items, concurrency=4))
+
+    assert sorted(result.user_id for result in results) == list(range(30))
+    assert all(result.ok for result in results)
+    assert fake.requests['put_role_connection'] == 30
+
+
+def test_push_many_closed_early_stops_pulling_items(fake):
+    counter = itertools.count()
+    items = ((make_token(i), make_metadata(i), i) for i in counter)
+
+    with make_sync_client(fake) as client:
+        results = client.push_metadata_many(items, concurrency=2)
+        taken = [next(results) for _ in range(5)]
+        results.close()
+        pulled = next(counter)
+
+        assert all(result.ok for result in taken)
+        assert pulled < 20
+        assert client.push_metadata(make_token(), make_metadata())  # the loop is still usable
+
+    assert next(counter) == pulled + 1
+
+
+def test_close_is_idempotent(fake):
+    client = make_sync_client(fake)
+    client.get_metadata(make_token())
+    client.close()
+    client.close()
+
+    with pytest.raises(RuntimeError, match='closed'):
+        client.get_metadata(make_token())
+    assert fake.requests == {'get_role_connection': 1}
@@ -0,0 +1,63 @@
+import asyncio
+
+import httpx
+
+from conftest import FakeDiscord, make_client, make_metadata, make_token
+
+from discord_connections.exceptions import AuthExpiredError
+
+
+class RevokingDiscord(FakeDiscord):
+    """
+    Answers role connection requests made with a token from `revoked` with 401
+    """
+
+    def __init__(self, revoked: set[str], **kwargs):
+        super().__init__(**kwargs)
+        self.revoked = revoked
+
+    async def handle_async_request(self, request):
+        if request.headers.get('Authorization', '').removeprefix('Bearer ') in self.revoked:
+            return httpx.Response(401, json={'message': '401: Unauthorized', 'code': 0})
+        return await super().handle_async_request(request)
+
+
+def _push(fake, items, **kwargs):
+    async def main():
+        async with make_client(fake) as client:
+            return [result async for result in client.push_metadata_many(items, **kwargs)]
+
+    return sorted(asyncio.run(main()), key=lambda result: result.user_id)
+
+
+def test_results_of_all_items(fake):
+    results = _push(fake, [(make_token(i), make_metadata(i), i) for i in range(50)], concurrency=5)
+
+    assert [result.user_id for result in results] == list(range(50))
+    assert all(result.ok and not result.refreshed for result in results)
+    assert fake.requests['put_role_connection'] == 50
+
+
+def test_expired_token_is_refreshed(fake):
+    [result] = _push(fake, [(make_token(expires_in=-1), make_metadata(), 1)])
+
+    assert result.ok and result.refreshed
+    assert result.token.access_token != 'access-0'
+    assert fake.requests['token'] == 1
+
+
+def test_revoked_token_is_refreshed_and_retried_once():
+    fake = RevokingDiscord({'access-0'})
+    [result] = _push(fake, [(make_token(), make_metadata(), 1)])
+
+    assert result.ok and result.refreshed
+    assert fake.requests == {'token': 1, 'put_role_connection': 1}
+
+
+def test_auth_error_after_refresh_is_reported():
+    fake = RevokingDiscord({'access-0', 'access-1'})
+    [result] = _push(fake, [(make_token(), make_metadata(), 1)])
+
+    assert isinstance(result.error, AuthExpiredError)
+    assert result.refreshed
+    assert fake.requests == {'token': 1}
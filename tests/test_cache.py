@@ -0,0 +1,74 @@
+import asyncio
+
+from conftest import make_client, make_metadata, make_token
+
+from discord_connections.cache import ResponseCache, TTLCache
+
+
+def test_concurrent_lookups_make_one_request(fake):
+    async def main():
+        async with make_client(fake, cache=ResponseCache()) as client:
+            return await asyncio.gather(*[client.get_metadata(make_token()) for _ in range(10)])
+
+    results = asyncio.run(main())
+    assert all(result is results[0] for result in results)
+    assert fake.requests['get_role_connection'] == 1
+
+
+def test_push_writes_through(fake):
+    async def main(cache):
+        async with make_client(fake, cache=cache) as client:
+            await client.push_metadata(make_token(), make_metadata(3))
+            return await client.get_metadata(make_token())
+
+    cached = asyncio.run(main(ResponseCache()))
+    assert 'get_role_connection' not in fake.requests
+    assert cached['metadata'] == {'books_read': '3', 'hours_spent': '3', 'is_author': '1'}
+    assert cached == asyncio.run(main(None))  # the same as fetched from Discord
+
+
+def test_value_set_during_fetch_is_not_overwritten():
+    async def main():
+        cache = ResponseCache()
+        response = asyncio.get_running_loop().create_future()
+
+        lookup = asyncio.create_task(cache.get_or_fetch(cache.METADATA, 'token', lambda: response))
+        await asyncio.sleep(0)
+        cache.set(cache.METADATA, 'token', {'pushed': True})
+        response.set_result({'pushed': False})
+
+        assert await lookup == {'pushed': False}  # the caller gets what it asked for
+        assert await cache.get_or_fetch(cache.METADATA, 'token', None) == {'pushed': True}
+
+    asyncio.run(main())
+
+
+def test_invalidate():
+    async def main():
+        cache = ResponseCache()
+        cache.set(cache.METADATA, 'token', {'old': True})
+        cache.set(cache.USER_DATA, 'token', {'user': True})
+        cache.invalidate('token', cache.METADATA)
+
+        async def fetch():
+            return {'old': False}
+
+        assert await cache.get_or_fetch(cache.METADATA, 'token', fetch) == {'old': False}
+        assert await cache.get_or_fetch(cache.USER_DATA, 'token', None) == {'user': True}
+
+    asyncio.run(main())
+
+
+def test_ttl_cache_expires_and_evicts(monkeypatch):
+    now = [0.]
+    monkeypatch.setattr('discord_connections.cache.time.monotonic', lambda: now[0])
+    cache = TTLCache(ttl=10, maxsize=2)
+
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)  # `b` is the least recently used
+    assert (cache.get('a'), cache.get('b'), cache.get('c')) == (1, None, 3)
+
+    now[0] = 10.
+    assert cache.get('a') is None and len(cache) == 1
@@ -0,0 +1,57 @@
+import asyncio
+
+import httpx
+
+from conftest import FakeDiscord, make_client, make_metadata, make_token
+
+from discord_connections.cache import ResponseCache
+
+
+def test_pooled_client_is_reused_within_a_loop(fake):
+    async def main():
+        async with make_client(fake) as client:
+            http = client.http
+            await client.push_metadata(make_token(), make_metadata())
+            await client.get_metadata(make_token())
+            assert client.http is http
+
+    asyncio.run(main())
+    assert fake.requests == {'put_role_connection': 1, 'get_role_connection': 1}
+
+
+def test_client_can_be_used_from_several_loops(fake):
+    client = make_client(fake)
+
+    async def call():
+        await client.push_metadata(make_token(), make_metadata())
+        return client.http
+
+    first = asyncio.run(call())
+    second = asyncio.run(call())
+    assert first is not second
+    assert fake.requests['put_role_connection'] == 2
+    asyncio.run(client.aclose())
+
+
+def test_own_http_client_is_not_closed():
+    async def main():
+        async with httpx.AsyncClient(transport=FakeDiscord()) as http:
+            async with make_client(None, http_client=http) as client:
+                await client.get_metadata(make_token())
+            assert not http.is_closed
+
+    asyncio.run(main())
+
+
+def test_rate_limited_client_can_be_used_from_several_loops():
+    fake = FakeDiscord(latency=.01, rate_limit=(3, .05))
+    client = make_client(fake, cache=ResponseCache())
+
+    async def calls():
+        await asyncio.gather(*[client.push_metadata(make_token(), make_metadata(i)) for i in range(10)])
+        await asyncio.gather(*[client.get_metadata(make_token(i)) for i in range(5)])
+
+    for _ in range(3):
+        asyncio.run(calls())
+    assert fake.requests['put_role_connection'] == 30
+    asyncio.run(client.aclose())
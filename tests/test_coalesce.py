@@ -0,0 +1,131 @@
+import asyncio
+import json
+
+import pytest
+
+from conftest import FakeDiscord, make_client, make_metadata, make_token
+
+from discord_connections.coalesce import UpdateQueue
+from discord_connections.storage import MemoryTokenStore
+from discord_connections.token_manager import TokenManager
+
+
+class ConcurrencyTrackingDiscord(FakeDiscord):
+    """
+    Remembers the most requests ever in flight with the same token
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.in_flight: dict[str, int] = {}
+        self.max_in_flight = 0
+
+    async def handle_async_request(self, request):
+        auth = request.headers['Authorization']
+        self.in_flight[auth] = self.in_flight.get(auth, 0) + 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight[auth])
+        try:
+            return await super().handle_async_request(request)
+        finally:
+            self.in_flight[auth] -= 1
+
+
+async def _queue(client, users: int = 3, **kwargs) -> UpdateQueue:
+    store = MemoryTokenStore()
+    for i in range(users):
+        await store.set(i, make_token(i))
+    return UpdateQueue(client, TokenManager(client, store), **kwargs)
+
+
+def _pushed(fake, i: int) -> int:
+    return int(fake.role_connections[f'Bearer access-{i}']['metadata']['books_read'])
+
+
+async def _until(condition) -> None:
+    for _ in range(1000):
+        if condition():
+            return
+        await asyncio.sleep(.005)
+    raise AssertionError('condition not met')
+
+
+def test_updates_within_window_are_merged(fake):
+    async def main():
+        async with make_client(fake) as client:
+            async with await _queue(client, window=10.) as queue:
+                for i in range(5):
+                    await queue.put(0, make_metadata(i))
+                    await queue.put(1, make_metadata(10 + i))
+                await asyncio.sleep(.02)
+                assert len(queue) == 2 and 'put_role_connection' not in fake.requests
+            assert (queue.received, queue.sent, queue.failed) == (10, 2, 0)
+
+    asyncio.run(main())
+    assert fake.requests['put_role_connection'] == 2
+    assert (_pushed(fake, 0), _pushed(fake, 1)) == (4, 14)
+
+
+def test_user_never_has_two_pushes_in_flight():
+    fake = ConcurrencyTrackingDiscord(latency=.05)
+
+    async def main():
+        async with make_client(fake) as client:
+            async with await _queue(client, window=0.) as queue:
+                await queue.put(0, make_metadata(1))
+                await _until(lambda: '0' in queue._in_flight)
+                await queue.put(0, make_metadata(2))  # due at once, deferred until the first push is done
+                await _until(lambda: '0' in queue._deferred)
+                await queue.put(0, make_metadata(3))  # replaces the deferred update
+                await queue.flush()
+                assert queue.size == 0 and not queue._deferred
+
+    asyncio.run(main())
+    assert fake.max_in_flight == 1
+    assert fake.requests['put_role_connection'] == 2
+    assert _pushed(fake, 0) == 3
+
+
+def test_put_of_new_user_waits_while_queue_is_full(fake):
+    async def main():
+        async with make_client(fake) as client:
+            async with await _queue(client, window=10., max_bytes=1) as queue:
+                await queue.put(0, make_metadata(1))  # an empty queue takes anything
+                await queue.put(0, make_metadata(2))  # so does a user already pending
+
+                put = asyncio.create_task(queue.put(1, make_metadata(3)))
+                await asyncio.sleep(.02)
+                assert not put.done() and len(queue) == 1
+
+                await queue.flush()  # the waiting put goes through and is pushed as well
+                assert put.done() and len(queue) == 0
+
+    asyncio.run(main())
+    assert fake.requests['put_role_connection'] == 2
+
+
+def test_close_pushes_pending_updates(fake):
+    async def main():
+        async with make_client(fake) as client:
+            queue = await _queue(client, window=10.)
+            for i in range(3):
+                await queue.put(i, json.dumps({'platform_name': 'raw', 'metadata': {'books_read': i}}).encode())
+            await queue.close()
+
+            assert len(queue) == 0 and queue.size == 0 and queue.sent == 3
+            with pytest.raises(RuntimeError):
+                await queue.put(0, make_metadata())
+
+    asyncio.run(main())
+    assert [_pushed(fake, i) for i in range(3)] == [0, 1, 2]
+
+
+def test_failed_pushes_are_counted(fake):
+    async def main():
+        async with make_client(fake) as client:
+            async with await _queue(client, users=1, window=0.) as queue:
+                await queue.put(0, make_metadata())
+                await queue.put(5, make_metadata())  # no token
+                await queue.flush()
+                assert (queue.sent, queue.failed) == (1, 1)
+
+    asyncio.run(main())
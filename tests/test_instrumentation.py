@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+
+from conftest import FakeDiscord, make_client, make_metadata, make_token
+
+from discord_connections.instrumentation import Metrics, MultiInstrumentation, OpenTelemetryInstrumentation
+
+
+def test_metrics_count_requests_and_lanes():
+    metrics = Metrics()
+    fake = FakeDiscord(rate_limit=(2, .05))
+
+    async def main():
+        async with make_client(fake, instrumentation=metrics) as client:
+            await asyncio.gather(*[client.push_metadata(make_token(), make_metadata(i)) for i in range(5)])
+
+    asyncio.run(main())
+    route = 'PUT /users/@me/role-connection'
+    assert metrics.responses[route, 200] == 5
+    assert metrics.in_flight[route] == 0
+    assert metrics.latency[route].count == sum(metrics.responses.values())
+
+    exposed = metrics.expose()
+    assert 'discord_connections_requests_in_flight{route="PUT /users/@me/role-connection"} 0' in exposed
+    assert 'discord_connections_lane_waiting{priority="bulk"} 0' in exposed
+    assert '# TYPE discord_connections_lane_in_flight gauge' in exposed
+
+
+def test_opentelemetry_events_are_recorded_on_the_call_span():
+    pytest.importorskip('opentelemetry.sdk')
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    instrumentation = OpenTelemetryInstrumentation(provider.get_tracer('test'))
+    fake = FakeDiscord(error_rate=1.)
+
+    async def main():
+        async with make_client(fake, instrumentation=MultiInstrumentation(instrumentation, Metrics())) as client:
+            with pytest.raises(Exception):
+                await client.get_metadata(make_token())
+
+    asyncio.run(main())
+    spans = exporter.get_finished_spans()
+    call, = [s for s in spans if s.parent is None]
+    requests = [s for s in spans if s.parent is not None]
+
+    assert len(requests) == 3 and all(s.parent.span_id == call.context.span_id for s in requests)
+    assert [e.name for e in call.events].count('retry') == 2
+    assert not call.status.is_ok
@@ -0,0 +1,97 @@
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from discord_connections.datatypes import Metadata, MetadataField, MetadataType
+
+
+def test_values_are_kept_per_instance():
+    class Books(Metadata):
+        platform_name = 'Books'
+        read = MetadataField(MetadataType.INT_GTE, 'read', 'books read')
+        author = MetadataField(MetadataType.BOOL_EQ, 'author', 'is an author')
+
+    a, b = Books(read=1, author=True), Books(read=2)
+    assert (a.read.value, a.author.value) == (1, True)
+    assert (b.read.value, b.author.value) == (2, None)
+    assert json.loads(a.to_json()) == a.to_dict()
+
+
+def test_field_shared_by_classes_keeps_its_slot_in_each():
+    shared = MetadataField(MetadataType.INT_GTE, 'shared', 'shared field')
+
+    class A(Metadata):
+        platform_name = 'A'
+        x = shared
+
+    class C(Metadata):
+        platform_name = 'C'
+        y = MetadataField(MetadataType.INT_GTE, 'y', 'y')
+        x = shared
+
+    assert A(x=1).x.value == 1
+    assert C(y=1, x=2).x.value == 2
+    assert C(y=1, x=2).to_dict()['metadata'] == {'y': 1, 'x': 2}
+
+
+def test_fields_of_several_parents():
+    class A(Metadata):
+        platform_name = 'A'
+        a = MetadataField(MetadataType.INT_GTE, 'a', 'a')
+
+    class B(Metadata):
+        platform_name = 'B'
+        b = MetadataField(MetadataType.INT_GTE, 'b', 'b')
+
+    class AB(A, B):
+        c = MetadataField(MetadataType.INT_GTE, 'c', 'c')
+
+    metadata = AB(a=1, b=2, c=3)
+    assert (metadata.a.value, metadata.b.value, metadata.c.value) == (1, 2, 3)
+    assert [f['key'] for f in AB.to_schema()] == ['a', 'b', 'c']
+
+
+def test_field_limit_includes_inherited_fields():
+    class Five(Metadata):
+        platform_name = 'Five'
+        f1 = MetadataField(MetadataType.INT_GTE, 'f1', 'f1')
+        f2 = MetadataField(MetadataType.INT_GTE, 'f2', 'f2')
+        f3 = MetadataField(MetadataType.INT_GTE, 'f3', 'f3')
+        f4 = MetadataField(MetadataType.INT_GTE, 'f4', 'f4')
+        f5 = MetadataField(MetadataType.INT_GTE, 'f5', 'f5')
+
+    with pytest.raises(ValueError):
+        class Six(Five):  # noqa
+            f6 = MetadataField(MetadataType.INT_GTE, 'f6', 'f6')
+
+
+def test_invalid_values_are_rejected():
+    class Books(Metadata):
+        platform_name = 'Books'
+        read = MetadataField(MetadataType.INT_GTE, 'read', 'books read')
+
+    with pytest.raises(ValueError):
+        Books(read='1')
+    with pytest.raises(ValueError):
+        Books(read=2 ** 63)
+    with pytest.raises(ValueError):
+        Books(unknown=1)
+
+
+def test_datetimes_are_stored_in_utc(monkeypatch):
+    monkeypatch.setenv('TZ', 'America/New_York')
+    time.tzset()
+    try:
+        class Reader(Metadata):
+            platform_name = 'Library'
+            since = MetadataField(MetadataType.DT_GTE, 'since', 'reading since')
+
+        naive = datetime(2024, 1, 1, 12)
+        assert Reader(since=naive).since.value == datetime(2024, 1, 1, 17, tzinfo=timezone.utc)
+        aware = datetime(2024, 1, 1, 12, tzinfo=timezone(timedelta(hours=2)))
+        assert Reader(since=aware).since.value == datetime(2024, 1, 1, 10, tzinfo=timezone.utc)
+    finally:
+        monkeypatch.undo()
+        time.tzset()
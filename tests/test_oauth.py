@@ -0,0 +1,68 @@
+import asyncio
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from conftest import make_client, make_metadata
+
+from discord_connections.exceptions import InvalidStateError
+from discord_connections.oauth import AccountLinker
+from discord_connections.storage import MemoryTokenStore
+
+
+def _state(url: str) -> str:
+    return parse_qs(urlparse(url).query)['state'][0]
+
+
+@pytest.mark.parametrize('user_id', ['42', None])
+def test_link_saves_token_and_pushes_metadata(fake, user_id):
+    async def provider(user_id):
+        return make_metadata(1)
+
+    async def main():
+        tokens = MemoryTokenStore()
+        async with make_client(fake) as client:
+            linker = AccountLinker(client, tokens=tokens, provider=provider)
+            result = await linker.link('code', _state(await linker.get_authorization_url(user_id)))
+
+        assert result.pushed and result.push_error is None
+        assert result.user_id == (user_id or result.discord_user_id)
+        assert await tokens.get(result.user_id) == result.token
+
+    asyncio.run(main())
+    assert fake.requests['put_role_connection'] == 1
+
+
+@pytest.mark.parametrize('user_id', ['42', None])
+def test_token_is_kept_when_provider_fails(fake, user_id):
+    error = RuntimeError('database is down')
+
+    async def provider(user_id):
+        raise error
+
+    async def main():
+        tokens = MemoryTokenStore()
+        async with make_client(fake) as client:
+            linker = AccountLinker(client, tokens=tokens, provider=provider)
+            result = await linker.link('code', _state(await linker.get_authorization_url(user_id)))
+
+        assert not result.pushed and result.push_error is error and result.metadata is None
+        assert await tokens.get(result.user_id) == result.token
+
+    asyncio.run(main())
+    assert 'put_role_connection' not in fake.requests
+
+
+def test_state_is_checked_once(fake):
+    async def main():
+        async with make_client(fake) as client:
+            linker = AccountLinker(client)
+            state = _state(await linker.get_authorization_url())
+            await linker.link('code', state)
+            with pytest.raises(InvalidStateError):
+                await linker.link('code', state)
+            with pytest.raises(InvalidStateError):
+                await linker.link('code', 'forged')
+
+    asyncio.run(main())
+    assert fake.requests['token'] == 1
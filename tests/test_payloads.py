@@ -0,0 +1,126 @@
+import asyncio
+
+import httpx
+import pytest
+
+from conftest import FakeDiscord, make_client, make_metadata, make_token
+
+from discord_connections.exceptions import RequestError
+from discord_connections.storage import MemoryPayloadStore, SQLitePayloadStore
+from discord_connections.storage.payloads import payload_digest
+
+
+class RejectingDiscord(FakeDiscord):
+    """
+    Answers the first `rejected` role connection pushes with 400
+    """
+
+    def __init__(self, rejected: int, **kwargs):
+        super().__init__(**kwargs)
+        self.rejected = rejected
+
+    async def handle_async_request(self, request):
+        if request.method == 'PUT' and self.rejected:
+            self.rejected -= 1
+            return httpx.Response(400, json={'message': 'Invalid Form Body', 'code': 50035})
+        return await super().handle_async_request(request)
+
+
+def test_unchanged_push_is_skipped(fake):
+    async def main():
+        async with make_client(fake, payload_store=MemoryPayloadStore()) as client:
+            sent = [
+                await client.push_metadata(make_token(), make_metadata(1), user_id=1),
+                await client.push_metadata(make_token(), make_metadata(1), user_id=1),
+                await client.push_metadata(make_token(), make_metadata(1).to_json(), user_id=1),
+                await client.push_metadata(make_token(), make_metadata(2), user_id=1),
+                await client.push_metadata(make_token(), make_metadata(2), user_id=1, force=True),
+                await client.push_metadata(make_token(), make_metadata(2)),  # no user id, nothing to compare with
+            ]
+            return sent, client.push_stats
+
+    sent, stats = asyncio.run(main())
+
+    assert sent == [True, False, False, True, True, True]
+    assert (stats.sent, stats.skipped) == (4, 2)
+    assert fake.requests['put_role_connection'] == 4
+
+
+def test_failed_push_is_not_remembered():
+    fake = RejectingDiscord(1)
+
+    async def main():
+        async with make_client(fake, payload_store=MemoryPayloadStore()) as client:
+            with pytest.raises(RequestError):
+                await client.push_metadata(make_token(), make_metadata(1), user_id=1)
+            return await client.push_metadata(make_token(), make_metadata(1), user_id=1)
+
+    assert asyncio.run(main())
+    assert fake.requests['put_role_connection'] == 1  # the rejected push is not counted by the fake
+
+
+def test_push_many_reports_skipped(fake):
+    items = [(make_token(i), make_metadata(i), i) for i in range(10)]
+
+    async def main():
+        async with make_client(fake, payload_store=MemoryPayloadStore()) as client:
+            [_ async for _ in client.push_metadata_many(items[:5])]
+            return [result async for result in client.push_metadata_many(items)]
+
+    results = sorted(asyncio.run(main()), key=lambda result: result.user_id)
+
+    assert [result.skipped for result in results] == [True] * 5 + [False] * 5
+    assert all(result.ok for result in results)
+    assert fake.requests['put_role_connection'] == 10
+
+
+def test_memory_store_evicts_least_recently_used():
+    async def main():
+        store = MemoryPayloadStore(maxsize=2)
+        await store.set(1, b'one')
+        await store.set(2, b'two')
+        await store.get(1)
+        await store.set(3, b'three')
+        return [await store.get(user_id) for user_id in (1, 2, 3)]
+
+    assert asyncio.run(main()) == [b'one', None, b'three']
+
+
+def test_sqlite_store_persists(tmp_path):
+    path = str(tmp_path / 'payloads.sqlite3')
+    digest = payload_digest(make_metadata(1).to_json())
+
+    async def write():
+        store = SQLitePayloadStore(path)
+        await store.set(1, digest)
+        await store.set('2', b'old')
+        await store.set(2, b'new')
+        await store.set(3, b'gone')
+        await store.delete(3)
+        store.close()
+
+    async def read():
+        store = SQLitePayloadStore(path)
+        try:
+            return [await store.get(user_id) for user_id in ('1', 2, 3)]
+        finally:
+            store.close()
+
+    asyncio.run(write())
+    assert asyncio.run(read()) == [digest, b'new', None]
+
+
+def test_sqlite_store_skips_after_restart(fake, tmp_path):
+    path = str(tmp_path / 'payloads.sqlite3')
+
+    async def push():
+        store = SQLitePayloadStore(path)
+        try:
+            async with make_client(fake, payload_store=store) as client:
+                return await client.push_metadata(make_token(), make_metadata(1), user_id=1)
+        finally:
+            store.close()
+
+    assert asyncio.run(push())
+    assert not asyncio.run(push())
+    assert fake.requests['put_role_connection'] == 1
@@ -0,0 +1,115 @@
+import asyncio
+
+import httpx
+
+from conftest import FakeDiscord, make_client, make_metadata, make_token
+
+from discord_connections.priority import Priority, PriorityLanes, bulk_context, get_priority, use_priority
+from discord_connections.ratelimit import RateLimiter
+
+
+class PriorityRecorder(FakeDiscord):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.priorities: dict[str, set[Priority]] = {}
+        self.methods: list[str] = []  # in order of arrival
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.priorities.setdefault(request.method, set()).add(get_priority())
+        self.methods.append(request.method)
+        return await super().handle_async_request(request)
+
+
+def test_priority_context():
+    assert get_priority() is Priority.INTERACTIVE
+    with use_priority(Priority.BULK):
+        assert get_priority() is Priority.BULK
+    assert get_priority() is Priority.INTERACTIVE
+    assert bulk_context().run(get_priority) is Priority.BULK
+
+
+def test_default_lanes_follow_connection_limits():
+    lanes = make_client(None).rate_limiter.lanes
+    assert (lanes.concurrency, lanes.reserved) == (100, 10)
+
+    lanes = make_client(None, limits=httpx.Limits(max_connections=300)).rate_limiter.lanes
+    assert (lanes.concurrency, lanes.reserved) == (300, 30)
+
+    assert make_client(None, limits=httpx.Limits(max_connections=None)).rate_limiter.lanes is None
+    assert make_client(None, rate_limiter=RateLimiter()).rate_limiter.lanes is None
+
+
+def test_bulk_requests_leave_reserved_slots():
+    async def main():
+        lanes = PriorityLanes(3, reserved=1)
+        await lanes.acquire(Priority.BULK)
+        await lanes.acquire(Priority.BULK)
+
+        bulk = asyncio.create_task(lanes.acquire(Priority.BULK))
+        await asyncio.sleep(0)
+        assert not bulk.done()
+
+        await lanes.acquire(Priority.INTERACTIVE)  # reserved slot
+        interactive = asyncio.create_task(lanes.acquire(Priority.INTERACTIVE))
+        await asyncio.sleep(0)
+
+        lanes.release(Priority.BULK)
+        await asyncio.sleep(0)
+        assert interactive.done() and not bulk.done()  # interactive requests go first
+
+        lanes.release(Priority.INTERACTIVE)
+        lanes.release(Priority.INTERACTIVE)
+        await bulk
+        assert lanes.in_flight == {Priority.INTERACTIVE: 0, Priority.BULK: 2}
+
+    asyncio.run(main())
+
+
+def test_cancelled_waiter_does_not_leak_slots():
+    async def main():
+        lanes = PriorityLanes(1, reserved=0)
+        await lanes.acquire(Priority.BULK)
+        waiter = asyncio.create_task(lanes.acquire(Priority.BULK))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        lanes.release(Priority.BULK)
+        assert lanes.in_flight == {Priority.INTERACTIVE: 0, Priority.BULK: 0}
+
+    asyncio.run(main())
+
+
+def test_bulk_helpers_send_in_bulk_lane():
+    fake = PriorityRecorder()
+
+    async def main():
+        async with make_client(fake) as client:
+            items = [(make_token(i), make_metadata(i)) for i in range(20)]
+            async for result in client.push_metadata_many(items, concurrency=5):
+                assert result.ok
+            await client.get_oauth_token('code')
+
+    asyncio.run(main())
+    assert fake.priorities == {'PUT': {Priority.BULK}, 'POST': {Priority.INTERACTIVE}}
+
+
+def test_interactive_call_is_not_queued_behind_bulk():
+    fake = PriorityRecorder(latency=.02)
+
+    async def main():
+        async with make_client(fake, limits=httpx.Limits(max_connections=10)) as client:
+            items = [(make_token(i), make_metadata(i)) for i in range(200)]
+
+            async def bulk():
+                async for _ in client.push_metadata_many(items, concurrency=50):
+                    pass
+
+            task = asyncio.create_task(bulk())
+            await asyncio.sleep(.05)
+            before = len(fake.methods)
+            await client.get_oauth_token('code')
+            await task
+            return fake.methods[before:].index('POST')
+
+    # at most a few bulk requests get ahead, not the ~40 waiting for a slot (as when sent in the bulk lane)
+    assert asyncio.run(main()) < 10
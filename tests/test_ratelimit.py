@@ -0,0 +1,150 @@
+import asyncio
+import time
+
+import httpx
+
+from conftest import FakeDiscord, make_client, make_metadata, make_token
+
+from discord_connections.instrumentation import Metrics
+from discord_connections.ratelimit import RateLimiter
+
+
+def _headers(remaining: int, reset_after: float = 1., bucket: str = None) -> dict:
+    headers = {'X-RateLimit-Limit': '5', 'X-RateLimit-Remaining': str(remaining),
+               'X-RateLimit-Reset-After': str(reset_after)}
+    if bucket is not None:
+        headers['X-RateLimit-Bucket'] = bucket
+    return headers
+
+
+def _too_many_requests(retry_after: float, is_global: bool = False) -> httpx.Response:
+    headers = {'X-RateLimit-Global': 'true'} if is_global else _headers(0, retry_after)
+    return httpx.Response(429, json={'retry_after': retry_after, 'global': is_global}, headers=headers)
+
+
+def _sender(*responses: httpx.Response):
+    """
+    Returns the responses one by one (the last one from then on) and the times they were sent at
+    """
+
+    sent = []
+
+    async def send():
+        sent.append(time.monotonic())
+        return responses[min(len(sent), len(responses)) - 1]
+
+    return send, sent
+
+
+def test_burst_is_spread_over_windows_without_429s():
+    fake = FakeDiscord(latency=.005, rate_limit=(5, .05))
+    metrics = Metrics()
+
+    async def main():
+        async with make_client(fake, instrumentation=metrics) as client:
+            await asyncio.gather(*[client.push_metadata(make_token(), make_metadata(i)) for i in range(20)])
+
+    asyncio.run(main())
+    assert fake.requests['put_role_connection'] == 20
+    assert not metrics.rate_limited
+
+
+def test_remaining_and_reset_are_tracked():
+    limiter = RateLimiter()
+    send, _ = _sender(httpx.Response(200, headers=_headers(3, reset_after=10.)))
+
+    asyncio.run(limiter.request('route', 'user', send))
+    bucket = limiter._get_bucket('route', 'user')
+    assert (bucket.limit, bucket.remaining) == (5, 3)
+    assert bucket.reset_at > time.monotonic() + 9
+
+
+def test_429_is_retried_after_retry_after():
+    limiter = RateLimiter()
+    send, sent = _sender(_too_many_requests(.01), _too_many_requests(.01), httpx.Response(200, headers=_headers(4)))
+
+    response = asyncio.run(limiter.request('route', 'user', send))
+    assert response.status_code == 200
+    assert len(sent) == 3
+    assert sent[1] - sent[0] >= .009
+
+
+def test_429_is_returned_after_max_retries():
+    limiter = RateLimiter(max_retries=2)
+    send, sent = _sender(_too_many_requests(.001))
+
+    response = asyncio.run(limiter.request('route', 'user', send))
+    assert response.status_code == 429
+    assert len(sent) == 3
+
+
+def test_global_429_pauses_every_route():
+    limiter = RateLimiter()
+
+    class Budget:
+        paused = []
+
+        async def acquire(self):
+            pass
+
+        def pause(self, seconds):
+            self.paused.append(seconds)
+
+    limiter.budget = Budget()
+    limited, limited_sent = _sender(_too_many_requests(.05, is_global=True), httpx.Response(200, headers=_headers(4)))
+    other, other_sent = _sender(httpx.Response(200, headers=_headers(4)))
+
+    async def main():
+        first = asyncio.create_task(limiter.request('a', 'user-1', limited))
+        while not limited_sent:
+            await asyncio.sleep(0)
+        await asyncio.sleep(0)  # the 429 is handled
+        reset_at = limiter._global_reset_at
+        await asyncio.gather(first, limiter.request('b', 'user-2', other))
+        return reset_at
+
+    reset_at = asyncio.run(main())
+    assert other_sent[0] >= reset_at and limited_sent[1] >= reset_at
+    assert Budget.paused == [.05]
+
+
+def test_routes_of_one_bucket_share_it():
+    limiter = RateLimiter()
+    a, _ = _sender(httpx.Response(200, headers=_headers(4, bucket='shared')))
+    b, _ = _sender(httpx.Response(200, headers=_headers(2, bucket='shared')))
+
+    async def main():
+        await limiter.request('a', 'user', a)
+        await limiter.request('b', 'user', b)
+
+    asyncio.run(main())
+    bucket = limiter._get_bucket('a', 'user')
+    assert bucket is limiter._get_bucket('b', 'user')
+    assert bucket.remaining == 2
+    assert list(limiter._buckets) == ['shared:user']
+
+
+def test_idle_buckets_are_swept():
+    limiter = RateLimiter()
+    limiter.SWEEP_EVERY = 3
+    send, _ = _sender(httpx.Response(200, headers=_headers(4, reset_after=0.)))
+
+    async def main():
+        await limiter.request('a', 'user-1', send)
+        await limiter.request('a', 'user-2', send)
+        await limiter.request('a', 'user-3', send)  # the third lookup sweeps the first two
+
+    asyncio.run(main())
+    assert list(limiter._buckets) == ['a:user-3']
+
+
+def test_only_success_without_headers_marks_route_unlimited():
+    limiter = RateLimiter()
+    failed, _ = _sender(httpx.Response(500))
+    succeeded, _ = _sender(httpx.Response(200))
+
+    asyncio.run(limiter.request('route', 'user', failed))
+    assert limiter._get_bucket('route', 'user').limited
+
+    asyncio.run(limiter.request('route', 'user', succeeded))
+    assert not limiter._get_bucket('route', 'user').limited
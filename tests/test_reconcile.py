@@ -0,0 +1,67 @@
+import asyncio
+
+from conftest import make_client, make_metadata, make_token
+
+from discord_connections.reconcile import Reconciler
+from discord_connections.storage import MemoryTokenStore
+from discord_connections.storage.checkpoints import MemoryCheckpointStore
+from discord_connections.token_manager import TokenManager
+
+
+async def _setup(client, users: int, in_sync: int) -> TokenManager:
+    tokens = MemoryTokenStore()
+    for i in range(users):
+        await tokens.set(i, make_token(i))
+        if i < in_sync:
+            await client.push_metadata(make_token(i), make_metadata(i))
+    return TokenManager(client, tokens)
+
+
+def test_drifted_users_are_found_and_fixed(fake):
+    async def main():
+        async with make_client(fake) as client:
+            tokens = await _setup(client, users=10, in_sync=6)
+            items = [(i, make_metadata(i)) for i in range(10)] + [(10, make_metadata(10))]  # no token of user 10
+
+            reconciler = Reconciler(client, tokens, fix=True, concurrency=3, batch_size=4)
+            results = [result async for result in reconciler.run(items)]
+            assert sorted(r.user_id for r in results if r.drifted) == ['6', '7', '8', '9']
+            assert all(r.pushed == r.drifted for r in results)
+            assert [r.user_id for r in results if not r.ok] == ['10']
+            assert (reconciler.stats.checked, reconciler.stats.drifted, reconciler.stats.failed) == (10, 4, 1)
+
+            [result async for result in reconciler.run(items[:10])]
+            assert (reconciler.stats.checked, reconciler.stats.drifted) == (10, 0)
+
+    asyncio.run(main())
+    assert fake.requests['put_role_connection'] == 6 + 4
+
+
+def test_dry_run_pushes_nothing(fake):
+    async def main():
+        async with make_client(fake) as client:
+            tokens = await _setup(client, users=5, in_sync=0)
+            results = [r async for r in Reconciler(client, tokens).run((i, make_metadata(i)) for i in range(5))]
+            assert all(r.drifted and not r.pushed for r in results)
+
+    asyncio.run(main())
+    assert 'put_role_connection' not in fake.requests
+
+
+def test_resume_skips_checked_users(fake):
+    async def main():
+        async with make_client(fake) as client:
+            tokens = await _setup(client, users=10, in_sync=10)
+            checkpoints = MemoryCheckpointStore()
+            reconciler = Reconciler(client, tokens, checkpoints=checkpoints, batch_size=3)
+
+            run = reconciler.run([(i, make_metadata(i)) for i in range(10)])
+            first = await anext(run)
+            await run.aclose()  # interrupted, only the user yielded is saved
+            assert set(await checkpoints.get_many(map(str, range(10)))) == {first.user_id}
+
+            results = [r async for r in reconciler.run([(i, make_metadata(i)) for i in range(10)], resume=True)]
+            assert len(results) == 9 and reconciler.stats.resumed == 1
+            assert first.user_id not in {r.user_id for r in results}
+
+    asyncio.run(main())
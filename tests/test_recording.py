@@ -0,0 +1,66 @@
+import asyncio
+import json
+import time
+
+import httpx
+
+from conftest import make_client, make_metadata, make_token
+
+from discord_connections.recording import RecordingTransport, ReplayTransport, load_recording, replay_traffic
+
+
+async def _record(path, fake, users=5):
+    async with make_client(RecordingTransport(path, fake, buffer_size=2)) as client:
+        await client.get_oauth_token('one-time-code')
+        for i in range(users):
+            await client.push_metadata(make_token(i), make_metadata(i))
+
+
+def test_recording_has_no_secrets(tmp_path, fake):
+    path = tmp_path / 'traffic.jsonl'
+    asyncio.run(_record(path, fake))
+
+    text = path.read_text()
+    for secret in ('one-time-code', 'client_secret=secret', 'access-0', 'refresh-1', 'Bot bot'):
+        assert secret not in text
+
+    exchanges = list(load_recording(path))
+    assert len(exchanges) == 6
+    assert exchanges[0].form['code'].startswith('redacted-')
+    assert json.loads(exchanges[0].response)['access_token'].startswith('redacted-')
+    assert exchanges[1].auth != exchanges[2].auth
+
+
+def test_replay_sends_recorded_calls(tmp_path, fake):
+    path = tmp_path / 'traffic.jsonl'
+    asyncio.run(_record(path, fake))
+
+    async def main():
+        transport = ReplayTransport(path, speed=None)
+        async with make_client(transport) as client:
+            report = await replay_traffic(client, path, speed=100.)
+        return report, transport.served
+
+    report, served = asyncio.run(main())
+    assert (report.sent, report.failed, report.skipped) == (6, 0, 0)
+    assert served == 6
+
+
+def test_replay_without_speed_zeroes_rate_limit_timing(tmp_path):
+    path = tmp_path / 'traffic.jsonl'
+    path.write_text(json.dumps({
+        'at': 0., 'elapsed': 1., 'method': 'GET', 'path': '/api/v10/oauth2/@me', 'auth': None, 'request': None,
+        'status': 429, 'headers': {'x-ratelimit-reset-after': '5.000', 'retry-after': '6'},
+        'response': json.dumps({'message': 'You are being rate limited.', 'retry_after': 5., 'global': False}),
+    }) + '\n')
+
+    async def main():
+        async with httpx.AsyncClient(transport=ReplayTransport(path, speed=None)) as client:
+            started = time.monotonic()
+            response = await client.get('http://localhost/api/v10/oauth2/@me')
+            return response, time.monotonic() - started
+
+    response, elapsed = asyncio.run(main())
+    assert elapsed < .5
+    assert float(response.headers['x-ratelimit-reset-after']) == float(response.headers['retry-after']) == 0
+    assert response.json()['retry_after'] == 0
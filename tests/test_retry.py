@@ -0,0 +1,98 @@
+import asyncio
+
+import httpx
+import pytest
+
+from conftest import make_client, make_metadata, make_token
+
+from discord_connections.exceptions import CircuitOpenError, ServerError
+from discord_connections.retry import CircuitBreaker, RetryPolicy
+
+
+def _failing(failures: int, status_code: int = 500):
+    calls = []
+
+    def handler(request):
+        calls.append(request.method)
+        if len(calls) <= failures:
+            return httpx.Response(status_code, json={'message': 'error', 'code': 0})
+        return httpx.Response(200, json={})
+
+    return httpx.MockTransport(handler), calls
+
+
+def test_server_errors_are_retried():
+    transport, calls = _failing(2)
+
+    async def main():
+        async with make_client(transport) as client:
+            await client.push_metadata(make_token(), make_metadata())
+
+    asyncio.run(main())
+    assert len(calls) == 3
+
+
+def test_retries_give_up_after_max_attempts():
+    transport, calls = _failing(5)
+
+    async def main():
+        async with make_client(transport) as client:
+            await client.push_metadata(make_token(), make_metadata())
+
+    with pytest.raises(ServerError):
+        asyncio.run(main())
+    assert len(calls) == 3
+
+
+def test_code_exchange_is_not_retried_after_server_error():
+    transport, calls = _failing(1)
+
+    async def main():
+        async with make_client(transport) as client:
+            await client.get_oauth_token('code')
+
+    with pytest.raises(ServerError):
+        asyncio.run(main())
+    assert calls == ['POST']
+
+
+def test_next_delay_is_bounded():
+    policy = RetryPolicy(max_attempts=10, base_delay=1., max_delay=2., deadline=None)
+    error = ServerError(500, 'error')
+
+    assert all(0 <= policy.next_delay('PUT', error, attempt, 0.) <= 2. for attempt in range(9))
+    assert policy.next_delay('PUT', error, 9, 0.) is None
+    assert policy.next_delay('POST', error, 0, 0.) is None
+
+
+def test_circuit_opens_and_recovers(monkeypatch):
+    now = [0.]
+    monkeypatch.setattr('discord_connections.retry.time.monotonic', lambda: now[0])
+    breaker = CircuitBreaker(failure_threshold=2, recovery_time=10.)
+
+    breaker.record_failure()
+    breaker.check()
+    breaker.record_failure()
+    assert breaker.is_open
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+    now[0] = 11.
+    breaker.check()  # the probe
+    with pytest.raises(CircuitOpenError):
+        breaker.check()  # only one probe at a time
+    breaker.record_success()
+    assert not breaker.is_open
+
+
+def test_client_fails_fast_while_circuit_is_open():
+    transport, calls = _failing(100)
+
+    async def main():
+        async with make_client(transport, circuit_breaker=CircuitBreaker(failure_threshold=3)) as client:
+            for _ in range(2):
+                with pytest.raises((ServerError, CircuitOpenError)):
+                    await client.push_metadata(make_token(), make_metadata())
+
+    asyncio.run(main())
+    assert len(calls) == 3
@@ -0,0 +1,121 @@
+import asyncio
+import time
+from datetime import timedelta
+
+from conftest import make_client, make_metadata, make_token
+
+from discord_connections.scheduler import SyncScheduler
+from discord_connections.storage import MemoryCheckpointStore, MemoryTokenStore
+from discord_connections.token_manager import TokenManager
+
+DAY = 86400
+
+
+async def _provider(user_id):
+    return make_metadata(int(user_id))
+
+
+async def _scheduler(client, users: int, provider=_provider, checkpoints=None, **kwargs) -> SyncScheduler:
+    store = MemoryTokenStore()
+    for i in range(users):
+        await store.set(i, make_token(i))
+    scheduler = SyncScheduler(client, TokenManager(client, store), provider, checkpoints=checkpoints, **kwargs)
+    await scheduler.load()
+    return scheduler
+
+
+async def _until(condition) -> None:
+    for _ in range(1000):
+        if condition():
+            return
+        await asyncio.sleep(.005)
+    raise AssertionError('condition not met')
+
+
+def test_stalest_and_changed_users_go_first(fake):
+    async def main():
+        checkpoints = MemoryCheckpointStore()
+        await checkpoints.set_many({i: time.time() - DAY * (i + 1) for i in range(5)})
+        async with make_client(fake) as client:
+            scheduler = await _scheduler(client, 5, checkpoints=checkpoints, changed_boost=timedelta(days=10))
+            scheduler.mark_changed(1)
+            return [user_id for user_id, _ in scheduler._next_batch()]
+
+    assert asyncio.run(main()) == ['1', '4', '3', '2', '0']
+
+
+def test_synced_users_wait_min_interval(fake):
+    async def main():
+        async with make_client(fake) as client:
+            async with await _scheduler(client, 5) as scheduler:
+                await _until(lambda: scheduler.synced == 5)
+                scheduler.mark_changed(0)
+                assert scheduler._next_batch() == []
+
+    asyncio.run(main())
+    assert fake.requests['put_role_connection'] == 5
+
+
+def test_failed_users_are_retried_after_retry_interval(fake):
+    calls = []
+
+    async def provider(user_id):
+        calls.append(user_id)
+        if len(calls) == 1:
+            raise RuntimeError('database is down')
+        return make_metadata()
+
+    async def main():
+        async with make_client(fake) as client:
+            scheduler = await _scheduler(client, 1, provider, retry_interval=timedelta(hours=1))
+            await scheduler._sync_batch(scheduler._next_batch())
+            assert (scheduler.synced, scheduler.failed) == (0, 1)
+            [(due_at, *_)] = scheduler._waiting
+            assert 0 < due_at - time.time() <= 3600
+
+            scheduler.retry_interval = 0
+            await scheduler._sync_batch([('0', scheduler._users['0'].version)])
+            assert scheduler.synced == 1
+
+    asyncio.run(main())
+    assert calls == ['0', '0']
+
+
+def test_restart_resumes_from_checkpoints(fake):
+    async def main():
+        checkpoints = MemoryCheckpointStore()
+        async with make_client(fake) as client:
+            async with await _scheduler(client, 5, checkpoints=checkpoints) as scheduler:
+                await _until(lambda: scheduler.synced == 5)
+
+            scheduler = await _scheduler(client, 6, checkpoints=checkpoints)
+            assert [user_id for user_id, _ in scheduler._next_batch()] == ['5']
+
+    asyncio.run(main())
+
+
+def test_stop_finishes_the_batch_in_progress(fake):
+    async def main():
+        started, release = asyncio.Event(), asyncio.Event()
+
+        async def provider(user_id):
+            started.set()
+            await release.wait()
+            return make_metadata()
+
+        checkpoints = MemoryCheckpointStore()
+        async with make_client(fake) as client:
+            scheduler = await _scheduler(client, 10, provider, checkpoints=checkpoints, batch_size=4)
+            await scheduler.start()
+            await started.wait()
+
+            stopping = asyncio.create_task(scheduler.stop())
+            await asyncio.sleep(.01)
+            assert not stopping.done()
+            release.set()
+            await stopping
+
+            assert scheduler.synced == 4
+            assert len(await checkpoints.get_many(map(str, range(10)))) == 4
+
+    asyncio.run(main())
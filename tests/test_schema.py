@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+from conftest import BenchMetadata, make_client
+
+from discord_connections import Client
+from discord_connections import schema as schema_module
+from discord_connections.datatypes import Metadata, MetadataField, MetadataType
+from discord_connections.storage import MemorySchemaStore
+
+
+class Other(Metadata):
+    platform_name = 'Other'
+    level = MetadataField(MetadataType.INT_GTE, 'level', 'level reached')
+
+
+def _ensure(fake, store=None, metadata=BenchMetadata, **kwargs) -> bool:
+    async def main():
+        async with make_client(fake) as client:
+            return await client.ensure_metadata_schema(metadata, store=store, **kwargs)
+
+    return asyncio.run(main())
+
+
+def test_schema_is_registered_once(fake):
+    store = MemorySchemaStore()
+
+    assert _ensure(fake, store)
+    assert fake.schema == BenchMetadata.to_schema()
+    assert not _ensure(fake, store)  # found in the store, nothing is requested
+    assert fake.requests == {'get_schema': 1, 'put_schema': 1}
+
+
+def test_registered_schema_is_compared_without_store(fake):
+    fake.schema = BenchMetadata.to_schema()
+
+    assert not _ensure(fake)
+    assert fake.requests == {'get_schema': 1}
+
+
+def test_changed_schema_is_registered(fake):
+    store = MemorySchemaStore()
+    _ensure(fake, store)
+
+    assert _ensure(fake, store, metadata=Other)
+    assert fake.schema == Other.to_schema()
+
+
+def test_force_registers_without_checking(fake):
+    store = MemorySchemaStore()
+    _ensure(fake, store)
+
+    assert _ensure(fake, store, force=True)
+    assert fake.requests == {'get_schema': 1, 'put_schema': 2}
+
+
+@pytest.fixture
+def cli(fake, monkeypatch):
+    monkeypatch.setenv('DISCORD_TOKEN', 'bot')
+    monkeypatch.setattr(schema_module, 'DiscordConnections', lambda *args: Client(*args, transport=fake))
+    return schema_module.main
+
+
+def test_cli_registers_and_checks(cli, fake, tmp_path, capsys):
+    store = str(tmp_path / 'schemas.sqlite3')
+
+    assert cli(['bench_metadata:BenchMetadata@1', '--store', store]) == 0
+    assert cli(['bench_metadata:BenchMetadata@1', '--store', store]) == 0
+    assert cli(['bench_metadata:BenchMetadata@1', '--check']) == 0
+    fake.schema = []
+    assert cli(['bench_metadata:BenchMetadata@1', '--check']) == 1
+
+    assert capsys.readouterr().out.splitlines() == [
+        '1 BenchMetadata: registered',
+        '1 BenchMetadata: unchanged',
+        '1 BenchMetadata: unchanged',
+        '1 BenchMetadata: outdated',
+    ]
+    assert fake.requests['put_schema'] == 1
+
+
+def test_cli_rejects_repeated_client_ids(cli, fake, capsys):
+    with pytest.raises(SystemExit):
+        cli(['bench_metadata:BenchMetadata@1', 'test_schema:Other@1'])
+    assert 'given more than once: 1' in capsys.readouterr().err
+    assert not fake.requests
+
+
+def test_cli_rejects_unknown_metadata(cli, capsys):
+    with pytest.raises(SystemExit):
+        cli(['bench_metadata:Missing@1'])
+    with pytest.raises(SystemExit):
+        cli(['bench_metadata@1'])
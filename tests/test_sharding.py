@@ -0,0 +1,113 @@
+import asyncio
+import multiprocessing
+import time
+from collections import Counter
+
+import pytest
+
+from conftest import FakeDiscord, make_client, make_metadata, make_token
+
+from discord_connections import sharding
+from discord_connections.sharding import SharedBudget, ShardedRunner, shard_of
+
+fork = pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(), reason='needs fork')
+
+USERS = 60
+
+
+def _client():
+    return make_client(FakeDiscord())
+
+
+def _source(shard, shards):
+    for i in range(USERS):
+        yield make_token(i), make_metadata(i), i
+
+
+def _take_all(budget, n, taken):
+    async def main():
+        for _ in range(n):
+            await budget.acquire()
+            with taken.get_lock():
+                taken.value += 1
+
+    asyncio.run(main())
+
+
+def test_shard_of_is_stable_and_spread():
+    assert shard_of(12345, 8) == shard_of('12345', 8) == 4  # crc32 is the same in every process and run
+    assert min(Counter(shard_of(i, 4) for i in range(1000)).values()) > 200
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+def test_budget_allows_burst_then_rate(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(sharding, 'time', clock)
+    budget = SharedBudget(rate=100, burst=5)
+
+    assert [budget._take() for _ in range(5)] == [0.] * 5
+    assert budget._take() == pytest.approx(.01)
+
+    clock.now += .03
+    assert [budget._take() for _ in range(3)] == [0.] * 3
+    assert budget._take() > 0
+
+    clock.now += 10  # tokens do not pile up beyond the burst
+    assert [budget._take() for _ in range(5)] == [0.] * 5
+    assert budget._take() > 0
+
+
+def test_budget_waits_for_tokens():
+    budget = SharedBudget(rate=100, burst=5)
+
+    async def main():
+        started = time.monotonic()
+        for _ in range(15):
+            await budget.acquire()
+        return time.monotonic() - started
+
+    assert asyncio.run(main()) >= .09  # 10 requests beyond the burst
+
+
+def test_pause_holds_everyone():
+    budget = SharedBudget(rate=1000)
+    budget.pause(.1)
+
+    started = time.monotonic()
+    asyncio.run(budget.acquire())
+    assert time.monotonic() - started >= .09
+
+
+@fork
+def test_budget_is_shared_by_processes():
+    context = multiprocessing.get_context('fork')
+    started = time.monotonic()
+    budget = SharedBudget(rate=100, burst=1, context=context)
+    taken = context.Value('i', 0)
+
+    workers = [context.Process(target=_take_all, args=(budget, 20, taken)) for _ in range(3)]
+    for worker in workers:
+        worker.start()
+    time.sleep(.2)
+    assert taken.value <= 1 + 100 * (time.monotonic() - started)  # the rate is for all processes together
+    for worker in workers:
+        worker.join()
+    assert taken.value == 60
+    assert time.monotonic() - started >= .59
+
+
+@fork
+def test_runner_syncs_every_user_once():
+    runner = ShardedRunner(_client, _source, shards=3, rate=1000, context=multiprocessing.get_context('fork'))
+    report = runner.run()
+
+    assert report.done and not any(stats.crashed for stats in report.shards)
+    assert report.sent == USERS
+    assert all(stats.sent for stats in report.shards)
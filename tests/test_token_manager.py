@@ -0,0 +1,75 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+
+from conftest import make_client, make_token
+
+from discord_connections.storage import MemoryTokenStore
+from discord_connections.token_manager import TokenManager
+
+
+def test_concurrent_refreshes_make_one_request(fake):
+    async def main():
+        tokens = MemoryTokenStore()
+        await tokens.set(1, make_token(expires_in=10))
+        async with make_client(fake) as client:
+            manager = TokenManager(client, tokens, min_validity=timedelta(minutes=1))
+            results = await asyncio.gather(*[manager.get_valid_token(1) for _ in range(10)])
+
+        assert len({token.access_token for token in results}) == 1
+        assert await tokens.get(1) == results[0]
+
+    asyncio.run(main())
+    assert fake.requests['token'] == 1
+
+
+def test_valid_token_is_not_refreshed(fake):
+    async def main():
+        tokens = MemoryTokenStore()
+        await tokens.set(1, token := make_token())
+        async with make_client(fake) as client:
+            assert await TokenManager(client, tokens).get_valid_token(1) == token
+
+    asyncio.run(main())
+    assert 'token' not in fake.requests
+
+
+def test_renew_expiring_renews_each_token_once(fake):
+    async def main():
+        tokens = MemoryTokenStore()
+        for i in range(25):
+            await tokens.set(i, make_token(i, expires_in=60 if i % 5 else 86400))
+        async with make_client(fake) as client:
+            manager = TokenManager(client, tokens, renew_within=timedelta(hours=1), batch_size=7)
+            assert await manager.renew_expiring() == 20
+            assert await manager.renew_expiring() == 0
+
+    asyncio.run(main())
+    assert fake.requests['token'] == 20
+
+
+def test_renew_within_longer_than_lifetime_is_rejected(fake):
+    async def main():
+        tokens = MemoryTokenStore()
+        for i in range(5):
+            await tokens.set(i, make_token(i, expires_in=60))
+        async with make_client(fake) as client:
+            manager = TokenManager(client, tokens, renew_within=timedelta(days=8), batch_size=2)
+            with pytest.raises(ValueError):
+                await manager.renew_expiring()
+
+    asyncio.run(main())
+    assert fake.requests['token'] <= 2
+
+
+def test_iter_all_yields_every_token():
+    async def main():
+        tokens = MemoryTokenStore()
+        for i in range(25):
+            await tokens.set(i, make_token(i, expires_in=10 ** i))
+        return [page async for page in tokens.iter_all(page_size=10)]
+
+    pages = asyncio.run(main())
+    assert [len(page) for page in pages] == [10, 10, 5]
+    assert [user_id for page in pages for user_id, _ in page] == [str(i) for i in range(25)]
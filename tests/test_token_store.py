@@ -0,0 +1,85 @@
+import asyncio
+import time
+from datetime import timedelta
+
+import pytest
+
+from conftest import make_token
+
+from discord_connections.datatypes import DiscordToken
+from discord_connections.storage import MemoryTokenStore, SQLiteTokenStore
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        yield MemoryTokenStore()
+    else:
+        store = SQLiteTokenStore(str(tmp_path / 'tokens.sqlite3'))
+        store.BATCH = 3  # so batching is exercised with few tokens
+        yield store
+        store.close()
+
+
+def _collect(iterator) -> list[list[str]]:
+    async def main():
+        return [[user_id for user_id, _ in page] async for page in iterator]
+
+    return asyncio.run(main())
+
+
+def test_many_tokens_are_set_and_got_in_batches(store):
+    tokens = {str(i): make_token(i) for i in range(10)}
+
+    asyncio.run(store.set_many(tokens.items()))
+    found = asyncio.run(store.get_many([*tokens, 'missing']))
+
+    assert found == tokens
+    assert asyncio.run(store.get(7)) == tokens['7']
+
+
+def test_expiring_pages_follow_expiry_then_user_id(store):
+    now = time.time()
+    expires_ts = {'a': now + 10, 'b': now + 10, 'c': now + 5, 'd': now + 20, 'e': now + 10, 'f': now + 7200}
+    asyncio.run(store.set_many(
+        (user_id, DiscordToken.from_row('access', 'refresh', 3600, ts)) for user_id, ts in expires_ts.items()
+    ))
+
+    assert _collect(store.iter_expiring(timedelta(hours=1), page_size=2)) == [['c', 'a'], ['b', 'e'], ['d']]
+    assert _collect(store.iter_all(page_size=4)) == [['c', 'a', 'b', 'e'], ['d', 'f']]
+
+
+def test_tokens_renewed_while_iterating_are_not_repeated(store):
+    asyncio.run(store.set_many((i, make_token(i, expires_in=60)) for i in range(6)))
+
+    async def main():
+        seen = []
+        async for page in store.iter_expiring(timedelta(hours=1), page_size=2):
+            for user_id, _ in page:
+                seen.append(user_id)
+                await store.set(user_id, make_token(int(user_id)))  # renewed, now out of the window
+        return seen
+
+    assert sorted(asyncio.run(main())) == [str(i) for i in range(6)]
+
+
+def test_deleted_token_is_gone(store):
+    asyncio.run(store.set(1, make_token(1)))
+    asyncio.run(store.delete(1))
+    asyncio.run(store.delete(2))
+
+    assert asyncio.run(store.get(1)) is None
+    assert asyncio.run(store.get_many([1])) == {}
+
+
+def test_sqlite_store_persists(tmp_path):
+    path = str(tmp_path / 'tokens.sqlite3')
+    token = make_token(1)
+
+    store = SQLiteTokenStore(path)
+    asyncio.run(store.set(1, token))
+    store.close()
+
+    store = SQLiteTokenStore(path)
+    assert asyncio.run(store.get('1')) == token
+    store.close()
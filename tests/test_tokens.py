@@ -0,0 +1,56 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from pydantic import ValidationError
+
+from discord_connections.datatypes import DiscordToken
+
+
+def test_from_response():
+    token = DiscordToken.from_response(
+        {'access_token': 'access', 'refresh_token': 'refresh', 'expires_in': 604800, 'token_type': 'Bearer'}
+    )
+
+    assert (token.access_token, token.refresh_token) == ('access', 'refresh')
+    assert token.expires_in == timedelta(days=7)
+    assert token.expires_ts == pytest.approx(time.time() + 604800, abs=5)
+
+
+@pytest.mark.parametrize('data', [
+    {'access_token': 'access', 'expires_in': 604800},
+    {'access_token': 'access', 'refresh_token': 'refresh', 'expires_in': 'soon'},
+])
+def test_from_response_rejects_invalid(data):
+    with pytest.raises(ValidationError):
+        DiscordToken.from_response(data)
+
+
+def test_row_round_trip():
+    token = DiscordToken('access', 'refresh', timedelta(hours=1), datetime(2030, 1, 1, tzinfo=timezone.utc))
+
+    assert DiscordToken.from_row(*token.to_row()) == token
+    assert DiscordToken.from_rows([token.to_row()] * 2) == [token, token]
+    assert token.expires_at == datetime(2030, 1, 1, tzinfo=timezone.utc)
+    assert token.expires_in == timedelta(hours=1)
+
+
+def test_naive_expires_at_is_local_time():
+    expires_at = datetime(2030, 1, 1)
+
+    assert DiscordToken('access', 'refresh', 3600, expires_at).expires_ts == expires_at.timestamp()
+
+
+def test_expiry():
+    token = DiscordToken('access', 'refresh', 3600)
+
+    assert not token.expired
+    assert not token.expires_within(60)
+    assert token.expires_within(7200)
+    assert DiscordToken('access', 'refresh', 3600, time.time() - 1).expired
+
+
+def test_repr_has_no_secrets():
+    token = DiscordToken('access', 'refresh', 3600)
+
+    assert 'access' not in repr(token) and 'refresh' not in repr(token)